@@ -0,0 +1,124 @@
+"""
+Admission control in front of the model calls.
+
+`SingleFlight` lets concurrent identical requests share one in-flight call,
+so a double-click or a client retry costs one model call and saves one
+analysis. `TokenBucketLimiter` caps how fast each user can start model
+calls, telling rejected callers how long to wait.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+
+class RateLimitedError(Exception):
+    """Raised when a user has no tokens left; `retry_after` is in seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time; callers arriving while it is in flight
+    wait for its result (or exception) instead of starting their own.
+    Works across event loops, since Flask gives each async view its own.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    async def run(self, key, coro_factory):
+        """Result of `coro_factory()`, and whether it came from another caller's call."""
+        future, leader = self.claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future), True
+
+        try:
+            result = await coro_factory()
+        except BaseException as e:
+            self.settle(key, future, error=e)
+            raise
+        self.settle(key, future, result)
+        return result, False
+
+    def claim(self, key):
+        """
+        Future of the call in flight for `key`, and whether the caller leads a
+        new call, which it must end with `settle`. For callers that cannot
+        wrap their call in a coroutine, such as streams.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.leaders += 1
+            return future, True
+
+    def settle(self, key, future, result=None, error=None):
+        """End a led call, handing its result (or `error`) to the callers waiting on it."""
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+        }
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets holding up to `burst` tokens, refilled at `rate`
+    tokens per second. Full buckets are forgotten, since a new bucket starts
+    full anyway.
+    """
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.rejected = 0
+        self._buckets = {}
+        self._acquires = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """Take a token for `key`, or raise RateLimitedError."""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                self.rejected += 1
+                raise RateLimitedError((1 - tokens) / self.rate)
+            self._buckets[key] = (tokens - 1, now)
+
+            self._acquires += 1
+            if self._acquires % 1000 == 0:
+                self._prune(now)
+
+    def _prune(self, now):
+        refill = self.burst / self.rate
+        for key, (_, updated) in list(self._buckets.items()):
+            if now - updated >= refill:
+                del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self._buckets),
+            'rejected': self.rejected,
+        }
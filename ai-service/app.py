@@ -1,204 +1,888 @@
-import json
-from flask import Flask, request, jsonify
+"""
+Symptom checker service.
+
+`python app.py` runs the Flask development server. In production, run the
+ASGI app of asgi_app.py, one per worker process, with
+    gunicorn -c gunicorn.conf.py 'asgi_app:create_asgi_app()'
+It awaits model calls without holding a thread per request.
+Model and database clients are created on first use in each worker, and
+each worker warms up in the background; /readyz reports when it can serve.
+"""
+import asyncio
+import datetime
+import os
+import threading
+import time
+from flask import Blueprint, Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from google import genai
 from config import ApiConfig
-from pymongo import MongoClient
-import datetime
+from admission import RateLimitedError, SingleFlight, TokenBucketLimiter
+from lifecycle import LazyProxy, PerProcess, ReadinessProbe, resolve
+from llm import LLMRuntime, LLMBusyError, LLMTimeoutError, UsageStats
+from providers import (
+    AnthropicProvider,
+    GeminiProvider,
+    HedgedRouter,
+    OpenAIProvider,
+    ProviderUnavailableError,
+    gemini_tokens,
+)
+from prompts import ContextCache, build_prompt, FINAL, MAX_QUESTIONS, SYSTEM_INSTRUCTIONS
+from cache import ResponseCache, cache_version, make_cache_key
+from metrics import (
+    Counter, Gauge, MultiProcessCollector, RequestTimer, enable_tracing, record_tokens, registry as metrics_registry,
+)
+from red_flags import RedFlagEngine
+from triage_tree import TriageTreeStore
+from persistence import HISTORY_COLLECTION, AnalysisWriter, ensure_indexes, history_document
+from rollups import AssessmentRollups, parse_day
+from sessions import (
+    InMemorySessionStore,
+    MongoSessionStore,
+    SessionConflictError,
+    SessionNotFoundError,
+)
+from streaming import IncrementalJSONParser, iterate_sync, sse_event
+from schemas import (
+    RESPONSE_SCHEMAS,
+    ParseStats,
+    ResponseFormatError,
+    parse_response,
+    repair_prompt,
+)
 
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Routes, registered on each app built by create_app()
+api = Blueprint('api', __name__)
 
 # --- AI Configuration ---
 config = ApiConfig()
-client = genai.Client(
-    api_key=config.GEMINI_API_KEY,
-    # vertexai=True,
-    # project=config.VERTEX_PROJECT_ID,
-    # location=config.VERTEX_LOCATION
+
+
+def create_gemini_client():
+    # Imported here: google.genai is the slowest import of the service
+    from google import genai
+
+    return genai.Client(
+        api_key=config.GEMINI_API_KEY,
+        # vertexai=True,
+        # project=config.VERTEX_PROJECT_ID,
+        # location=config.VERTEX_LOCATION
+    )
+
+
+# Created on first use in each worker; connections must not cross a fork
+client = LazyProxy(create_gemini_client)
+GEMINI_MODEL = "gemini-2.0-flash"
+llm_runtime = LLMRuntime(
+    max_in_flight=config.LLM_MAX_IN_FLIGHT,
+    timeout=config.LLM_TIMEOUT_SECONDS,
+)
+# Identical concurrent requests share one call; each user's model calls are rate limited
+single_flight = SingleFlight()
+user_limiter = None
+if config.USER_RATE_LIMIT_PER_MINUTE > 0:
+    user_limiter = TokenBucketLimiter(config.USER_RATE_LIMIT_PER_MINUTE / 60, config.USER_RATE_LIMIT_BURST)
+# Opening and follow-up turns repeat often; final analyses are never cached
+response_cache = ResponseCache(
+    max_entries=config.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=config.RESPONSE_CACHE_TTL_SECONDS,
+    path=config.RESPONSE_CACHE_PATH,
 )
+parse_stats = ParseStats()
+usage_stats = UsageStats()
+# Static instructions can be registered once with Gemini context caching
+context_cache = None
+if config.CONTEXT_CACHE:
+    context_cache = ContextCache(client, GEMINI_MODEL, ttl=config.CONTEXT_CACHE_TTL_SECONDS,
+                                 min_tokens=config.CONTEXT_CACHE_MIN_TOKENS)
+# Providers are tried in order; slow calls are hedged to the next one
+model_providers = []
+for provider_name in config.LLM_PROVIDERS.split(','):
+    provider_name = provider_name.strip()
+    try:
+        if provider_name == 'gemini':
+            model_providers.append(GeminiProvider(client, GEMINI_MODEL, lambda prompt: generation_config(prompt)))
+        elif provider_name == 'openai' and config.OPENAI_API_KEY:
+            model_providers.append(OpenAIProvider(config.OPENAI_API_KEY, config.OPENAI_MODEL, config.STRUCTURED_OUTPUT))
+        elif provider_name == 'anthropic' and config.ANTHROPIC_API_KEY:
+            model_providers.append(AnthropicProvider(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL))
+        elif provider_name:
+            print(f"Model provider '{provider_name}' is unknown or has no API key; skipping it.")
+    except ImportError as e:
+        print(f"Model provider '{provider_name}' is not installed: {e}")
+model_router = HedgedRouter(
+    model_providers,
+    hedge_percentile=config.HEDGE_PERCENTILE,
+    initial_delay=config.HEDGE_INITIAL_DELAY_SECONDS,
+    failure_threshold=config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_timeout=config.CIRCUIT_RESET_SECONDS,
+)
+# Emergency answers are caught locally before any model call
+red_flag_engine = None
+if config.RED_FLAG_RULES:
+    try:
+        red_flag_engine = RedFlagEngine.from_file(config.RED_FLAG_RULES)
+    except (OSError, ValueError) as e:
+        print(f"Red-flag rules could not be loaded: {e}")
+# Common question paths are answered from the tree mined from saved conversations
+triage_tree = None
+if config.TRIAGE_TREE_PATH:
+    triage_tree = TriageTreeStore(
+        config.TRIAGE_TREE_PATH,
+        min_support=config.TRIAGE_TREE_MIN_SUPPORT,
+        min_confidence=config.TRIAGE_TREE_MIN_CONFIDENCE,
+        min_coverage=config.TRIAGE_TREE_MIN_COVERAGE,
+        reload_interval=config.TRIAGE_TREE_RELOAD_SECONDS,
+    )
+# -------------------------
+
+# --- Metrics and Tracing ---
+LLM_IN_FLIGHT = metrics_registry.register(Gauge(
+    "symptom_checker_llm_in_flight", "LLM calls currently in flight."))
+RESPONSE_CACHE = metrics_registry.register(Gauge(
+    "symptom_checker_response_cache", "Response cache counters and size.", ("stat",)))
+ANALYSIS_WRITER = metrics_registry.register(Gauge(
+    "symptom_checker_analysis_writer", "Analysis write queue depth and counters.", ("stat",)))
+RESPONSE_PARSING = metrics_registry.register(Gauge(
+    "symptom_checker_response_parsing", "Response parse failure and repair counters.", ("branch", "stat")))
+RED_FLAG_HITS = metrics_registry.register(Counter(
+    "symptom_checker_red_flags_total", "Conversations answered by the local red-flag engine, by rule.", ("rule",)))
+ADMISSION = metrics_registry.register(Gauge(
+    "symptom_checker_admission", "Coalesced requests and rate-limit rejections.", ("stat",)))
+MODEL_PROVIDERS = metrics_registry.register(Gauge(
+    "symptom_checker_model_providers",
+    "Model provider call counters and circuit state (0 closed, 1 half open, 2 open).",
+    ("provider", "stat")))
+TRIAGE_TREE = metrics_registry.register(Gauge(
+    "symptom_checker_triage_tree", "Triage tree size, loads and lookup counters.", ("stat",)))
+
+
+def setup_tracing():
+    from phoenix.otel import register
+
+    tracer_provider = register(
+        project_name="Symptom_Tracker",
+        endpoint=config.PHOENIX_COLLECTOR_ENDPOINT + "/v1/traces",
+    )
+    enable_tracing(tracer_provider.get_tracer("symptom_checker"))
 # -------------------------
 
 # --- Database Configuration ---
-try:
-    mongo_client = MongoClient(config.MONGODB_CONNECTION_STRING)
-    db = mongo_client[config.MONGODB_DB_NAME]
-    symptom_histories = db.symptomHistories         
-    print("MongoDB connection successful.")
-except Exception as e:
-    print(f"MongoDB connection failed: {e}")        
+def create_mongo_client():
+    from pymongo import MongoClient
+
+    # Connects in the background on first use instead of blocking here
+    return MongoClient(config.MONGODB_CONNECTION_STRING, connect=False)
+
+
+mongo_client = LazyProxy(create_mongo_client)
+
+
+def collection(name):
+    """A collection of the service database, resolved on first use in each worker."""
+    return LazyProxy(lambda: resolve(mongo_client)[config.MONGODB_DB_NAME][name])
+
+
+symptom_histories = collection(HISTORY_COLLECTION)
+
+# Daily counts, users, causes and treatments, kept up to date as analyses are saved
+assessment_rollups = AssessmentRollups(collection('assessmentRollups'))
+
+# Final analyses are written in batches off the request path
+analysis_writer = AnalysisWriter(
+    symptom_histories,
+    batch_size=config.ANALYSIS_WRITE_BATCH_SIZE,
+    flush_interval=config.ANALYSIS_WRITE_INTERVAL_SECONDS,
+    max_retries=config.ANALYSIS_WRITE_MAX_RETRIES,
+    on_written=assessment_rollups.record,
+)
+
+if config.SESSION_STORE == 'mongodb':
+    session_store = MongoSessionStore(collection('symptomSessions'), ttl=config.SESSION_TTL_SECONDS)
+else:
+    session_store = InMemorySessionStore(ttl=config.SESSION_TTL_SECONDS)
 # ---------------------------
 
 
-@app.route('/api/symptom-checker', methods=['POST'])
-def symptom_check():
-    
+def save_final_analysis(user_id, history, response_json):
+    """Queue a final analysis to be saved to the signed-in user's symptom history."""
+    document = history_document(user_id, history, response_json)
+    if document is not None and analysis_writer.enqueue(document):
+        print(f"Final analysis queued for user {user_id}")
+
+
+def response_version(branch):
     """
-    Handles the conversational symptom check.
+    Version of the responses for a branch: a prompt, model provider, model
+    or output schema change (or a RESPONSE_CACHE_VERSION bump) stops cached
+    responses, including those on disk, from being served.
     """
-    data = request.get_json()
+    return cache_version(
+        config.RESPONSE_CACHE_VERSION,
+        SYSTEM_INSTRUCTIONS[branch],
+        [(provider.name, getattr(provider, 'model', None)) for provider in model_router.providers],
+        config.STRUCTURED_OUTPUT and RESPONSE_SCHEMAS[branch],
+    )
+
+
+def cache_key_for(branch, history):
+    """Cache key for a turn, or None when the turn must bypass the cache."""
+    if branch == FINAL:
+        return None
+    return make_cache_key(branch, history, response_version(branch))
+
+
+def cache_response(key, response_json):
+    """Cache a response unless it is a final analysis that must be persisted."""
+    if key is not None and not response_json.get('is_final'):
+        response_cache.set(key, response_json)
+
+
+def error_payload(e):
+    """Map an exception from the generation path to an error body, status code and headers."""
+    if isinstance(e, RateLimitedError):
+        retry_after = max(int(e.retry_after + 0.999), 1)
+        return {
+            "error": "Too many requests. Please wait before trying again.",
+            "retryAfter": retry_after,
+        }, 429, {"Retry-After": str(retry_after)}
+    if isinstance(e, LLMBusyError):
+        print(f"LLM capacity reached: {e}")
+        return {"error": "The AI service is busy. Please try again shortly."}, 503, {}
+    if isinstance(e, LLMTimeoutError):
+        print(f"LLM call timed out: {e}")
+        return {"error": "The AI service took too long to respond."}, 504, {}
+    if isinstance(e, ProviderUnavailableError):
+        print(f"No model provider available: {e}")
+        return {"error": "The AI service is temporarily unavailable."}, 503, {}
+    if isinstance(e, ResponseFormatError):
+        print(f"AI response was not valid JSON: {e}")
+        return {"error": "AI response was not valid JSON."}, 500, {}
+    print(f"An unexpected error occurred: {e}")
+    return {"error": "An unexpected error occurred with the AI service."}, 500, {}
+
+
+async def generation_config(prompt):
+    """
+    Generation config for a prompt. The static instruction goes in as cached
+    context when available, otherwise as the system instruction; structured
+    mode also requests schema-shaped JSON.
+    """
+    options = {}
+    cached_content = None
+    if context_cache is not None:
+        cached_content = await context_cache.name_for(prompt.branch, time.time())
+    if cached_content:
+        options['cached_content'] = cached_content
+    else:
+        options['system_instruction'] = prompt.system_instruction
+
+    if config.STRUCTURED_OUTPUT:
+        options['response_mime_type'] = 'application/json'
+        options['response_schema'] = RESPONSE_SCHEMAS[prompt.branch]
+
+    from google.genai import types
+
+    return types.GenerateContentConfig(**options)
+
+
+def record_usage(prompt, tokens):
+    """Record and log the token counts of one model call."""
+    usage_stats.record(prompt.branch, tokens)
+    record_tokens(prompt.branch, tokens)
+    print(f"Tokens ({prompt.branch}): input={tokens['input_tokens']} "
+          f"cached={tokens['cached_input_tokens']} output={tokens['output_tokens']}")
+
+
+async def call_model(prompt):
+    """Send a prompt to the model providers; runs on the LLM runtime loop."""
+    completion = await model_router.complete(prompt)
+    record_usage(prompt, completion.tokens)
+    return completion
+
+
+async def parse_with_repair(prompt, text):
+    """
+    Parse and validate a model response. A response that fails gets exactly
+    one repair attempt, in which the model is shown its output and the errors.
+    """
+    branch = prompt.branch
+    parse_stats.increment(branch, 'responses')
+    try:
+        return parse_response(branch, text)
+    except ResponseFormatError as e:
+        error = e
+
+    print(f"AI response failed validation ({branch}): {error}")
+    parse_stats.increment(branch, 'parse_failures')
+    parse_stats.increment(branch, 'repairs_attempted')
+    repair = prompt._replace(contents=repair_prompt(branch, text, error))
+    repaired = await llm_runtime.run(lambda: call_model(repair))
+
+    response_json = parse_response(branch, repaired.text)
+    parse_stats.increment(branch, 'repairs_succeeded')
+    return response_json
+
+
+def check_red_flags(history, user_id, timer):
+    """
+    Emergency analysis for a conversation whose answers match a red-flag
+    rule, saved like any other final analysis; None when nothing matches.
+    """
+    if red_flag_engine is None:
+        return None
+
+    with timer.stage('red_flags'):
+        matched = red_flag_engine.check(history)
+    if not matched:
+        return None
+
+    timer.branch = 'red_flag'
+    for rule in matched:
+        RED_FLAG_HITS.inc(rule['id'])
+    response_json = red_flag_engine.emergency_analysis(matched)
+    with timer.stage('db_write'):
+        save_final_analysis(user_id, history, response_json)
+    return response_json
+
+
+def check_triage_tree(history, timer):
+    """Next question from the triage tree for a common path; None when the model must answer."""
+    if triage_tree is None or len(history) >= MAX_QUESTIONS:
+        return None
+
+    with timer.stage('triage_tree'):
+        response_json = triage_tree.lookup(history)
+    if response_json is not None:
+        timer.branch = 'triage_tree'
+    return response_json
+
+
+def admit_model_call(user_id):
+    """Take a token from the user's bucket before a model call; raises RateLimitedError."""
+    if user_limiter is not None:
+        user_limiter.acquire(str(user_id))
+
+
+async def generate_response(history, user_id, conversation=None, timer=None):
+    """
+    Produce the next symptom checker response for a conversation.
+    `conversation` is the already rendered history, when the caller keeps one.
+    """
+    timer = timer or RequestTimer('internal')
+
+    emergency = check_red_flags(history, user_id, timer)
+    if emergency is not None:
+        return emergency
+    known = check_triage_tree(history, timer)
+    if known is not None:
+        return known
+
+    with timer.stage('prompt_build'):
+        prompt = build_prompt(history, conversation)
+    timer.branch = prompt.branch
+
+    with timer.stage('cache_lookup'):
+        cache_key = cache_key_for(prompt.branch, history)
+        cached = response_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        return cached
+
+    admit_model_call(user_id)
+    with timer.stage('llm_call'):
+        response = await llm_runtime.run(lambda: call_model(prompt))
+
+    with timer.stage('json_parse'):
+        response_json = await parse_with_repair(prompt, response.text)
+
+    print("Response JSON:", response_json)
+    # If the analysis is final, save it to the database
+    with timer.stage('db_write'):
+        if response_json.get('is_final'):
+            save_final_analysis(user_id, history, response_json)
+        cache_response(cache_key, response_json)
+
+    return response_json
+
+
+# --- Model-backed Routes ---
+# Shared by the Flask views below and the native ASGI routes in asgi_app.py
+async def symptom_check_response(data, timer):
+    """Body, status code and headers for a stateless symptom check turn."""
     if not data or 'history' not in data or 'userId' not in data:
-        return jsonify({"error": "Invalid request. 'history' and 'userId' are required."}), 400
+        timer.finish(400)
+        return {"error": "Invalid request. 'history' and 'userId' are required."}, 400, {}
 
     history = data.get('history', [])
     user_id = data.get('userId')
-    conversation = "\n".join([f"Q: {item.get('question', '')}\nA: {item.get('answer', '')}" for item in history])
-
-    if len(history) >= 10:
-        
-        # For final analysis
-        prompt = f"""
-            The conversation history is:\n{conversation}\n
-            You have reached the maximum number of questions (10).
-            
-            You are an AI Medical Analyst. Your function is to synthesize the entirety of a user's conversation into a structured, educational, and safe final analysis. You must act with the utmost caution, prioritizing user safety and clarity.
-
-            CORE PRINCIPLES:
-            1. Synthesize, Don't Diagnose: Your analysis is a summary of information and possibilities, not a medical diagnosis.
-            2. Stratify Risk: Clearly differentiate between conditions that can be managed at home, those that require a doctor's visit, and those that are urgent.
-            3. Provide Rationale: Do not simply state possibilities. Briefly explain why the user's symptoms align with a particular suggestion. This demonstrates your reasoning.
-                        
-            INSTRUCTIONS:          
-            1. Summarize: Briefly summarize the key symptoms the user has described.
-            2. Suggest Causes: List 2-3 potential, common causes for the symptoms. Do not list rare or life-threatening conditions unless it is a clear emergency.
-            3. Treatment Plans: Suggest safe, general next steps. NEVER prescribe medication. Focus on actions like "Consult a healthcare professional," "Monitor your symptoms," or "Consider over-the-counter pain relievers if appropriate."            
-            
-            """ + """
-            Format the output as a single JSON object with the following keys:
-            'summary': A brief summary of the key symptoms.
-            'suggested_causes': A list of 2-3 potential causes for the symptoms.
-            'treatment_plans': A list of 2-3 recommended actions for the user.
-            'is_final': A boolean indicating whether this is the final response.
-            
-            Example: 
-            {
-                "summary": "...",
-                "suggested_causes": [
-                    {"name": "...", "description": "..."}
-                ],
-                "treatment_plans": [
-                    {"action": "...", "details": "..."}
-                ],
-                "is_final": true
-            }          
-            
-            """
-        
-    elif len(history) == 0:
-        # For Initial question
-        prompt = """
-            You are a helpful and professional AI Medical Assistant. Your goal is to initiate a conversation to understand a user's health concern in a welcoming and clear manner.
-
-            YOUR TASK:
-            Generate the very first message for the user. This message must include:
-
-            1. A brief, friendly greeting.
-            2. A single, clear question to identify their primary symptom.
-            3. A list of 5-6 common, high-level symptom categories as options.
-            4. An "Other" option to ensure the user can always proceed.   
-            
-            FORMATTING INSTRUCTIONS:
-            Format the output as a single JSON object with the following keys:
-            'question': The question to ask the user.
-            'options': A list of options for the user to choose from.
-            'is_final': A boolean indicating whether this is the final response.
-            
-            Example: 
-            {
-                "question": "What is the primary symptom or health concern you are experiencing?",
-                "options": [
-                    "Head, Neck, or Throat Issue",
-                    "Chest or Abdominal Pain",
-                    "Fever or Flu-like Symptoms",
-                    "Skin Issue (e.g., rash, lump)",
-                    "Dizziness or Weakness",
-                    "Something else"
-                ],
-                "is_final": false
-            }
-            """
-    else:
-        # For follow-up questions
-        prompt = f"""
-            You are an AI Medical Triage Assistant. Your primary goal is to help users understand their symptoms by asking targeted questions. You must be empathetic, clear, and cautious.
-
-            CRITICAL DIRECTIVES:
-            You are NOT a doctor. Your analysis is not a diagnosis. Your primary function is to gather information and suggest appropriate next steps.
-            Emergency Detection: If at any point the user's symptoms suggest a medical emergency (e.g., severe chest pain, difficulty breathing, uncontrolled bleeding, sudden confusion, signs of a stroke), your only response must be a final analysis advising them to contact emergency services immediately.
-
-            YOUR TASK:
-            Based on the provided {conversation}, determine the next logical step.
-            Analyze the Conversation: Review the user's symptoms and your previous questions.
-
-            Decide Your Action:
-            If more information is needed and you are under the 10-question limit, ask the single most important follow-up question to narrow down the potential causes.
-            If you have enough information or have reached the 10-question limit, provide a final analysis.
-
-            """ + """
-            INSTRUCTIONS FOR ASKING A QUESTION:
-            Formulate a Question: Base your question on a standard diagnostic framework (e.g., OPQRST: Onset, Provocation/Palliation, Quality, Region/Radiation, Severity, Timing). For example, ask about the symptom's location, what makes it better or worse, its duration, or its severity.
-            Provide Options: Offer 4-5 clear, distinct, and helpful multiple-choice options.
-            
-            Format: 
-            Respond with the following JSON structure:
-            {
-                "question": "...", 
-                "options": ["...", "...", "..."], 
-                "is_final": false
-            }    
-            
-            """
-
-
-
-    # Generate response
+
+    # Double-clicks and retries of an in-flight request wait for its result
+    flight_key = (str(user_id), make_cache_key('request', history))
+    try:
+        response_json, shared = await single_flight.run(
+            flight_key, lambda: generate_response(history, user_id, timer=timer))
+        if shared:
+            timer.branch = 'coalesced'
+    except Exception as e:
+        body, status, headers = error_payload(e)
+        timer.finish(status)
+        return body, status, headers
+
+    timer.finish(200)
+    return response_json, 200, {}
+
+
+async def session_turn_response(session_id, data, timer):
+    """Body, status code and headers for one turn of a server-side session."""
+    data = data or {}
     try:
+        session = await asyncio.to_thread(session_store.get, session_id)
+        if session.get('pendingQuestion') is not None:
+            if 'answer' not in data:
+                timer.finish(400)
+                return {"error": "Invalid request. 'answer' is required."}, 400, {}
+            with timer.stage('session_update'):
+                session = await asyncio.to_thread(session_store.append_answer, session_id, data.get('answer'))
+    except SessionNotFoundError:
+        timer.finish(404)
+        return {"error": "Session not found or expired."}, 404, {}
+    except SessionConflictError:
+        timer.finish(409)
+        return {"error": "This question has already been answered."}, 409, {}
 
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,)
-        # config=GenerateContentConfig(
-        #     system_instruction=system_instruction,
-        #     ))
-        
-        # Clean the response to ensure it's valid JSON
-        cleaned_text = response.text.strip().lstrip('```json').rstrip('```').strip()
-        response_json = json.loads(cleaned_text)
-        
-        print("Response JSON:", response_json)
-        # If the analysis is final, save it to the database
+    # A retried turn reaches here after its answer was recorded; it waits for the first one's question
+    flight_key = ('session', session_id, len(session['history']))
+    try:
+        response_json, shared = await single_flight.run(flight_key, lambda: generate_response(
+            session['history'], session['userId'], session['conversation'], timer=timer))
+        if shared:
+            timer.branch = 'coalesced'
+    except Exception as e:
+        body, status, headers = error_payload(e)
+        timer.finish(status)
+        return body, status, headers
+
+    with timer.stage('session_update'):
         if response_json.get('is_final'):
-            try:
-                # Use update_one with upsert=True to create a new document if one doesn't exist.
-                # This is a more robust approach than finding and then updating.
-                symptom_histories.update_one(
-                    {'userId': user_id, 'createdAt': datetime.datetime.now()},
-                    {'$set': {
-                        'analysis': response_json,
-                        'symptoms': history
-                        }
-                    },
-                )
-                print(f"Final analysis saved for user {user_id}")
-            except Exception as e:
-                print(f"Error saving to MongoDB: {e}")
-
-        return jsonify(response_json)
-    
-    
+            await asyncio.to_thread(session_store.delete, session_id)
+        else:
+            await asyncio.to_thread(session_store.set_pending_question, session_id, response_json.get('question', ''))
+
+    timer.finish(200)
+    return response_json, 200, {}
+
+
+def start_stream(data, timer):
+    """
+    Validate a streaming request. Returns an error (body, status code,
+    headers) and None, or None and an async iterator of SSE events.
+    """
+    if not data or 'history' not in data or 'userId' not in data:
+        timer.finish(400)
+        return ({"error": "Invalid request. 'history' and 'userId' are required."}, 400, {}), None
+
+    history = data.get('history', [])
+    user_id = data.get('userId')
+
+    emergency = check_red_flags(history, user_id, timer)
+    if emergency is not None:
+        return None, single_event(timer, emergency)
+    known = check_triage_tree(history, timer)
+    if known is not None:
+        return None, single_event(timer, known)
+
+    with timer.stage('prompt_build'):
+        prompt = build_prompt(history)
+    timer.branch = prompt.branch
+
+    with timer.stage('cache_lookup'):
+        cache_key = cache_key_for(prompt.branch, history)
+        cached = response_cache.get(cache_key) if cache_key is not None else None
+    if cached is not None:
+        return None, single_event(timer, cached)
+
+    try:
+        admit_model_call(user_id)
+    except RateLimitedError as e:
+        body, status, headers = error_payload(e)
+        timer.finish(status)
+        return (body, status, headers), None
+    flight_key = ('stream', str(user_id), make_cache_key('request', history))
+    return None, analysis_events(prompt, history, user_id, cache_key, flight_key, timer)
+
+
+async def single_event(timer, response_json):
+    timer.finish(200)
+    yield sse_event('result', response_json)
+
+
+async def shared_events(timer, future):
+    """The `result` (or `error`) event of an identical stream already in flight."""
+    timer.branch = 'coalesced'
+    try:
+        response_json = await asyncio.wrap_future(future)
+    except Exception as e:
+        body, status, _ = error_payload(e)
+        timer.finish(status)
+        yield sse_event('error', {**body, "status": status})
+        return
+    timer.finish(200)
+    yield sse_event('result', response_json)
+
+
+async def analysis_events(prompt, history, user_id, cache_key, flight_key, timer):
+    """
+    SSE events of a streamed model response: parts of a final analysis as
+    they complete, then `result` (or `error`). The model call runs on the
+    LLM runtime loop and hands its chunks to the caller's loop. Identical
+    streams started meanwhile (`flight_key`) only get the `result` event.
+
+    Only Gemini streams. While its circuit is open, or when its stream fails
+    before the first chunk, the prompt goes through the model router instead
+    and the analysis arrives as the `result` event alone.
+    """
+    # Claimed once the stream is read, so a stream that is never read holds no flight
+    flight, leader = single_flight.claim(flight_key)
+    if not leader:
+        async for event in shared_events(timer, flight):
+            yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    fallback = []
+
+    def put(text):
+        loop.call_soon_threadsafe(chunks.put_nowait, text)
+
+    async def complete():
+        completion = await call_model(prompt)
+        fallback.append(completion.text)
+
+    async def pump():
+        breaker = model_router.breakers.get('gemini')
+        if breaker is None or not breaker.allow():
+            await complete()
+            return
+        started = False
+        try:
+            stream = await client.aio.models.generate_content_stream(
+                model=GEMINI_MODEL,
+                contents=prompt.contents,
+                config=await generation_config(prompt),)
+            usage = None
+            async for chunk in stream:
+                started = True
+                put(chunk.text or "")
+                usage = chunk.usage_metadata or usage
+        except asyncio.CancelledError:
+            # The client went away; says nothing about Gemini's health
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            if started:
+                raise
+            print(f"Gemini stream failed before its first chunk, falling back to the router: {e}")
+            await complete()
+            return
+        breaker.record_success()
+        record_usage(prompt, gemini_tokens(usage))
+
+    future = llm_runtime.submit(pump)
+    future.add_done_callback(lambda _: put(None))
+    parser = IncrementalJSONParser()
+
+    try:
+        # Covers the whole stream, including the time clients take to read it
+        with timer.stage('llm_call'):
+            while (text := await chunks.get()) is not None:
+                for event, value in parser.feed(text):
+                    yield sse_event(event, value)
+            await asyncio.wrap_future(future)
+
+        with timer.stage('json_parse'):
+            response_json = await parse_with_repair(prompt, fallback[0] if fallback else parser.buffer)
+        # Save once, after the whole analysis has been received
+        with timer.stage('db_write'):
+            if response_json.get('is_final'):
+                save_final_analysis(user_id, history, response_json)
+            cache_response(cache_key, response_json)
+        single_flight.settle(flight_key, flight, response_json)
+        timer.finish(200)
+        yield sse_event('result', response_json)
+
+    except Exception as e:
+        single_flight.settle(flight_key, flight, error=e)
+        body, status, _ = error_payload(e)
+        timer.finish(status)
+        yield sse_event('error', {**body, "status": status})
+    finally:
+        # A client that disconnects mid-stream stops the model call
+        future.cancel()
+        if not flight.done():
+            single_flight.settle(flight_key, flight, error=ConnectionAbortedError("The stream was closed"))
+
+
+SSE_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+# -------------------------
+
+
+@api.route('/api/symptom-checker', methods=['POST'])
+async def symptom_check():
     
-    # Exception Handling
-    except json.JSONDecodeError:
-        print("AI response was not valid JSON.")
-        return jsonify({"error": "AI response was not valid JSON."}), 500
+    """
+    Handles the conversational symptom check.
+    """
+    timer = RequestTimer('symptom_check')
+    with timer.stage('request_parse'):
+        data = request.get_json()
+    body, status, headers = await symptom_check_response(data, timer)
+    return jsonify(body), status, headers
+
+
+@api.route('/api/symptom-checker/session', methods=['POST'])
+def create_symptom_check_session():
+    """
+    Starts a server-side symptom check session.
+    Later turns only send the newest answer to the session's turn endpoint.
+    """
+    data = request.get_json()
+    if not data or 'userId' not in data:
+        return jsonify({"error": "Invalid request. 'userId' is required."}), 400
+
+    session = session_store.create(data.get('userId'))
+    return jsonify({"sessionId": session['_id']}), 201
+
+
+@api.route('/api/symptom-checker/session/<session_id>', methods=['POST'])
+async def symptom_check_session_turn(session_id):
+    """
+    Handles one turn of a session: records the answer to the question the
+    session is waiting on (if any) and returns the next response.
+    """
+    timer = RequestTimer('session_turn')
+    with timer.stage('request_parse'):
+        data = request.get_json(silent=True)
+    body, status, headers = await session_turn_response(session_id, data, timer)
+    return jsonify(body), status, headers
+
+
+@api.route('/api/symptom-checker/stream', methods=['POST'])
+def symptom_check_stream():
+    """
+    Streaming variant of the symptom check.
+    Sends the response as Server-Sent Events: `summary`, `cause` and
+    `treatment` as soon as each part of a final analysis is complete, then
+    `result` with the whole response (or `error`).
+    """
+    timer = RequestTimer('stream')
+    with timer.stage('request_parse'):
+        data = request.get_json()
+    error, events = start_stream(data, timer)
+    if error is not None:
+        body, status, headers = error
+        return jsonify(body), status, headers
+
+    return Response(
+        stream_with_context(iterate_sync(events)),
+        mimetype='text/event-stream',
+        headers=SSE_HEADERS,
+    )
+
+
+@api.route('/api/analytics', methods=['GET'])
+def assessment_analytics():
+    """
+    Assessment totals, unique users, common causes and treatments and daily
+    counts for a date range, read from the pre-aggregated rollups.
+    Query parameters: startDate and endDate (YYYY-MM-DD, inclusive; the
+    last 30 days by default) and limit (top causes and treatments, default 10).
+    """
+    today = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d')
+    try:
+        end = parse_day(request.args.get('endDate') or today)
+        start = parse_day(request.args.get('startDate')) if request.args.get('startDate') \
+            else end - datetime.timedelta(days=29)
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({"error": "Invalid request. Dates must be YYYY-MM-DD and limit a number."}), 400
+    if start > end:
+        return jsonify({"error": "Invalid request. 'startDate' is after 'endDate'."}), 400
+
+    try:
+        return jsonify(assessment_rollups.summary(start, end, limit))
+    except Exception as e:
+        print(f"Error reading assessment rollups: {e}")
+        return jsonify({"error": "Could not load analytics."}), 500
+
+
+@api.route('/api/stats', methods=['GET'])
+def service_stats():
+    """Reports response cache and analysis write queue counters."""
+    return jsonify({
+        "responseCache": response_cache.stats(),
+        "analysisWriter": analysis_writer.stats(),
+        "assessmentRollups": {"recorded": assessment_rollups.recorded, "failures": assessment_rollups.failures},
+        "responseParsing": parse_stats.stats(),
+        "tokenUsage": usage_stats.stats(),
+        "modelProviders": model_router.stats(),
+        "singleFlight": single_flight.stats(),
+        "rateLimit": user_limiter.stats() if user_limiter is not None else None,
+        "triageTree": triage_tree.stats() if triage_tree is not None else None,
+    })
+
+
+CIRCUIT_STATES = ["closed", "half_open", "open"]
+
+
+def collect_service_metrics():
+    """Refresh the gauges that mirror the service's internal counters."""
+    LLM_IN_FLIGHT.set(value=llm_runtime.in_flight)
+    for stat, value in response_cache.stats().items():
+        RESPONSE_CACHE.set(stat, value=value)
+    for stat, value in analysis_writer.stats().items():
+        ANALYSIS_WRITER.set(stat, value=value)
+    for branch, counts in parse_stats.stats().items():
+        for stat, value in counts.items():
+            RESPONSE_PARSING.set(branch, stat, value=value)
+    ADMISSION.set('coalesced', value=single_flight.coalesced)
+    ADMISSION.set('rate_limited', value=user_limiter.rejected if user_limiter is not None else 0)
+    for provider, counts in model_router.stats().items():
+        for stat, value in counts.items():
+            if stat == 'circuit':
+                value = CIRCUIT_STATES.index(value)
+            MODEL_PROVIDERS.set(provider, stat, value=value)
+    if triage_tree is not None:
+        for stat, value in triage_tree.stats().items():
+            TRIAGE_TREE.set(stat, value=value)
+
+
+metrics_registry.add_collector(collect_service_metrics)
+# With several workers a scrape reaches any one of them; each then reports all of them
+metrics_collector = None
+if config.METRICS_MULTIPROC_DIR:
+    metrics_collector = MultiProcessCollector(
+        metrics_registry, config.METRICS_MULTIPROC_DIR, interval=config.METRICS_SNAPSHOT_SECONDS)
+
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    body = metrics_collector.render() if metrics_collector is not None else metrics_registry.render()
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+# --- Warm-up and Readiness ---
+def create_indexes():
+    try:
+        ensure_indexes(symptom_histories)
+        assessment_rollups.ensure_indexes()
+        if isinstance(session_store, MongoSessionStore):
+            session_store.ensure_indexes()
+    except Exception as e:
+        print(f"Could not create MongoDB indexes: {e}")
+
+
+def ping_model_providers():
+    # Runs on the LLM runtime loop, where the provider clients live; a busy
+    # worker is still ready, so the ping does not take a model call slot
+    return llm_runtime.submit(model_router.ping, timeout=config.READINESS_TIMEOUT_SECONDS, capped=False).result()
+
+
+readiness = ReadinessProbe(
+    {
+        "mongodb": lambda: resolve(mongo_client).admin.command('ping'),
+        "llm": ping_model_providers,
+    },
+    timeout=config.READINESS_TIMEOUT_SECONDS,
+    cache_seconds=config.READINESS_CACHE_SECONDS,
+)
+
+
+def warm_up():
+    """
+    Create this worker's clients, background threads and the database
+    indexes before the first request needs them.
+    """
+    started = time.perf_counter()
+    llm_runtime.loop  # starts the runtime loop thread
+    if metrics_collector is not None:
+        metrics_collector.start()
+    try:
+        resolve(client)
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return jsonify({"error": "An unexpected error occurred with the AI service."}), 500
+        print(f"Could not create the Gemini client: {e}")
+    if triage_tree is not None:
+        triage_tree.start()
+    if config.OTEL_TRACING:
+        setup_tracing()
+    create_indexes()
+    ready, checks = readiness.check(force=True)
+    unreachable = ", ".join(name for name, result in checks.items() if not result["ok"])
+    print(f"Worker {os.getpid()} warmed up in {time.perf_counter() - started:.1f}s"
+          + ("" if ready else f"; not reachable: {unreachable}"))
+
+
+def _start_warm_up_thread():
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+warm_up_thread = PerProcess(_start_warm_up_thread)
+
+
+def start_warm_up():
+    """Warm this worker up in the background, once per process."""
+    warm_up_thread.get()
+
 
+def warmed_up() -> bool:
+    return warm_up_thread.created and not warm_up_thread.get().is_alive()
+
+
+@api.route('/healthz', methods=['GET'])
+def health():
+    """Liveness: the worker is running and answering requests."""
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
+@api.route('/readyz', methods=['GET'])
+def readiness_check():
+    """Readiness: the worker has warmed up and can reach MongoDB and a model provider."""
+    start_warm_up()
+    if not warmed_up():
+        return jsonify({"status": "warming_up", "pid": os.getpid()}), 503
+
+    ready, checks = readiness.check()
+    return jsonify({
+        "status": "ready" if ready else "unavailable",
+        "pid": os.getpid(),
+        "checks": checks,
+    }), 200 if ready else 503
+# -------------------------
+
+
+def create_app(warm: bool = config.WARM_UP, cors: bool = True):
+    """
+    App factory for WSGI servers; `warm` starts the worker's warm-up right
+    away. `cors` is off when the ASGI app, which adds CORS itself, mounts it.
+    """
+    flask_app = Flask(__name__)
+    if cors:
+        CORS(flask_app)  # Enable CORS for all routes
+    flask_app.register_blueprint(api)
+    if warm:
+        start_warm_up()
+    return flask_app
+
+
+# Built without warming up, so importing the module stays cheap
+app = create_app(warm=False)
 
 
 # Main Component Server
 if __name__ == '__main__':
+    start_warm_up()
     app.run(port=5328, debug=True)
-
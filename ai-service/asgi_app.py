@@ -0,0 +1,74 @@
+"""
+ASGI entry point of the symptom checker service.
+
+The model-backed routes are served natively: a request awaits its model
+call on the shared LLM runtime loop without holding a thread, so one worker
+keeps hundreds of conversations open, with up to LLM_MAX_IN_FLIGHT model
+calls at a time. Every other route is the Flask app, mounted on a small
+thread pool (WSGI_THREADS).
+
+    gunicorn -c gunicorn.conf.py 'asgi_app:create_asgi_app()'
+    uvicorn --factory asgi_app:create_asgi_app --port 5328
+"""
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as service
+from metrics import RequestTimer
+
+
+async def read_json(request):
+    """The request's JSON body, or None when it is missing or malformed."""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def symptom_check(request):
+    timer = RequestTimer('symptom_check')
+    with timer.stage('request_parse'):
+        data = await read_json(request)
+    body, status, headers = await service.symptom_check_response(data, timer)
+    return JSONResponse(body, status, headers)
+
+
+async def symptom_check_session_turn(request):
+    timer = RequestTimer('session_turn')
+    with timer.stage('request_parse'):
+        data = await read_json(request)
+    body, status, headers = await service.session_turn_response(request.path_params['session_id'], data, timer)
+    return JSONResponse(body, status, headers)
+
+
+async def symptom_check_stream(request):
+    timer = RequestTimer('stream')
+    with timer.stage('request_parse'):
+        data = await read_json(request)
+    error, events = service.start_stream(data, timer)
+    if error is not None:
+        body, status, headers = error
+        return JSONResponse(body, status, headers)
+    return StreamingResponse(events, media_type='text/event-stream', headers=service.SSE_HEADERS)
+
+
+def create_asgi_app(warm: bool = service.config.WARM_UP):
+    """App factory for ASGI servers; `warm` starts the worker's warm-up right away."""
+    routes = [
+        Route('/api/symptom-checker', symptom_check, methods=['POST']),
+        Route('/api/symptom-checker/session/{session_id}', symptom_check_session_turn, methods=['POST']),
+        Route('/api/symptom-checker/stream', symptom_check_stream, methods=['POST']),
+        Mount('/', WSGIMiddleware(service.create_app(warm=False, cors=False),
+                                  workers=service.config.WSGI_THREADS)),
+    ]
+    asgi_app = Starlette(routes=routes, middleware=[
+        # Enable CORS for all routes, the mounted Flask ones included
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+    ])
+    if warm:
+        service.start_warm_up()
+    return asgi_app
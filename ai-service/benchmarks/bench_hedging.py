@@ -0,0 +1,123 @@
+"""
+Benchmark of request hedging and circuit breaking against fake providers.
+
+Every scenario sends the same stream of follow-up prompts through a
+`HedgedRouter` at a fixed concurrency:
+
+    single    one provider with latency spikes, no backup
+    hedged    the same provider with a second one to hedge to
+    outage    the primary fails for the middle third of the run
+    no-break  the same outage with circuit breaking disabled
+
+Example:
+    python benchmarks/bench_hedging.py --requests 2000 --spike-rate 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import percentile  # noqa: E402
+from fakes import FakeProvider, LatencyModel  # noqa: E402
+from prompts import build_prompt  # noqa: E402
+from providers import HedgedRouter, ProviderUnavailableError  # noqa: E402
+
+HISTORY = [{"question": "What is your main symptom?", "answer": "Headache, Migraine, or Head Injury"}]
+
+
+def make_provider(name, args, seed):
+    latency = LatencyModel(medians={"follow_up": args.median_ms / 1000}, sigma=args.sigma, seed=seed)
+    return FakeProvider(name, latency, spike_rate=args.spike_rate, spike_factor=args.spike_factor, seed=seed)
+
+
+async def run_scenario(name, args):
+    primary = make_provider("primary", args, args.seed)
+    providers = [primary]
+    if name != "single":
+        providers.append(make_provider("backup", args, args.seed + 1))
+    router = HedgedRouter(
+        providers,
+        hedge_percentile=args.percentile,
+        initial_delay=args.median_ms * 3 / 1000,
+        min_samples=20,
+        failure_threshold=10 ** 9 if name == "no-break" else args.failure_threshold,
+        reset_timeout=args.reset_ms / 1000,
+    )
+
+    prompt = build_prompt(HISTORY)
+    latencies, errors = [], 0
+    slots = asyncio.Semaphore(args.concurrency)
+    outage = range(args.requests // 3, 2 * args.requests // 3) if name in ("outage", "no-break") else range(0)
+
+    async def one(index):
+        nonlocal errors
+        async with slots:
+            primary.outage = index in outage
+            started = time.perf_counter()
+            try:
+                await router.complete(prompt)
+            except ProviderUnavailableError:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(args.requests)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    stats = router.stats()
+    return {
+        "scenario": name,
+        "requests": args.requests,
+        "errors": errors,
+        "duration_s": duration,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "provider_calls": sum(counts["calls"] for counts in stats.values()),
+        "hedges": sum(counts["hedges"] for counts in stats.values()),
+        "providers": stats,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hedging and circuit breaking with fake providers.")
+    parser.add_argument('--scenarios', default='single,hedged,outage,no-break')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--median-ms', type=float, default=100, help="Median provider latency")
+    parser.add_argument('--sigma', type=float, default=0.35)
+    parser.add_argument('--spike-rate', type=float, default=0.05, help="Share of calls slowed by --spike-factor")
+    parser.add_argument('--spike-factor', type=float, default=8.0)
+    parser.add_argument('--percentile', type=float, default=95, help="Latency percentile that triggers a hedge")
+    parser.add_argument('--failure-threshold', type=int, default=5)
+    parser.add_argument('--reset-ms', type=float, default=500)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.scenarios.split(','):
+        # The router logs every provider failure; keep that out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = asyncio.run(run_scenario(name, args))
+        results.append(result)
+        print(f"{name:<9} p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms "
+              f"p99={result['p99_ms']:7.1f}ms errors={result['errors']:>4} "
+              f"calls={result['provider_calls']:>5} hedges={result['hedges']:>4}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark of the red-flag engine against the size of its rule set.
+
+The shipped rules are padded with synthetic rules to several sizes, and each
+engine checks a typical 10-answer conversation (no match) and an emergency
+conversation (match on the last answer).
+
+Example:
+    python benchmarks/bench_red_flags.py --sizes 10,100,1000,5000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from red_flags import RedFlagEngine  # noqa: E402
+
+WORDS = (
+    "sudden severe sharp pain swelling bleeding numbness weakness vision loss fever rash "
+    "breathing chest arm leg face neck back stomach head throat tongue skin spreading rapid"
+).split()
+
+CALM_HISTORY = [
+    {"question": "What is your main symptom?", "answer": "Headache, Migraine, or Head Injury"},
+    {"question": "Describe the pain.", "answer": "Pressure"},
+    {"question": "Where is it?", "answer": "Forehead"},
+    {"question": "Other symptoms?", "answer": "Nasal congestion or runny nose"},
+    {"question": "How long?", "answer": "More than a week"},
+    {"question": "Fever?", "answer": "Fever"},
+    {"question": "How high?", "answer": "Low-grade (under 100.4°F) and manageable with medication"},
+    {"question": "Tenderness?", "answer": "Yes, significant pain or tenderness"},
+    {"question": "Tooth pain?", "answer": "No tooth or jaw pain, no change with position"},
+    {"question": "Fatigue?", "answer": "No, I haven't felt fatigued or had muscle aches."},
+]
+EMERGENCY_HISTORY = CALM_HISTORY[:9] + [{"question": "Anything else?", "answer": "Now I suddenly have slurred speech"}]
+
+
+def synthetic_rules(count: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"synthetic_{i}",
+            "name": f"Synthetic rule {i}",
+            "description": "Generated for benchmarking.",
+            "patterns": [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))) + f" x{i}" for _ in range(5)],
+        }
+        for i in range(count)
+    ]
+
+
+def time_per_call(function, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the red-flag engine against rule set size.")
+    parser.add_argument('--sizes', default='10,100,1000,5000', help="Comma separated rule counts")
+    parser.add_argument('--iterations', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    with open(os.path.join(SERVICE_DIR, 'red_flags.json'), encoding='utf-8') as f:
+        shipped = json.load(f)
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(',')]:
+        rules = shipped["rules"] + synthetic_rules(max(size - len(shipped["rules"]), 0), args.seed)
+        started = time.perf_counter()
+        engine = RedFlagEngine(rules, shipped["advice"])
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        assert not engine.check(CALM_HISTORY)
+        assert engine.check(EMERGENCY_HISTORY)
+        row = {
+            "rules": len(rules),
+            "patterns": sum(len(rule["patterns"]) for rule in rules),
+            "compile_ms": compile_ms,
+            "no_match_us": time_per_call(lambda: engine.check(CALM_HISTORY), args.iterations),
+            "match_us": time_per_call(lambda: engine.check(EMERGENCY_HISTORY), args.iterations),
+        }
+        results.append(row)
+        print(f"rules={row['rules']:>5} patterns={row['patterns']:>6} compile={row['compile_ms']:8.1f}ms "
+              f"no-match={row['no_match_us']:7.1f}us match={row['match_us']:7.1f}us")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
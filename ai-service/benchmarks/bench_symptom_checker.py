@@ -0,0 +1,219 @@
+"""
+Load test and latency benchmark for /api/symptom-checker.
+
+The Gemini client and the symptomhistories collection are replaced with the
+in-process fakes from fakes.py, so runs cost nothing and are repeatable.
+Simulated patients replay 0-10 turn conversations, picking answers from the
+returned options, at several concurrency levels. Throughput and p50/p95/p99
+latency per prompt branch are printed and written as JSON; pass an earlier
+results file with --compare to see the change between commits.
+
+Example:
+    python benchmarks/bench_symptom_checker.py --levels 1,16,64 \
+        --conversations 200 --output bench_results.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeCollection, FakeGenaiClient, LatencyModel  # noqa: E402
+from metrics import percentile  # noqa: E402
+
+
+def branch_for(history) -> str:
+    if not history:
+        return "opening"
+    return "final" if len(history) >= 10 else "follow_up"
+
+
+def load_service(args):
+    """Import the service with its model client and database swapped for fakes."""
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    # Never contacted: the fake collections replace the lazily created ones
+    os.environ.setdefault('MONGODB_CONNECTION_STRING', 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=50')
+    os.environ.setdefault('MONGODB_DB_NAME', 'benchmark')
+    os.environ['LLM_MAX_IN_FLIGHT'] = str(args.max_in_flight)
+    os.environ['USER_RATE_LIMIT_PER_MINUTE'] = str(args.rate_limit)
+    if not args.cache:
+        os.environ['RESPONSE_CACHE_MAX_ENTRIES'] = '0'
+
+    import app as service
+
+    latency = LatencyModel(
+        medians={"opening": args.opening_ms / 1000, "follow_up": args.follow_up_ms / 1000, "final": args.final_ms / 1000},
+        sigma=args.sigma,
+        failure_rate=args.failure_rate,
+        seed=args.seed,
+    )
+    histories = FakeCollection(write_latency=args.db_ms / 1000)
+    service.client = FakeGenaiClient(latency)
+    service.model_router.provider('gemini').client = service.client
+    service.symptom_histories = histories
+    service.analysis_writer.collection = histories
+    service.assessment_rollups.collection = FakeCollection()
+    return service, histories
+
+
+def run_conversation(app, rng, user_id, turns, samples, duplicate_rate=0.0):
+    """
+    Replay one conversation of `turns` answers, recording each request.
+    A `duplicate_rate` share of requests are sent twice at once, like a double-click.
+    """
+    test_client = app.test_client()
+    history = []
+    while True:
+        branch = branch_for(history)
+        payload = {'history': list(history), 'userId': user_id}
+        duplicate = None
+        if rng.random() < duplicate_rate:
+            duplicate = threading.Thread(target=lambda: app.test_client().post('/api/symptom-checker', json=payload))
+            duplicate.start()
+        started = time.perf_counter()
+        response = test_client.post('/api/symptom-checker', json=payload)
+        samples.append((branch, (time.perf_counter() - started) * 1000, response.status_code))
+        if duplicate is not None:
+            duplicate.join()
+
+        if response.status_code != 200:
+            return
+        data = response.get_json()
+        if data.get('is_final') or len(history) >= turns:
+            return
+        history.append({'question': data['question'], 'answer': rng.choice(data['options'])})
+
+
+def run_level(service, concurrency: int, conversations: int, seed: int, duplicate_rate: float = 0.0):
+    rng = random.Random(seed)
+    # User ids are ObjectId strings, as the service only saves analyses of real users
+    plans = [(f"{i:024x}", rng.randint(0, 10), rng.random()) for i in range(conversations)]
+    samples = []
+
+    def worker(plan):
+        user_id, turns, conversation_seed = plan
+        run_conversation(service.app, random.Random(conversation_seed), user_id, turns, samples, duplicate_rate)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, plans))
+    duration = time.perf_counter() - started
+
+    branches = {}
+    for branch in ("opening", "follow_up", "final"):
+        latencies = sorted(ms for sample_branch, ms, status in samples if sample_branch == branch and status == 200)
+        if latencies:
+            branches[branch] = {
+                "count": len(latencies),
+                "mean_ms": sum(latencies) / len(latencies),
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "p99_ms": percentile(latencies, 99),
+            }
+
+    errors = {}
+    for _, _, status in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+
+    return {
+        "concurrency": concurrency,
+        "conversations": conversations,
+        "requests": len(samples),
+        "duration_s": duration,
+        "throughput_rps": len(samples) / duration if duration else 0.0,
+        "errors": errors,
+        "branches": branches,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SERVICE_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_level(level):
+    print(f"\nconcurrency={level['concurrency']} requests={level['requests']} "
+          f"throughput={level['throughput_rps']:.1f} req/s errors={level['errors'] or 0}")
+    for branch, stats in level["branches"].items():
+        print(f"  {branch:<9} n={stats['count']:>5} p50={stats['p50_ms']:8.1f}ms "
+              f"p95={stats['p95_ms']:8.1f}ms p99={stats['p99_ms']:8.1f}ms")
+
+
+def print_comparison(baseline, results):
+    print(f"\nCompared with {baseline.get('commit', 'baseline')[:12]}:")
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in results["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+        change = level["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0
+        print(f"  concurrency={level['concurrency']} throughput {change:+.1%}")
+        for branch, stats in level["branches"].items():
+            if branch in before["branches"]:
+                old = before["branches"][branch]["p95_ms"]
+                print(f"    {branch:<9} p95 {old:8.1f}ms -> {stats['p95_ms']:8.1f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark /api/symptom-checker against stubbed backends.")
+    parser.add_argument('--levels', default='1,8,32', help="Comma separated concurrency levels")
+    parser.add_argument('--conversations', type=int, default=100, help="Conversations per level")
+    parser.add_argument('--opening-ms', type=float, default=600)
+    parser.add_argument('--follow-up-ms', type=float, default=1200)
+    parser.add_argument('--final-ms', type=float, default=3000)
+    parser.add_argument('--sigma', type=float, default=0.35, help="Log-normal spread of model latency")
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--db-ms', type=float, default=5, help="Latency of each fake database write")
+    parser.add_argument('--max-in-flight', type=int, default=1000)
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help="Share of requests sent twice at once")
+    parser.add_argument('--rate-limit', type=float, default=0, help="Per-user model calls per minute (0 disables)")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--verbose', action='store_true', help="Show the service's own logging")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    service, histories = load_service(args)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "params": vars(args),
+        "levels": [],
+    }
+
+    for concurrency in [int(level) for level in args.levels.split(',')]:
+        # The service logs every response; keep that out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+            level = run_level(service, concurrency, args.conversations, args.seed, args.duplicate_rate)
+        results["levels"].append(level)
+        print_level(level)
+
+    service.analysis_writer.close()
+    results["saved_analyses"] = len(histories.documents)
+    results["token_usage"] = service.usage_stats.stats()
+    results["model_calls"] = service.client.aio.models.calls
+    print(f"\nsaved analyses: {results['saved_analyses']}, model calls: {results['model_calls']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
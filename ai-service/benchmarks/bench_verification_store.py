@@ -0,0 +1,132 @@
+"""
+Benchmark of the columnar verification store.
+
+Synthetic results for --records saved analyses, each verified by every
+model in --models over --days days, are written to a temporary store in
+segments of --segment-rows. Each query then runs over the whole range and
+over the last week, next to the same score distribution computed from one
+Python dict per row, as a row store would return them.
+
+Example:
+    python benchmarks/bench_verification_store.py --records 1000000 --models 3
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+from verification_store import SECONDS_PER_DAY, VerificationStore  # noqa: E402
+
+START = datetime.datetime(2025, 1, 1)
+
+
+def write_synthetic(store, args, rng):
+    """Every model scores each record around a shared true score, with its own bias and noise."""
+    codes = [store.model_code(f"model-{index}") for index in range(args.models)]
+    bias = rng.normal(0, 0.5, args.models)
+    first = int(START.replace(tzinfo=datetime.timezone.utc).timestamp())
+    written = 0
+    for offset in range(0, args.records, args.segment_rows):
+        count = min(args.segment_rows, args.records - offset)
+        truth = np.clip(rng.normal(6.5, 2.0, count), 0, 10)
+        # Records arrive in time order across the whole range
+        verified_at = first + (np.arange(offset, offset + count) * (args.days * SECONDS_PER_DAY) // args.records)
+        for code in codes:
+            score = np.clip(np.rint(truth + bias[code] + rng.normal(0, 1.0, count)), 0, 10)
+            ok = rng.random(count) > 0.01
+            written += store.write_segment({
+                'verified_at': verified_at,
+                'record': np.arange(offset, offset + count, dtype=np.uint64),
+                'model': np.full(count, code),
+                'score': np.where(rng.random(count) < 0.02, np.nan, score),
+                'emergency': truth + rng.normal(0, 0.5, count) < 1.5,
+                'insufficient': score <= 3,
+                'ok': ok,
+                'latency_ms': rng.lognormal(7, 0.4, count),
+            })
+    return written
+
+
+def row_store_distributions(store, limit):
+    """The per-model histogram from one dict per row, for comparison."""
+    rows = []
+    for part in store.scan(['model', 'score', 'ok']):
+        for model, score, ok in zip(part['model'].tolist(), part['score'].tolist(), part['ok'].tolist()):
+            rows.append({'model': model, 'score': score, 'ok': ok})
+            if len(rows) >= limit:
+                break
+        if len(rows) >= limit:
+            break
+
+    started = time.perf_counter()
+    histogram = {}
+    for row in rows:
+        if row['ok'] and row['score'] == row['score']:
+            counts = histogram.setdefault(row['model'], [0] * 11)
+            counts[int(round(row['score']))] += 1
+    return len(rows), time.perf_counter() - started
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark verification store writes and queries.")
+    parser.add_argument('--records', type=int, default=1_000_000, help="Saved analyses verified")
+    parser.add_argument('--models', type=int, default=3, help="Verifier models per analysis")
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--segment-rows', type=int, default=250_000)
+    parser.add_argument('--row-store-rows', type=int, default=1_000_000,
+                        help="Rows loaded as Python dicts for the comparison")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as path:
+        store = VerificationStore(path, segment_rows=args.segment_rows)
+        rows, write_ms = timed(lambda: write_synthetic(store, args, rng))
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+        print(f"wrote {rows} rows in {len(store.manifest['segments'])} segments "
+              f"({size / 1e6:.0f} MB) in {write_ms:.0f}ms")
+
+        reopened = VerificationStore(path)
+        last_week = START + datetime.timedelta(days=args.days - 7)
+        results = {"rows": rows, "write_ms": write_ms, "bytes": size, "queries": {}}
+        queries = {
+            "distribution": reopened.score_distributions,
+            "low_confidence": reopened.low_confidence_rates,
+            "agreement": reopened.agreement,
+        }
+        for name, query in queries.items():
+            for label, start in (("all", None), ("last_week", last_week)):
+                _, ms = timed(lambda: query(start))
+                results["queries"][f"{name}_{label}"] = ms
+                print(f"{name:<15} {label:<9} {ms:8.1f}ms")
+
+        loaded, seconds = row_store_distributions(reopened, args.row_store_rows)
+        results["row_store_distribution_ms"] = seconds * 1000
+        print(f"row store distribution over {loaded} dicts: {seconds * 1000:8.1f}ms "
+              f"(aggregation only, not counting the load)")
+
+        agreement = reopened.agreement()
+        print(json.dumps(next(iter(agreement.items())), indent=2))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
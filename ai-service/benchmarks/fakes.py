@@ -0,0 +1,319 @@
+"""
+In-process stand-ins for the Gemini client, model providers and MongoDB
+collections, so the service can be load tested without spending model quota
+or running a database.
+"""
+import asyncio
+import collections
+import itertools
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+# The follow-up flow of `sample_conversation_fined_prompt` in verify_llm_out.py
+SAMPLE_FLOW = [
+    ("To help me understand what might be causing your headache, could you describe the pain?",
+     ["Throbbing", "Pressure", "Sharp", "Dull ache"]),
+    ("Where is the pressure located?",
+     ["All over", "Forehead", "Temples", "Back of the head"]),
+    ("Have you experienced any other symptoms along with the pressure in your forehead?",
+     ["Nasal congestion or runny nose", "Nausea", "Sensitivity to light", "None"]),
+    ("How long have you been experiencing this pressure?",
+     ["Less than a day", "A few days", "About a week", "More than a week"]),
+    ("Have you noticed any fever, facial pain, or changes in your sense of smell?",
+     ["Fever", "Facial pain", "Loss of smell", "None of these"]),
+    ("Regarding your fever, how high has it been?",
+     ["Low-grade (under 100.4°F) and manageable with medication", "High (over 102°F)", "Not measured"]),
+    ("Have you experienced any sinus pain or tenderness when touching your forehead or cheeks?",
+     ["Yes, significant pain or tenderness", "Mild tenderness", "No"]),
+    ("Have you noticed any tooth pain, upper jaw pain, or increased pain when bending over?",
+     ["No tooth or jaw pain, no change with position", "Tooth pain", "Worse when bending over"]),
+    ("Have you experienced any fatigue or muscle aches along with these symptoms?",
+     ["No, I haven't felt fatigued or had muscle aches.", "Some fatigue", "Muscle aches"]),
+]
+
+OPENING_RESPONSE = {
+    "question": "Hello! What is the primary symptom or health concern you are experiencing?",
+    "options": [
+        "Headache, Migraine, or Head Injury",
+        "Chest or Abdominal Pain",
+        "Fever or Flu-like Symptoms",
+        "Skin Issue (e.g., rash, lump)",
+        "Dizziness or Weakness",
+        "Other",
+    ],
+    "is_final": False,
+}
+
+FINAL_RESPONSE = {
+    "summary": "Forehead pressure with nasal congestion, low-grade fever and facial tenderness.",
+    "suggested_causes": [
+        {"name": "Sinusitis", "description": "Forehead pressure, congestion and facial tenderness fit sinus inflammation."},
+        {"name": "Upper Respiratory Infection", "description": "A viral cold can cause congestion and mild fever."},
+    ],
+    "treatment_plans": [
+        {"action": "Consult a healthcare professional", "details": "Symptoms lasting over a week with fever should be reviewed."},
+        {"action": "Monitor your symptoms", "details": "Watch for worsening pain, higher fever or new symptoms."},
+    ],
+    "is_final": True,
+}
+
+
+def follow_up_response(turn: int) -> dict:
+    question, options = SAMPLE_FLOW[(turn - 1) % len(SAMPLE_FLOW)]
+    return {"question": question, "options": options, "is_final": False}
+
+
+def branch_for_contents(contents: str) -> str:
+    if contents.startswith("Start the conversation"):
+        return "opening"
+    if "maximum number of questions" in contents:
+        return "final"
+    return "follow_up"
+
+
+def respond_to(contents: str) -> str:
+    """The canned JSON response for a prompt."""
+    branch = branch_for_contents(contents)
+    if branch == "opening":
+        return json.dumps(OPENING_RESPONSE)
+    if branch == "final":
+        return json.dumps(FINAL_RESPONSE)
+    # One "A:" line per answered question
+    return json.dumps(follow_up_response(contents.count("\nA: ")))
+
+
+class LatencyModel:
+    """Log-normal latency around a per-branch median, plus a failure rate."""
+
+    def __init__(self, medians=None, sigma: float = 0.35, failure_rate: float = 0.0, seed: int = None):
+        self.medians = medians or {"opening": 0.6, "follow_up": 1.2, "final": 3.0}
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self, branch: str):
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            delay = self._random.lognormvariate(0, self.sigma) * self.medians.get(branch, 1.0)
+        return delay, failed
+
+
+class FakeResponse:
+    def __init__(self, text: str, input_chars: int, cached_chars: int = 0):
+        self.text = text
+        # Like Gemini, the prompt count includes the cached tokens
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=input_chars // 4 + cached_chars // 4,
+            cached_content_token_count=cached_chars // 4,
+            candidates_token_count=len(text) // 4,
+        )
+
+
+class _FakeModels:
+    def __init__(self, latency: LatencyModel, caches):
+        self.latency = latency
+        self.caches = caches
+        self.calls = 0
+        # (contents, config) of the latest calls, for tests
+        self.requests = collections.deque(maxlen=1000)
+
+    def _input(self, contents, config):
+        """Characters sent with a call and characters read from cached content."""
+        self.requests.append((contents, config))
+        instruction = getattr(config, "system_instruction", None) or ""
+        cached = self.caches.sizes.get(getattr(config, "cached_content", None), 0)
+        return len(contents) + len(instruction), cached
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        input_chars, cached_chars = self._input(contents, config)
+        delay, failed = self.latency.sample(branch_for_contents(contents))
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("Injected model failure")
+        return FakeResponse(respond_to(contents), input_chars, cached_chars)
+
+    async def get(self, model):
+        return SimpleNamespace(name=model)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.calls += 1
+        input_chars, cached_chars = self._input(contents, config)
+        delay, failed = self.latency.sample(branch_for_contents(contents))
+        text = respond_to(contents)
+        chunk_size = max(len(text) // 8, 1)
+
+        async def chunks():
+            for start in range(0, len(text), chunk_size):
+                await asyncio.sleep(delay / 8)
+                if failed and start > len(text) // 2:
+                    raise RuntimeError("Injected model failure")
+                yield FakeResponse(text[start:start + chunk_size], input_chars, cached_chars)
+
+        return chunks()
+
+
+class FakeProvider:
+    """
+    A model provider for `providers.HedgedRouter` with its own latency model.
+    A share of calls are slowed down by `spike_factor` to model latency
+    spikes, and setting `outage` makes every call fail after `outage_delay`.
+    """
+
+    def __init__(self, name: str, latency: LatencyModel = None, spike_rate: float = 0.0,
+                 spike_factor: float = 8.0, outage_delay: float = 0.05, seed: int = None):
+        self.name = name
+        self.latency = latency or LatencyModel(seed=seed)
+        self.spike_rate = spike_rate
+        self.spike_factor = spike_factor
+        self.outage_delay = outage_delay
+        self.outage = False
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    async def complete(self, prompt):
+        from providers import Completion
+
+        self.calls += 1
+        if self.outage:
+            await asyncio.sleep(self.outage_delay)
+            raise ConnectionError(f"{self.name} is unavailable")
+        delay, failed = self.latency.sample(prompt.branch)
+        if self._random.random() < self.spike_rate:
+            delay *= self.spike_factor
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError("Injected model failure")
+        text = respond_to(prompt.contents)
+        return Completion(text, self.name, {
+            "input_tokens": len(prompt.contents) // 4,
+            "cached_input_tokens": 0,
+            "output_tokens": len(text) // 4,
+        })
+
+    async def ping(self):
+        if self.outage:
+            raise ConnectionError(f"{self.name} is unavailable")
+
+
+class _FakeCaches:
+    def __init__(self):
+        self._names = itertools.count()
+        # Cached content name -> characters of its system instruction
+        self.sizes = {}
+
+    async def create(self, model, config=None):
+        name = f"cachedContents/fake-{next(self._names)}"
+        self.sizes[name] = len(getattr(config, "system_instruction", None) or "")
+        return SimpleNamespace(name=name)
+
+
+class FakeGenaiClient:
+    """Quacks like `genai.Client` for the calls the service makes."""
+
+    def __init__(self, latency: LatencyModel = None):
+        caches = _FakeCaches()
+        models = _FakeModels(latency or LatencyModel(), caches)
+        self.aio = SimpleNamespace(models=models, caches=caches)
+        self.models = models
+
+
+class _InsertResult:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+
+
+class _UpdateResult:
+    def __init__(self, matched):
+        self.matched_count = matched
+        self.modified_count = matched
+
+
+class FakeCollection:
+    """A thread-safe, in-memory subset of a pymongo collection."""
+
+    def __init__(self, write_latency: float = 0.0):
+        self.write_latency = write_latency
+        self.documents = {}
+        self.indexes = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _matches(self, doc, query):
+        return all(doc.get(key) == value for key, value in query.items())
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+
+    def insert_one(self, document):
+        return self.insert_many([document])
+
+    def insert_many(self, documents, ordered=True):
+        time.sleep(self.write_latency)
+        with self._lock:
+            ids = []
+            for document in documents:
+                document.setdefault('_id', next(self._ids))
+                self.documents[document['_id']] = dict(document)
+                ids.append(document['_id'])
+        return _InsertResult(ids)
+
+    def find_one(self, query):
+        with self._lock:
+            for doc in self.documents.values():
+                if self._matches(doc, query):
+                    return dict(doc)
+        return None
+
+    def _find(self, query):
+        if set(query) == {'_id'}:
+            return self.documents.get(query['_id'])
+        return next((doc for doc in self.documents.values() if self._matches(doc, query)), None)
+
+    def _update(self, query, update, upsert):
+        doc = self._find(query)
+        inserted = doc is None and upsert
+        if inserted:
+            doc = {**query, **update.get('$setOnInsert', {})}
+            doc.setdefault('_id', next(self._ids))
+            self.documents[doc['_id']] = doc
+        if doc is None:
+            return None, False
+        doc.update(update.get('$set', {}))
+        for key, value in update.get('$push', {}).items():
+            doc.setdefault(key, []).append(value)
+        for key, value in update.get('$inc', {}).items():
+            doc[key] = doc.get(key, 0) + value
+        return doc, inserted
+
+    def update_one(self, query, update, upsert=False):
+        time.sleep(self.write_latency)
+        with self._lock:
+            doc, _ = self._update(query, update, upsert)
+        return _UpdateResult(0 if doc is None else 1)
+
+    def bulk_write(self, operations, ordered=True):
+        """Applies `UpdateOne` operations, reporting which ones inserted a document."""
+        time.sleep(self.write_latency)
+        upserted_ids = {}
+        with self._lock:
+            for index, operation in enumerate(operations):
+                doc, inserted = self._update(operation._filter, operation._doc, operation._upsert)
+                if inserted:
+                    upserted_ids[index] = doc['_id']
+        return SimpleNamespace(upserted_ids=upserted_ids)
+
+    def delete_one(self, query):
+        with self._lock:
+            for key, doc in list(self.documents.items()):
+                if self._matches(doc, query):
+                    del self.documents[key]
+                    return
+
+    def count_documents(self, query):
+        with self._lock:
+            return sum(1 for doc in self.documents.values() if self._matches(doc, query))
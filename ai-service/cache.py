@@ -0,0 +1,170 @@
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from lifecycle import LazyProxy
+
+
+def normalize_text(value) -> str:
+    """Collapse whitespace and case so equivalent answers share a cache entry."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def cache_version(*parts) -> str:
+    """
+    Short fingerprint of whatever shapes a response besides the history
+    (prompt, model, output schema), so changing any of them starts new keys.
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def make_cache_key(branch: str, history, version: str = "") -> str:
+    """Canonical hash of the prompt branch and version plus the normalized history."""
+    canonical = json.dumps(
+        {
+            "branch": branch,
+            "version": version,
+            "history": [
+                [normalize_text(item.get("question")), normalize_text(item.get("answer"))]
+                for item in history
+            ],
+        },
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _connect(path: str):
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS responses "
+        "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+    )
+    db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+    db.commit()
+    return db
+
+
+class ResponseCache:
+    """
+    Two-tier cache for symptom checker responses.
+
+    Entries live in an in-process LRU with a TTL. When `path` is set they are
+    also written to a SQLite file, so they survive restarts and are promoted
+    back into memory on first use. Disk writes are batched on a background
+    thread, so `set` never waits for a commit.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 86400, path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes = queue.Queue()
+        self._writer = None
+
+        if path:
+            # Opened on first use in each worker; a connection must not cross a fork
+            self._db = LazyProxy(lambda: _connect(path))
+
+    def _remember(self, key, value, expires):
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str):
+        """Return the cached response for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires >= now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        row = None
+        if self._db is not None:
+            # The disk tier has its own lock, so memory hits never wait on it
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires FROM responses WHERE key = ? AND expires >= ?",
+                    (key, now),
+                ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            self.hits += 1
+            self.disk_hits += 1
+            return value
+
+    def set(self, key: str, value):
+        """Cache a response under `key` in memory now and on disk shortly after."""
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires)
+        if self._db is not None:
+            self._writes.put((key, json.dumps(value), expires))
+            self._start_writer()
+
+    def _start_writer(self):
+        # Started on first use, so a forked worker gets its own thread
+        with self._db_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._writes.get()]
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self._db_lock:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)", batch)
+                    self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Response cache write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+
+    def flush(self):
+        """Wait until every queued disk write has been committed."""
+        if self._db is not None:
+            self._writes.join()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and the current in-memory size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
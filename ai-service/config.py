@@ -11,10 +11,87 @@ class ApiConfig:
     MONGODB_CONNECTION_STRING = os.getenv('MONGODB_CONNECTION_STRING')
     MONGODB_DB_NAME = os.getenv('MONGODB_DB_NAME')
 
+    # Write-behind batching of final analyses
+    ANALYSIS_WRITE_BATCH_SIZE = int(os.getenv('ANALYSIS_WRITE_BATCH_SIZE', '100'))
+    ANALYSIS_WRITE_INTERVAL_SECONDS = float(os.getenv('ANALYSIS_WRITE_INTERVAL_SECONDS', '1'))
+    ANALYSIS_WRITE_MAX_RETRIES = int(os.getenv('ANALYSIS_WRITE_MAX_RETRIES', '3'))
+
     #Vertex AI API Configuration
     VERTEX_PROJECT_ID = os.getenv('VERTEX_PROJECT_ID')
     VERTEX_LOCATION = os.getenv('VERTEX_LOCATION')
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+    # Provider API Keys and Tracing
+    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+    PHOENIX_COLLECTOR_ENDPOINT = os.getenv('PHOENIX_COLLECTOR_ENDPOINT', 'http://localhost:6006')
+    # Emit OpenTelemetry spans for symptom checker stages to Phoenix
+    OTEL_TRACING = os.getenv('OTEL_TRACING', 'false').lower() == 'true'
+
+    # Model Providers, in the order they are tried (gemini, openai, anthropic)
+    LLM_PROVIDERS = os.getenv('LLM_PROVIDERS', 'gemini')
+    OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+    ANTHROPIC_MODEL = os.getenv('ANTHROPIC_MODEL', 'claude-3-5-haiku-latest')
+    # Send a backup request to the next provider once a call passes this latency percentile
+    HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))
+    HEDGE_INITIAL_DELAY_SECONDS = float(os.getenv('HEDGE_INITIAL_DELAY_SECONDS', '2'))
+    # Stop calling a provider after this many consecutive failures, retrying after the reset time
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+    # LLM Call Limits
+    LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '64'))
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '30'))
+
+    # Model calls each user may start per minute, with bursts of up to the burst size (0 to disable).
+    # Each worker enforces them on its own, so with N gunicorn workers a user can start N times as many.
+    USER_RATE_LIMIT_PER_MINUTE = float(os.getenv('USER_RATE_LIMIT_PER_MINUTE', '20'))
+    USER_RATE_LIMIT_BURST = int(os.getenv('USER_RATE_LIMIT_BURST', '5'))
+
+    # Ask Gemini for schema-shaped JSON instead of parsing free text
+    STRUCTURED_OUTPUT = os.getenv('STRUCTURED_OUTPUT', 'true').lower() == 'true'
+
+    # Local emergency red-flag rules checked before any model call (empty to disable)
+    RED_FLAG_RULES = os.getenv('RED_FLAG_RULES', os.path.join(os.path.dirname(__file__), 'red_flags.json'))
+
+    # Triage tree mined from saved conversations by triage_tree.py (empty to disable)
+    TRIAGE_TREE_PATH = os.getenv('TRIAGE_TREE_PATH', os.path.join(os.path.dirname(__file__), 'triage_tree.bin'))
+    TRIAGE_TREE_MIN_SUPPORT = int(os.getenv('TRIAGE_TREE_MIN_SUPPORT', '20'))
+    TRIAGE_TREE_MIN_CONFIDENCE = float(os.getenv('TRIAGE_TREE_MIN_CONFIDENCE', '0.8'))
+    # Share of the answers given at a node that its kept options must cover for it to be served
+    TRIAGE_TREE_MIN_COVERAGE = float(os.getenv('TRIAGE_TREE_MIN_COVERAGE', '0.9'))
+    TRIAGE_TREE_RELOAD_SECONDS = float(os.getenv('TRIAGE_TREE_RELOAD_SECONDS', '30'))
+
+    # Register the static prompt instructions with Gemini context caching
+    CONTEXT_CACHE = os.getenv('CONTEXT_CACHE', 'false').lower() == 'true'
+    CONTEXT_CACHE_TTL_SECONDS = float(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '3600'))
+    # The model's minimum cacheable size; smaller instructions are sent inline
+    CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('CONTEXT_CACHE_MIN_TOKENS', '1024'))
+
+    # Response Cache Configuration (leave the path empty to keep it in memory only)
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '2048'))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '86400'))
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH')
+    # Bump to drop cached responses after a change the automatic version cannot see
+    RESPONSE_CACHE_VERSION = os.getenv('RESPONSE_CACHE_VERSION', '1')
+
+    # Symptom Checker Sessions ('memory' or 'mongodb'). A memory store only
+    # sees its own worker's sessions, so gunicorn defaults to 'mongodb' and
+    # refuses 'memory' when it runs more than one worker.
+    SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+    SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', '3600'))
+
+    # Serving: threads per worker for the Flask routes mounted in the ASGI app
+    WSGI_THREADS = int(os.getenv('WSGI_THREADS', '8'))
+    # Serving: warm each worker up in the background when the app is created
+    WARM_UP = os.getenv('WARM_UP', 'true').lower() == 'true'
+    # /readyz gives up on a dependency after the timeout and reuses results for the cache time
+    READINESS_TIMEOUT_SECONDS = float(os.getenv('READINESS_TIMEOUT_SECONDS', '2'))
+    READINESS_CACHE_SECONDS = float(os.getenv('READINESS_CACHE_SECONDS', '10'))
+    # Directory where workers share metric snapshots, so /metrics on any worker covers all of
+    # them (gunicorn sets one when it runs several workers); empty for this process only
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    METRICS_SNAPSHOT_SECONDS = float(os.getenv('METRICS_SNAPSHOT_SECONDS', '5'))
+
 
 
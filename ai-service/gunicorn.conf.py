@@ -0,0 +1,64 @@
+"""
+Gunicorn settings for the symptom checker service:
+    gunicorn -c gunicorn.conf.py 'asgi_app:create_asgi_app()'
+"""
+import glob
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = os.getenv('BIND', '0.0.0.0:5328')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Each worker runs one event loop; model-backed requests wait on it without
+# a thread each, and the Flask routes share WSGI_THREADS threads per worker
+worker_class = 'uvicorn_worker.UvicornWorker'
+# Streams stay open for the whole model response
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+
+# Metrics directory created for this run, removed again on exit
+owned_metrics_dir = None
+
+
+def on_starting(server):
+    global owned_metrics_dir
+    # Runs in the master before any worker imports the app. Sessions must be
+    # shared between workers, since consecutive turns can land on any of them.
+    store = os.environ.setdefault('SESSION_STORE', 'mongodb' if server.cfg.workers > 1 else 'memory')
+    if store == 'memory' and server.cfg.workers > 1:
+        raise RuntimeError(
+            f"SESSION_STORE=memory does not work with {server.cfg.workers} workers; "
+            "use SESSION_STORE=mongodb or WEB_CONCURRENCY=1")
+
+    # Each worker keeps its own metrics; they share snapshots so /metrics covers all of them
+    if server.cfg.workers > 1 and not os.environ.get('METRICS_MULTIPROC_DIR'):
+        owned_metrics_dir = os.environ['METRICS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='symptom-checker-metrics-')
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        # Snapshots of an earlier run would add to this run's counters
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+
+def on_exit(server):
+    if owned_metrics_dir:
+        shutil.rmtree(owned_metrics_dir, ignore_errors=True)
+
+
+def child_exit(server, worker):
+    directory = os.environ.get('METRICS_MULTIPROC_DIR')
+    if directory:
+        from metrics import mark_process_dead
+
+        mark_process_dead(directory, worker.pid)
+
+
+def post_worker_init(worker):
+    # Clients are created per worker; warm this one up before traffic reaches it
+    import app
+
+    app.start_warm_up()
@@ -0,0 +1,121 @@
+"""
+Per-process resources and readiness checks for multi-worker serving.
+
+Pre-forking servers such as gunicorn fork the process that imported the
+app. Database and HTTP clients must not cross that fork, so they are
+created on first use in each process: `PerProcess` builds its value lazily
+and builds it again in a forked child, and `LazyProxy` makes such a value
+usable wherever the object itself used to be passed around.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Bumped in every forked child, invalidating everything created before the fork
+_generation = 0
+
+
+def _after_fork():
+    global _generation
+    _generation += 1
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class PerProcess:
+    """A value created by `factory()` on first use in each process."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._generation = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._generation == _generation
+
+    def get(self):
+        if self._generation != _generation:
+            with self._lock:
+                if self._generation != _generation:
+                    self._value = self.factory()
+                    self._generation = _generation
+        return self._value
+
+
+class LazyProxy:
+    """Forwards attribute access to a `PerProcess` value, creating it on first use."""
+
+    def __init__(self, factory):
+        object.__setattr__(self, '_resource', PerProcess(factory))
+
+    def __getattr__(self, name):
+        return getattr(object.__getattribute__(self, '_resource').get(), name)
+
+
+def resolve(proxy):
+    """The object behind a `LazyProxy`, created now if it does not exist yet; other objects as they are."""
+    if not isinstance(proxy, LazyProxy):
+        return proxy
+    return object.__getattribute__(proxy, '_resource').get()
+
+
+def _timed(check):
+    started = time.perf_counter()
+    try:
+        check()
+        error = None
+    except Exception as e:
+        error = str(e)
+    return error, round((time.perf_counter() - started) * 1000, 1)
+
+
+class ReadinessProbe:
+    """
+    Runs named dependency checks and caches the outcome for `cache_seconds`,
+    so frequent probes from several load balancers cost one round of checks.
+    A check passes when it returns within `timeout` seconds without raising.
+    """
+
+    def __init__(self, checks, timeout: float = 2.0, cache_seconds: float = 10.0):
+        self.checks = dict(checks)
+        self.timeout = timeout
+        self.cache_seconds = cache_seconds
+        self._result = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        # Checks run on their own threads so a hung dependency cannot hold the probe
+        self._executor = PerProcess(
+            lambda: ThreadPoolExecutor(max_workers=len(self.checks) or 1, thread_name_prefix="readiness"))
+        # A check still hanging from an earlier probe is waited on again rather than queued twice
+        self._running = PerProcess(dict)
+
+    def check(self, force: bool = False):
+        """(all passed, {name: {"ok": bool, "ms": float, "error": str}})."""
+        with self._lock:
+            if not force and self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+                return self._result
+
+            started = time.perf_counter()
+            running = self._running.get()
+            for name, check in self.checks.items():
+                if name not in running or running[name].done():
+                    running[name] = self._executor.get().submit(_timed, check)
+            results = {}
+            for name, future in list(running.items()):
+                remaining = max(self.timeout - (time.perf_counter() - started), 0)
+                try:
+                    error, ms = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    error, ms = f"no answer within {self.timeout}s", self.timeout * 1000
+                results[name] = {"ok": error is None, "ms": ms}
+                if error is not None:
+                    results[name]["error"] = error
+
+            self._result = (all(result["ok"] for result in results.values()), results)
+            self._checked_at = time.monotonic()
+            return self._result
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+
+class LLMBusyError(Exception):
+    """Raised when the in-flight LLM call cap has been reached."""
+
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call takes longer than the configured timeout."""
+
+
+class LLMRuntime:
+    """
+    Runs LLM coroutines on a single background event loop.
+
+    Flask runs every async view on its own short-lived event loop, so the
+    genai async client (and anything else that must be shared between
+    requests) lives on this dedicated loop instead. Views hand their
+    coroutines over with `run()` and await the result without holding a
+    connection of their own.
+
+    The native routes of asgi_app.py await `run()` on the server's event
+    loop, so a waiting request holds no thread and `max_in_flight` is the
+    only bound. The Flask views (the development server) still block their
+    request thread until the call returns.
+    """
+
+    def __init__(self, max_in_flight: int = 64, timeout: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.in_flight = 0
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        # Started lazily so the thread is created in the process that uses it
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="llm-runtime",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    async def _guarded(self, coro_factory, timeout, capped):
+        if not capped:
+            try:
+                return await asyncio.wait_for(coro_factory(), timeout)
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(f"LLM call exceeded {timeout}s")
+        if self.in_flight >= self.max_in_flight:
+            raise LLMBusyError(f"{self.in_flight} LLM calls already in flight")
+
+        self.in_flight += 1
+        try:
+            return await asyncio.wait_for(coro_factory(), timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM call exceeded {timeout}s")
+        finally:
+            self.in_flight -= 1
+
+    def submit(self, coro_factory, timeout: float = None, capped: bool = True):
+        """
+        Schedule `coro_factory()` on the runtime loop and return a concurrent
+        future. Uncapped calls, such as readiness pings, neither count toward
+        nor are refused by `max_in_flight`.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self._guarded(coro_factory, timeout or self.timeout, capped),
+            self.loop,
+        )
+
+    async def run(self, coro_factory, timeout: float = None):
+        """Await `coro_factory()` on the runtime loop from any other event loop."""
+        return await asyncio.wrap_future(self.submit(coro_factory, timeout))
+
+
+class UsageStats:
+    """Token usage reported by the model providers, aggregated per prompt branch."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, branch: str, tokens: dict) -> dict:
+        """Add one response's token counts and return them."""
+        with self._lock:
+            totals = self._totals.setdefault(branch, dict.fromkeys(["requests", *tokens], 0))
+            totals["requests"] += 1
+            for key, value in tokens.items():
+                totals[key] += value
+        return tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {branch: dict(totals) for branch, totals in self._totals.items()}
+        for totals in stats.values():
+            totals["avg_input_tokens"] = totals["input_tokens"] / (totals["requests"] or 1)
+        return stats
@@ -0,0 +1,328 @@
+"""
+Minimal Prometheus-format metrics for the AI service.
+
+Counters, gauges and histograms keep their samples in plain dicts keyed by
+label values, guarded by one lock each, so recording is a dict update and a
+bisect; `render()` produces the text exposition format served on /metrics.
+With several worker processes, `MultiProcessCollector` combines the
+registries of all workers so any one of them can answer a scrape.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from lifecycle import PerProcess
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def _meta(self):
+        return {"kind": self.kind, "help": self.help, "labels": list(self.labels)}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values.items()
+        ]
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {**self._meta(), "values": values}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *label_values, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+
+    def observe(self, *label_values, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        lines = self._header()
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', bound))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), list(counts), total, count] for key, (counts, total, count) in self._values.items()]
+        return {**self._meta(), "buckets": list(self.buckets), "values": values}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Call `collector()` before every render, e.g. to refresh gauges from stats."""
+        self._collectors.append(collector)
+
+    def _collect(self):
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+    def render(self) -> str:
+        self._collect()
+        return _render(self._metrics)
+
+    def snapshot(self) -> dict:
+        """Every metric's current values, in a JSON-serializable form."""
+        self._collect()
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+
+def _render(metrics) -> str:
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MultiProcessCollector:
+    """
+    Combines the metrics of all workers of a pre-forking server, since a
+    scrape reaches whichever worker accepts it. Each worker writes a snapshot
+    of its registry to `<directory>/<pid>.json` every `interval` seconds and
+    when it is scraped; a scrape renders all snapshots, with counters and
+    histograms summed over the workers and gauges labelled by `pid`.
+    Counters of exited workers keep counting toward the totals; their gauges
+    are dropped by `mark_process_dead`.
+    """
+
+    def __init__(self, registry, directory: str, interval: float = 5.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._writer = PerProcess(self._start_writer)
+
+    def _start_writer(self):
+        thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        thread.start()
+        return thread
+
+    def start(self):
+        """Start this worker's snapshot thread, once per process."""
+        self._writer.get()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except Exception as e:
+                print(f"Metrics snapshot failed: {e}")
+
+    def write(self):
+        _write_snapshot(self.directory, os.getpid(), self.registry.snapshot())
+
+    def render(self) -> str:
+        self.start()
+        self.write()
+        merged = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            pid = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, data in snapshot.items():
+                _merge(merged, name, data, pid)
+        return _render(merged.values())
+
+
+def _write_snapshot(directory, pid, snapshot):
+    path = os.path.join(directory, f"{pid}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def _merge(merged, name, data, pid):
+    """Add one worker's snapshot of a metric to the combined metrics."""
+    kind = data["kind"]
+    metric = merged.get(name)
+    if metric is None:
+        if kind == "histogram":
+            metric = Histogram(name, data["help"], data["labels"], data["buckets"])
+        elif kind == "gauge":
+            metric = Gauge(name, data["help"], [*data["labels"], "pid"])
+        else:
+            metric = Counter(name, data["help"], data["labels"])
+        merged[name] = metric
+
+    for key, *values in data["values"]:
+        key = tuple(key)
+        if kind == "gauge":
+            metric._values[key + (pid,)] = values[0]
+        elif kind == "histogram":
+            counts, total, count = values
+            series = metric._values.setdefault(key, [[0] * len(counts), 0.0, 0])
+            series[0] = [a + b for a, b in zip(series[0], counts)]
+            series[1] += total
+            series[2] += count
+        else:
+            metric._values[key] = metric._values.get(key, 0) + values[0]
+
+
+def mark_process_dead(directory: str, pid):
+    """Drop the gauges of an exited worker; its counters and histograms still count."""
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return
+    _write_snapshot(directory, pid, {name: data for name, data in snapshot.items() if data["kind"] != "gauge"})
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "symptom_checker_stage_seconds",
+    "Time spent in each stage of a symptom checker request.",
+    ("stage", "branch"),
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "symptom_checker_request_seconds",
+    "Total symptom checker request handling time.",
+    ("route", "branch", "status"),
+))
+REQUESTS = registry.register(Counter(
+    "symptom_checker_requests_total",
+    "Symptom checker requests by route, prompt branch and status code.",
+    ("route", "branch", "status"),
+))
+TOKENS = registry.register(Counter(
+    "symptom_checker_tokens_total",
+    "Model tokens by prompt branch and kind (input, cached_input, output).",
+    ("branch", "kind"),
+))
+
+_tracer = None
+
+
+def enable_tracing(tracer):
+    """Emit an OpenTelemetry span for every timed stage."""
+    global _tracer
+    _tracer = tracer
+
+
+class RequestTimer:
+    """
+    Times the stages of one request. The prompt branch is usually only known
+    part-way through, so observations are recorded when the request finishes.
+    """
+
+    def __init__(self, route: str):
+        self.route = route
+        self.branch = "unknown"
+        self.started = time.perf_counter()
+        self._stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        span = _tracer.start_as_current_span(f"symptom_checker.{name}") if _tracer else nullcontext()
+        started = time.perf_counter()
+        with span:
+            try:
+                yield
+            finally:
+                self._stages.append((name, time.perf_counter() - started))
+
+    def finish(self, status):
+        for name, elapsed in self._stages:
+            STAGE_SECONDS.observe(name, self.branch, value=elapsed)
+        status = str(status)
+        REQUEST_SECONDS.observe(self.route, self.branch, status, value=time.perf_counter() - self.started)
+        REQUESTS.inc(self.route, self.branch, status)
+
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def record_tokens(branch: str, tokens: dict):
+    """Count the token usage of one model call."""
+    for kind in ("input", "cached_input", "output"):
+        TOKENS.inc(branch, kind, amount=tokens.get(f"{kind}_tokens", 0))
@@ -0,0 +1,189 @@
+import atexit
+import datetime
+import queue
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY = 11000
+
+# The collection of the Next.js SymptomHistory model, which shows the saved
+# analyses. The service is the only writer of final analyses.
+HISTORY_COLLECTION = 'symptomhistories'
+
+
+def ensure_indexes(collection):
+    """Create the indexes the history and admin queries sort and filter on."""
+    collection.create_index([('user', ASCENDING), ('createdAt', DESCENDING)])
+    collection.create_index([('createdAt', DESCENDING)])
+
+
+def history_document(user_id, history, analysis):
+    """
+    The symptom history document saved for a final analysis, in the shape of
+    the Next.js SymptomHistory model. None when there is no signed-in user,
+    since the model requires one.
+    """
+    if not user_id or not ObjectId.is_valid(str(user_id)):
+        return None
+    return {
+        # Assigned up front so a retried batch cannot insert a document twice
+        '_id': ObjectId(),
+        'user': ObjectId(str(user_id)),
+        'symptoms': [
+            {'question': item.get('question'), 'answer': item.get('answer')} for item in history
+        ],
+        'analysis': {
+            'summary': analysis.get('summary') or '',
+            'suggested_causes': [
+                {'title': cause.get('name'), 'description': cause.get('description')}
+                for cause in analysis.get('suggested_causes') or []
+            ],
+            'treatment_plans': [
+                {'title': plan.get('action'), 'description': plan.get('details')}
+                for plan in analysis.get('treatment_plans') or []
+            ],
+        },
+        'createdAt': datetime.datetime.now(datetime.timezone.utc),
+        '__v': 0,
+    }
+
+
+class AnalysisWriter:
+    """
+    Write-behind queue for final analyses.
+
+    Documents are collected on a background thread and inserted with
+    `insert_many` once `batch_size` documents are waiting or `flush_interval`
+    seconds have passed. Failed batches are retried with backoff, and the
+    queue is drained when the process exits. `on_written`, when given, is
+    called with the documents of each batch that made it to the database.
+    """
+
+    def __init__(self, collection, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_retries: int = 3, max_queue: int = 10000, on_written=None):
+        self.collection = collection
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="analysis-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def enqueue(self, document: dict) -> bool:
+        """Queue a document for writing. Returns False if the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(document)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print("Analysis write queue is full; dropping document.")
+            return False
+
+    def _take_batch(self, timeout):
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        documents = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+                self.batches += 1
+                self._notify(documents)
+                return
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                failed_ids = {
+                    batch[error['index']]['_id'] for error in errors if error.get('code') != DUPLICATE_KEY
+                }
+                # Duplicates were written by an earlier attempt
+                self.written += len(batch) - len(failed_ids)
+                batch = [doc for doc in batch if doc['_id'] in failed_ids]
+                if not batch:
+                    self.batches += 1
+                    self._notify(documents)
+                    return
+                error = e
+            except Exception as e:
+                error = e
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                time.sleep(min(2 ** attempt * 0.5, 10))
+
+        self.failed += len(batch)
+        print(f"Error saving {len(batch)} analyses to MongoDB: {error}")
+        failed_ids = {doc['_id'] for doc in batch}
+        self._notify([doc for doc in documents if doc['_id'] not in failed_ids])
+
+    def _notify(self, documents):
+        if self.on_written is None or not documents:
+            return
+        try:
+            self.on_written(documents)
+        except Exception as e:
+            print(f"Analysis write hook failed: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Write everything queued so far on the calling thread."""
+        while True:
+            batch = self._take_batch(0)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: float = 10.0):
+        """Stop the background thread after draining the queue."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        """Queue depth and write counters."""
+        return {
+            'queue_depth': self._queue.qsize(),
+            'written': self.written,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'retries': self.retries,
+            'batches': self.batches,
+        }
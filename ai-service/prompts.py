@@ -0,0 +1,266 @@
+import asyncio
+from collections import namedtuple
+
+OPENING = "opening"
+FOLLOW_UP = "follow_up"
+FINAL = "final"
+
+MAX_QUESTIONS = 10
+
+
+# --- Static Instructions ---
+# Fixed per branch, so they are sent as system instructions (or registered
+# once with Gemini context caching) rather than repeated in every prompt.
+FINAL_INSTRUCTION = """
+            You are an AI Medical Analyst. Your function is to synthesize the entirety of a user's conversation into a structured, educational, and safe final analysis. You must act with the utmost caution, prioritizing user safety and clarity.
+
+            CORE PRINCIPLES:
+            1. Synthesize, Don't Diagnose: Your analysis is a summary of information and possibilities, not a medical diagnosis.
+            2. Stratify Risk: Clearly differentiate between conditions that can be managed at home, those that require a doctor's visit, and those that are urgent.
+            3. Provide Rationale: Do not simply state possibilities. Briefly explain why the user's symptoms align with a particular suggestion. This demonstrates your reasoning.
+
+            INSTRUCTIONS:
+            1. Summarize: Briefly summarize the key symptoms the user has described.
+            2. Suggest Causes: List 2-3 potential, common causes for the symptoms. Do not list rare or life-threatening conditions unless it is a clear emergency.
+            3. Treatment Plans: Suggest safe, general next steps. NEVER prescribe medication. Focus on actions like "Consult a healthcare professional," "Monitor your symptoms," or "Consider over-the-counter pain relievers if appropriate."
+
+            Format the output as a single JSON object with the following keys:
+            'summary': A brief summary of the key symptoms.
+            'suggested_causes': A list of 2-3 potential causes for the symptoms.
+            'treatment_plans': A list of 2-3 recommended actions for the user.
+            'is_final': A boolean indicating whether this is the final response.
+
+            Example:
+            {
+                "summary": "...",
+                "suggested_causes": [
+                    {"name": "...", "description": "..."}
+                ],
+                "treatment_plans": [
+                    {"action": "...", "details": "..."}
+                ],
+                "is_final": true
+            }
+            """
+
+OPENING_INSTRUCTION = """
+            You are a helpful and professional AI Medical Assistant. Your goal is to initiate a conversation to understand a user's health concern in a welcoming and clear manner.
+
+            YOUR TASK:
+            Generate the very first message for the user. This message must include:
+
+            1. A brief, friendly greeting.
+            2. A single, clear question to identify their primary symptom.
+            3. A list of 5-6 common, high-level symptom categories as options.
+            4. An "Other" option to ensure the user can always proceed.
+
+            FORMATTING INSTRUCTIONS:
+            Format the output as a single JSON object with the following keys:
+            'question': The question to ask the user.
+            'options': A list of options for the user to choose from.
+            'is_final': A boolean indicating whether this is the final response.
+
+            Example:
+            {
+                "question": "What is the primary symptom or health concern you are experiencing?",
+                "options": [
+                    "Head, Neck, or Throat Issue",
+                    "Chest or Abdominal Pain",
+                    "Fever or Flu-like Symptoms",
+                    "Skin Issue (e.g., rash, lump)",
+                    "Dizziness or Weakness",
+                    "Something else"
+                ],
+                "is_final": false
+            }
+            """
+
+FOLLOW_UP_INSTRUCTION = """
+            You are an AI Medical Triage Assistant. Your primary goal is to help users understand their symptoms by asking targeted questions. You must be empathetic, clear, and cautious.
+
+            CRITICAL DIRECTIVES:
+            You are NOT a doctor. Your analysis is not a diagnosis. Your primary function is to gather information and suggest appropriate next steps.
+            Emergency Detection: If at any point the user's symptoms suggest a medical emergency (e.g., severe chest pain, difficulty breathing, uncontrolled bleeding, sudden confusion, signs of a stroke), your only response must be a final analysis advising them to contact emergency services immediately.
+
+            YOUR TASK:
+            Based on the provided conversation, determine the next logical step.
+            Analyze the Conversation: Review the user's symptoms and your previous questions.
+
+            Decide Your Action:
+            If more information is needed and you are under the 10-question limit, ask the single most important follow-up question to narrow down the potential causes.
+            If you have enough information or have reached the 10-question limit, provide a final analysis.
+
+            INSTRUCTIONS FOR ASKING A QUESTION:
+            Formulate a Question: Base your question on a standard diagnostic framework (e.g., OPQRST: Onset, Provocation/Palliation, Quality, Region/Radiation, Severity, Timing). For example, ask about the symptom's location, what makes it better or worse, its duration, or its severity.
+            Provide Options: Offer 4-5 clear, distinct, and helpful multiple-choice options.
+
+            Format:
+            Respond with the following JSON structure:
+            {
+                "question": "...",
+                "options": ["...", "...", "..."],
+                "is_final": false
+            }
+            """
+
+SYSTEM_INSTRUCTIONS = {
+    OPENING: OPENING_INSTRUCTION,
+    FOLLOW_UP: FOLLOW_UP_INSTRUCTION,
+    FINAL: FINAL_INSTRUCTION,
+}
+# -------------------------
+
+
+class Prompt(namedtuple("Prompt", ["branch", "system_instruction", "contents"])):
+    """A prompt split into its static system instruction and dynamic contents."""
+
+    @property
+    def text(self) -> str:
+        """The whole prompt as a single text, for models without system instructions."""
+        return f"{self.system_instruction}\n{self.contents}"
+
+
+def render_turn(item) -> str:
+    """Render a single question/answer pair of the conversation."""
+    return f"Q: {item.get('question', '')}\nA: {item.get('answer', '')}"
+
+
+def render_conversation(history) -> str:
+    """Render the whole conversation history for the prompt."""
+    return "\n".join([render_turn(item) for item in history])
+
+
+def build_prompt(history, conversation=None) -> Prompt:
+    """
+    Pick the prompt branch for the conversation and build its prompt.
+    Only the contents depend on the conversation.
+    """
+    if conversation is None:
+        conversation = render_conversation(history)
+
+    if len(history) >= MAX_QUESTIONS:
+        # For final analysis
+        return Prompt(
+            FINAL,
+            FINAL_INSTRUCTION,
+            f"The conversation history is:\n{conversation}\n\n"
+            f"You have reached the maximum number of questions ({MAX_QUESTIONS}).",
+        )
+
+    if len(history) == 0:
+        # For Initial question
+        return Prompt(OPENING, OPENING_INSTRUCTION, "Start the conversation.")
+
+    # For follow-up questions
+    return Prompt(FOLLOW_UP, FOLLOW_UP_INSTRUCTION, f"The conversation so far is:\n{conversation}")
+
+
+class ContextCache:
+    """
+    Registers the static system instructions with Gemini context caching so
+    each request only sends the dynamic contents.
+
+    Caches are created on first use and refreshed shortly before they expire.
+    An instruction below the model's minimum cacheable size (`min_tokens`,
+    estimated at four characters per token) is always sent inline. When
+    creating a cache fails, the branch is sent inline until a retry, after a
+    backoff that doubles with each failure up to `max_backoff` seconds.
+    """
+
+    def __init__(self, client, model: str, ttl: float = 3600, min_tokens: int = 1024,
+                 backoff: float = 30.0, max_backoff: float = 1800.0):
+        self.client = client
+        self.model = model
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._caches = {}
+        # Branches whose instruction is too small to cache
+        self._uncacheable = set()
+        # Branch -> (consecutive failures, time of the next attempt)
+        self._failures = {}
+        self._lock = None
+
+    def _skip(self, branch, now) -> bool:
+        if branch in self._uncacheable:
+            return True
+        if len(SYSTEM_INSTRUCTIONS[branch]) // 4 < self.min_tokens:
+            self._uncacheable.add(branch)
+            print(f"Context caching skipped for {branch} prompts: the instruction is below "
+                  f"the minimum of {self.min_tokens} tokens; sending it inline.")
+            return True
+        _, retry_at = self._failures.get(branch, (0, 0))
+        return now < retry_at
+
+    async def name_for(self, branch: str, now: float):
+        """Name of the cached content for a branch, or None to send the instruction inline."""
+        if self._skip(branch, now):
+            return None
+
+        name, expires = self._caches.get(branch, (None, 0))
+        if name is not None and now < expires - 60:
+            return name
+
+        from google.genai import types
+
+        # Created here so it belongs to the loop the cache is used from
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            name, expires = self._caches.get(branch, (None, 0))
+            if name is not None and now < expires - 60:
+                return name
+            if self._skip(branch, now):
+                return None
+            return await self._create(branch, now, types)
+
+    async def _create(self, branch, now, types):
+        try:
+            cache = await self.client.aio.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"symptom-checker-{branch}",
+                    system_instruction=SYSTEM_INSTRUCTIONS[branch],
+                    ttl=f"{int(self.ttl)}s",
+                ),
+            )
+        except Exception as e:
+            failures = self._failures.get(branch, (0, 0))[0] + 1
+            delay = min(self.backoff * 2 ** (failures - 1), self.max_backoff)
+            self._failures[branch] = (failures, now + delay)
+            print(f"Context caching unavailable for {branch} prompts, retrying in {delay:.0f}s: {e}")
+            return None
+
+        self._failures.pop(branch, None)
+        self._caches[branch] = (cache.name, now + self.ttl)
+        return cache.name
+
+
+def prompt_size_report(history):
+    """
+    Characters sent per turn of a conversation when the whole prompt is
+    inlined versus when the static instruction is sent as system context.
+    """
+    rows = []
+    for turn in range(len(history) + 1):
+        prompt = build_prompt(history[:turn])
+        rows.append({
+            "turn": turn,
+            "branch": prompt.branch,
+            "inline_chars": len(prompt.text),
+            "contents_chars": len(prompt.contents),
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    sample_history = [
+        {"question": f"Sample follow-up question number {i}?", "answer": f"Sample answer {i}"}
+        for i in range(MAX_QUESTIONS)
+    ]
+    for row in prompt_size_report(sample_history):
+        saved = 1 - row["contents_chars"] / row["inline_chars"]
+        print(f"turn {row['turn']:>2} {row['branch']:<9} inline={row['inline_chars']:>5} "
+              f"contents={row['contents_chars']:>5} saved={saved:.0%}")
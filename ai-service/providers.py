@@ -0,0 +1,307 @@
+"""
+Model providers for symptom checker generation, with hedging and failover.
+
+Each provider turns a `Prompt` into a `Completion` on the LLM runtime loop.
+`HedgedRouter` tries them in order: when the first provider is slower than
+its usual latency at a given percentile, a backup request goes to the next
+provider and the first answer wins. A provider that fails is skipped in
+favour of the next one, and a circuit breaker stops sending it traffic after
+repeated failures until a trial request succeeds again.
+"""
+import asyncio
+import time
+from collections import deque, namedtuple
+
+from lifecycle import LazyProxy
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when every provider failed or has its circuit open."""
+
+
+Completion = namedtuple("Completion", ["text", "provider", "tokens"])
+
+
+def gemini_tokens(usage) -> dict:
+    """Token counts from a Gemini `usage_metadata`."""
+    return {
+        "input_tokens": getattr(usage, "prompt_token_count", None) or 0,
+        "cached_input_tokens": getattr(usage, "cached_content_token_count", None) or 0,
+        "output_tokens": getattr(usage, "candidates_token_count", None) or 0,
+    }
+
+
+# --- Providers ---
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, client, model: str, config_for):
+        self.client = client
+        self.model = model
+        # Async callable building the GenerateContentConfig for a prompt
+        self.config_for = config_for
+
+    async def complete(self, prompt) -> Completion:
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=prompt.contents,
+            config=await self.config_for(prompt),)
+        return Completion(response.text, self.name, gemini_tokens(response.usage_metadata))
+
+    async def ping(self):
+        await self.client.aio.models.get(model=self.model)
+
+
+class OpenAIProvider:
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str, json_mode: bool = True):
+        from openai import AsyncOpenAI
+
+        # Created on first use in each worker, like the Gemini client
+        self.client = LazyProxy(lambda: AsyncOpenAI(api_key=api_key))
+        self.model = model
+        self.json_mode = json_mode
+
+    async def complete(self, prompt) -> Completion:
+        options = {"response_format": {"type": "json_object"}} if self.json_mode else {}
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": prompt.system_instruction},
+                {"role": "user", "content": prompt.contents},
+            ],
+            **options,
+        )
+        usage = response.usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        return Completion(response.choices[0].message.content or "", self.name, {
+            "input_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "cached_input_tokens": getattr(details, "cached_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        })
+
+    async def ping(self):
+        await self.client.models.retrieve(self.model)
+
+
+class AnthropicProvider:
+    name = "anthropic"
+
+    def __init__(self, api_key: str, model: str, max_tokens: int = 2048):
+        import anthropic
+
+        self.client = LazyProxy(lambda: anthropic.AsyncAnthropic(api_key=api_key))
+        self.model = model
+        self.max_tokens = max_tokens
+
+    async def complete(self, prompt) -> Completion:
+        response = await self.client.messages.create(
+            model=self.model,
+            system=prompt.system_instruction,
+            max_tokens=self.max_tokens,
+            messages=[{"role": "user", "content": prompt.contents}],
+        )
+        usage = response.usage
+        return Completion(response.content[0].text if response.content else "", self.name, {
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "cached_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+        })
+
+    async def ping(self):
+        await self.client.models.retrieve(self.model)
+# -------------------------
+
+
+# --- Hedging and Circuit Breaking ---
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. Once `reset_timeout`
+    seconds have passed a single trial request is let through: success closes
+    the circuit again, failure re-opens it. Only used from the runtime loop.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial:
+                return False
+            self._trial = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = self.clock()
+
+    def release(self):
+        """Forget a request that was cancelled before it succeeded or failed."""
+        self._trial = False
+
+
+class LatencyWindow:
+    """Latencies of the most recent successful calls."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self._samples)
+        return ordered[min(int(pct / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class HedgedRouter:
+    """
+    Sends each prompt to the first available provider, hedges to the next
+    one when the call runs past the `hedge_percentile` latency seen for that
+    provider and prompt branch, and fails over to the next one on errors.
+    Until `min_samples` latencies are known, `initial_delay` is used instead.
+    """
+
+    def __init__(self, providers, hedge_percentile: float = 95, initial_delay: float = 2.0,
+                 min_delay: float = 0.1, min_samples: int = 20, max_hedges: int = 1,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.providers = list(providers)
+        self.hedge_percentile = hedge_percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.breakers = {
+            provider.name: CircuitBreaker(failure_threshold, reset_timeout) for provider in self.providers
+        }
+        self._latency = {}
+        self._counts = {
+            provider.name: dict.fromkeys(["calls", "failures", "hedges", "wins", "rejected"], 0)
+            for provider in self.providers
+        }
+
+    def provider(self, name: str):
+        return next(provider for provider in self.providers if provider.name == name)
+
+    def hedge_delay(self, provider_name: str, branch: str) -> float:
+        window = self._latency.get((provider_name, branch))
+        if window is None or len(window) < self.min_samples:
+            return self.initial_delay
+        return max(window.percentile(self.hedge_percentile), self.min_delay)
+
+    async def _attempt(self, provider, prompt):
+        started = time.perf_counter()
+        completion = await provider.complete(prompt)
+        return completion, time.perf_counter() - started
+
+    async def complete(self, prompt) -> Completion:
+        """The first successful completion among the providers."""
+        waiting = list(self.providers)
+        running = {}
+        errors = []
+        hedges = 0
+        won = False
+
+        def launch(hedge: bool) -> bool:
+            while waiting:
+                provider = waiting.pop(0)
+                if not self.breakers[provider.name].allow():
+                    self._counts[provider.name]["rejected"] += 1
+                    continue
+                self._counts[provider.name]["calls"] += 1
+                if hedge:
+                    self._counts[provider.name]["hedges"] += 1
+                running[asyncio.ensure_future(self._attempt(provider, prompt))] = provider
+                return True
+            return False
+
+        launch(hedge=False)
+        try:
+            while running:
+                timeout = None
+                if waiting and hedges < self.max_hedges:
+                    first = next(iter(running.values()))
+                    timeout = self.hedge_delay(first.name, prompt.branch)
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The call is slower than usual; race a backup against it
+                    if launch(hedge=True):
+                        hedges += 1
+                    else:
+                        hedges = self.max_hedges
+                    continue
+
+                for task in done:
+                    provider = running.pop(task)
+                    try:
+                        completion, elapsed = task.result()
+                    except Exception as e:
+                        self.breakers[provider.name].record_failure()
+                        self._counts[provider.name]["failures"] += 1
+                        errors.append(f"{provider.name}: {e}")
+                        print(f"Provider {provider.name} failed: {e}")
+                        continue
+                    self.breakers[provider.name].record_success()
+                    self._counts[provider.name]["wins"] += 1
+                    self._latency.setdefault((provider.name, prompt.branch), LatencyWindow()).add(elapsed)
+                    won = True
+                    return completion
+
+                if not running:
+                    launch(hedge=False)
+        finally:
+            for task, provider in running.items():
+                task.cancel()
+                if won:
+                    # Lost the race; says nothing about the provider's health
+                    self.breakers[provider.name].release()
+                else:
+                    # Abandoned by the caller's timeout
+                    self.breakers[provider.name].record_failure()
+                    self._counts[provider.name]["failures"] += 1
+
+        if not errors:
+            raise ProviderUnavailableError("All model providers have their circuit open")
+        raise ProviderUnavailableError("All model providers failed: " + "; ".join(errors))
+
+    async def ping(self) -> str:
+        """Name of the first provider that answers a metadata request; no tokens are spent."""
+        errors = []
+        for provider in self.providers:
+            try:
+                await provider.ping()
+                return provider.name
+            except Exception as e:
+                errors.append(f"{provider.name}: {e}")
+        raise ProviderUnavailableError("No model provider is reachable: " + "; ".join(errors))
+
+    def stats(self) -> dict:
+        """Per-provider call counters and circuit state."""
+        return {
+            name: {**counts, "circuit": self.breakers[name].state}
+            for name, counts in self._counts.items()
+        }
+# -------------------------
@@ -0,0 +1,165 @@
+"""
+Local emergency red-flag detection for the symptom checker.
+
+Every phrase of every rule is compiled into a single trie-shaped regex, so
+checking a conversation is one regex scan over the user's answers however
+many rules there are; the matched phrase maps back to its rule. A match is ignored when a
+negation ("no", "not", "without", ...) is one of the few words just before
+it in the same clause, so answers like "No difficulty breathing" do not
+trigger. Clauses end at punctuation and at conjunctions such as "but" or
+"now", so "No fever but severe chest pain" still does. A negation carries
+over short phrases joined by "or"/"nor" ("No slurred speech or face
+drooping", "neither ... nor ..."), and an answer that ends with just a
+negation after the phrase ("Self harm thoughts? Never") negates it too.
+"""
+import json
+import re
+
+NEGATIONS = frozenset((
+    "no", "not", "never", "without", "denies", "deny", "neither", "nor",
+    "don't", "doesn't", "didn't", "haven't", "hasn't", "isn't", "wasn't",
+))
+# Words that negate a phrase when an answer ends with nothing else after it
+TRAILING_NEGATIONS = frozenset(("no", "not", "never", "none", "nope", "nah"))
+COORDINATORS = frozenset(("or", "nor"))
+CLAUSE_BREAK = re.compile(r"[.,;:!?|]|\b(?:but|and|now|however|though|although|yet|except)\b")
+PUNCTUATION_BREAK = re.compile(r"[.,;:!?-]")
+WORD = re.compile(r"[\w']+")
+# Words before a phrase searched for a negation, and the characters they are taken from
+NEGATION_WORDS = 3
+NEGATION_WINDOW = 40
+# Longest coordinated phrase ("slurred speech or ...") a negation carries over
+CONJUNCT_WORDS = 4
+COORDINATION_WINDOW = 80
+
+
+def negated(text: str, start: int) -> bool:
+    """Whether the phrase starting at `start` is negated by the words just before it."""
+    clause = CLAUSE_BREAK.split(text[max(start - NEGATION_WINDOW, 0):start])[-1]
+    if any(word in NEGATIONS for word in WORD.findall(clause)[-NEGATION_WORDS:]):
+        return True
+    return negated_by_coordination(text, start)
+
+
+def negated_by_coordination(text: str, start: int) -> bool:
+    """
+    Whether the phrase is the later part of a negated coordination, as "face
+    drooping" is in "no slurred speech or face drooping": a negation followed
+    only by short conjuncts joined with "or"/"nor".
+    """
+    words = WORD.findall(CLAUSE_BREAK.split(text[max(start - COORDINATION_WINDOW, 0):start])[-1])
+    negations = [index for index, word in enumerate(words) if word in NEGATIONS]
+    if not negations:
+        return False
+    conjuncts = [[]]
+    for word in words[negations[-1] + 1:]:
+        if word in COORDINATORS:
+            conjuncts.append([])
+        else:
+            conjuncts[-1].append(word)
+    return (
+        len(conjuncts) > 1
+        and len(conjuncts[-1]) < NEGATION_WORDS
+        and all(len(conjunct) <= CONJUNCT_WORDS for conjunct in conjuncts)
+    )
+
+
+def negated_after(text: str, end: int) -> bool:
+    """
+    Whether the answer goes on to deny the phrase ending at `end`, as in
+    "self harm thoughts? never": the clause ends within a few words and only
+    negations follow it up to the end of the answer.
+    """
+    rest = text[end:].split("|", 1)[0]
+    separator = PUNCTUATION_BREAK.search(rest)
+    if separator is None or len(WORD.findall(rest[:separator.start()])) >= NEGATION_WORDS:
+        return False
+    tail = WORD.findall(rest[separator.end():])
+    return bool(tail) and all(word in TRAILING_NEGATIONS for word in tail)
+
+
+def normalize(text) -> str:
+    """Lower-case text and unify apostrophes and whitespace before matching."""
+    return " ".join(str(text or "").replace("’", "'").lower().split())
+
+
+def _trie_regex(phrases) -> str:
+    """
+    Build one regex from a character trie of the phrases, so the engine only
+    follows the branches that match the next character instead of trying
+    every phrase at every position. Longer phrases are preferred.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        optional = "" in node
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if optional:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class RedFlagEngine:
+    """Matches user answers against a set of emergency rules."""
+
+    def __init__(self, rules, advice=None):
+        self.rules = list(rules)
+        self.advice = list(advice or [])
+        self._rule_for_phrase = {}
+        for index, rule in enumerate(self.rules):
+            for phrase in rule["patterns"]:
+                self._rule_for_phrase.setdefault(normalize(phrase), index)
+
+        self._pattern = None
+        if self._rule_for_phrase:
+            alternation = _trie_regex(self._rule_for_phrase)
+            self._pattern = re.compile(r"(?<!\w)" + alternation + r"(?!\w)")
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("rules", []), data.get("advice"))
+
+    def check(self, history) -> list:
+        """Rules matched by the answers in `history`, in rule order."""
+        if self._pattern is None:
+            return []
+
+        text = " | ".join(normalize(item.get("answer")) for item in history)
+        matched = set()
+        for match in self._pattern.finditer(text):
+            index = self._rule_for_phrase[match.group(0)]
+            if index in matched:
+                continue
+            if negated(text, match.start()) or negated_after(text, match.end()):
+                continue
+            matched.add(index)
+        return [self.rules[index] for index in sorted(matched)]
+
+    def emergency_analysis(self, matched) -> dict:
+        """Final analysis advising emergency care, in the symptom checker response schema."""
+        names = ", ".join(rule["name"].lower() for rule in matched)
+        return {
+            "summary": (
+                f"Your answers describe symptoms that may need emergency care ({names}). "
+                "Please seek emergency medical help immediately."
+            ),
+            "suggested_causes": [
+                {"name": rule["name"], "description": rule["description"]} for rule in matched
+            ],
+            "treatment_plans": [dict(step) for step in self.advice],
+            "is_final": True,
+            "emergency": True,
+            "red_flags": [rule["id"] for rule in matched],
+        }
@@ -0,0 +1,287 @@
+"""
+Pre-aggregated assessment analytics.
+
+Saved analyses are folded into small rollup documents in their own
+collection as they are written, one per UTC day and one per day and user,
+cause or treatment:
+
+    {_id: "day:2025-01-31", type: "day", day, count, users}
+    {_id: "user:2025-01-31:<user>", type: "user", day, userId, count}
+    {_id: "cause:2025-01-31:<key>", type: "cause", day, name, key, count}
+    {_id: "treatment:2025-01-31:<key>", type: "treatment", day, name, key, count}
+
+Any date range is then summarised by aggregating a few documents per day
+instead of every saved history. Run as a script to rebuild the rollups of
+existing data:
+    python rollups.py --start 2025-01-01 --end 2025-01-31
+"""
+import argparse
+import datetime
+import time
+
+from pymongo import ASCENDING, UpdateOne
+
+DAY_FORMAT = '%Y-%m-%d'
+
+
+def day_of(created_at) -> datetime.datetime:
+    """Midnight UTC of the day a document was created."""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(datetime.timezone.utc)
+    return datetime.datetime(created_at.year, created_at.month, created_at.day)
+
+
+def parse_day(text: str) -> datetime.datetime:
+    """A YYYY-MM-DD date as midnight UTC; raises ValueError."""
+    return datetime.datetime.strptime(text, DAY_FORMAT)
+
+
+def term_key(name) -> str:
+    """Grouping key for a cause or treatment name."""
+    return name.strip().lower()
+
+
+def _user_of(doc) -> str:
+    # Histories use `user`; ones saved by older versions of the service have `userId`
+    user = doc.get('user') or doc.get('userId')
+    return str(user) if user is not None else ''
+
+
+def _terms(analysis):
+    """(kind, name) pairs of a saved analysis, in either stored shape."""
+    analysis = analysis or {}
+    for cause in analysis.get('suggested_causes') or []:
+        name = str(cause.get('name') or cause.get('title') or '').strip()
+        if name:
+            yield 'cause', name
+    for plan in analysis.get('treatment_plans') or []:
+        name = str(plan.get('action') or plan.get('title') or '').strip()
+        if name:
+            yield 'treatment', name
+
+
+class AssessmentRollups:
+    """Maintains and queries the rollup collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.recorded = 0
+        self.failures = 0
+
+    def ensure_indexes(self):
+        self.collection.create_index([('day', ASCENDING), ('type', ASCENDING)])
+
+    def record(self, documents):
+        """
+        Add saved history documents to the rollups. Called by the analysis
+        writer after each batch is written, so increments for a whole batch
+        go out in two bulk writes.
+        """
+        days, users, terms = {}, {}, {}
+        for doc in documents:
+            if not doc.get('analysis') or not doc.get('createdAt'):
+                continue
+            day = day_of(doc['createdAt'])
+            days[day] = days.get(day, 0) + 1
+            user_key = (day, _user_of(doc))
+            users[user_key] = users.get(user_key, 0) + 1
+            for kind, name in _terms(doc['analysis']):
+                term = terms.setdefault((kind, day, term_key(name)), [name, 0])
+                term[1] += 1
+        if not days:
+            return
+
+        try:
+            user_keys = list(users)
+            result = self.collection.bulk_write([
+                UpdateOne(
+                    {'_id': f"user:{day.strftime(DAY_FORMAT)}:{user}"},
+                    {'$inc': {'count': users[(day, user)]},
+                     '$setOnInsert': {'type': 'user', 'day': day, 'userId': user}},
+                    upsert=True,
+                )
+                for day, user in user_keys
+            ], ordered=False)
+            # Only the first document of a user on a day creates their user rollup
+            new_users = {}
+            for index in result.upserted_ids:
+                day = user_keys[index][0]
+                new_users[day] = new_users.get(day, 0) + 1
+
+            operations = [
+                UpdateOne(
+                    {'_id': f"day:{day.strftime(DAY_FORMAT)}"},
+                    {'$inc': {'count': count, 'users': new_users.get(day, 0)},
+                     '$setOnInsert': {'type': 'day', 'day': day}},
+                    upsert=True,
+                )
+                for day, count in days.items()
+            ]
+            operations.extend(
+                UpdateOne(
+                    {'_id': f"{kind}:{day.strftime(DAY_FORMAT)}:{key}"},
+                    {'$inc': {'count': count},
+                     '$setOnInsert': {'type': kind, 'day': day, 'name': name, 'key': key}},
+                    upsert=True,
+                )
+                for (kind, day, key), (name, count) in terms.items()
+            )
+            self.collection.bulk_write(operations, ordered=False)
+            self.recorded += sum(days.values())
+        except Exception as e:
+            # The backfill rebuilds anything missed here
+            self.failures += 1
+            print(f"Error updating assessment rollups: {e}")
+
+    def summary(self, start: datetime.datetime, end: datetime.datetime, limit: int = 10) -> dict:
+        """Totals, unique users, top causes and treatments, and daily counts for days in [start, end]."""
+
+        def top(kind):
+            return [
+                {'$match': {'type': kind}},
+                {'$group': {'_id': '$key', 'name': {'$first': '$name'}, 'count': {'$sum': '$count'}}},
+                {'$sort': {'count': -1, '_id': 1}},
+                {'$limit': limit},
+            ]
+
+        pipeline = [
+            {'$match': {'day': {'$gte': start, '$lte': end}}},
+            {'$facet': {
+                'daily': [
+                    {'$match': {'type': 'day'}},
+                    {'$sort': {'day': 1}},
+                    {'$project': {'_id': 0, 'day': 1, 'count': 1, 'users': 1}},
+                ],
+                'users': [
+                    {'$match': {'type': 'user'}},
+                    {'$group': {'_id': '$userId'}},
+                    {'$count': 'count'},
+                ],
+                'causes': top('cause'),
+                'treatments': top('treatment'),
+            }},
+        ]
+        result = next(self.collection.aggregate(pipeline), {})
+
+        daily = result.get('daily', [])
+        total = sum(row['count'] for row in daily)
+
+        def frequencies(rows):
+            return [
+                {
+                    'name': row['name'],
+                    'count': row['count'],
+                    'percentage': round(row['count'] / total * 100, 1) if total else 0.0,
+                }
+                for row in rows
+            ]
+
+        return {
+            'startDate': start.strftime(DAY_FORMAT),
+            'endDate': end.strftime(DAY_FORMAT),
+            'totalAssessments': total,
+            'uniqueUsers': result['users'][0]['count'] if result.get('users') else 0,
+            'commonCauses': frequencies(result.get('causes', [])),
+            'commonTreatments': frequencies(result.get('treatments', [])),
+            'timeAnalysis': [
+                {'date': row['day'].strftime(DAY_FORMAT), 'count': row['count'], 'uniqueUsers': row.get('users', 0)}
+                for row in daily
+            ],
+        }
+
+    def backfill(self, histories, start=None, end=None) -> int:
+        """
+        Rebuild the rollups of the days in [start, end] (all days when open)
+        from the saved histories, server side with `$merge`. Returns the
+        number of rollup documents written.
+        """
+        created = {}
+        if start is not None:
+            created['$gte'] = start
+        if end is not None:
+            created['$lt'] = end + datetime.timedelta(days=1)
+        match = {'analysis': {'$ne': None}, 'createdAt': created or {'$exists': True}}
+
+        day = {'$dateFromParts': {
+            'year': {'$year': '$createdAt'},
+            'month': {'$month': '$createdAt'},
+            'day': {'$dayOfMonth': '$createdAt'},
+        }}
+        day_text = {'$dateToString': {'date': '$_id.day', 'format': '%Y-%m-%d'}}
+        user = {'$toString': {'$ifNull': ['$user', {'$ifNull': ['$userId', '']}]}}
+        merge = {'$merge': {'into': self.collection.name, 'whenMatched': 'replace', 'whenNotMatched': 'insert'}}
+
+        def term_pipeline(kind, field, name_field):
+            name = {'$trim': {'input': {'$ifNull': [f'$item.{name_field}', '$item.title']}}}
+            return [
+                {'$match': match},
+                {'$unwind': f'$analysis.{field}'},
+                {'$project': {'day': day, 'item': f'$analysis.{field}'}},
+                {'$match': {'item': {'$type': 'object'}}},
+                {'$project': {'day': 1, 'name': name}},
+                {'$addFields': {'key': {'$toLower': '$name'}}},
+                {'$match': {'key': {'$nin': [None, '']}}},
+                {'$group': {'_id': {'day': '$day', 'key': '$key'}, 'name': {'$first': '$name'}, 'count': {'$sum': 1}}},
+                {'$project': {
+                    '_id': {'$concat': [f'{kind}:', day_text, ':', '$_id.key']},
+                    'type': kind, 'day': '$_id.day', 'name': 1, 'key': '$_id.key', 'count': 1,
+                }},
+                merge,
+            ]
+
+        pipelines = [
+            [
+                {'$match': match},
+                {'$group': {'_id': {'day': day, 'user': user}, 'count': {'$sum': 1}}},
+                {'$project': {
+                    '_id': {'$concat': ['user:', day_text, ':', '$_id.user']},
+                    'type': 'user', 'day': '$_id.day', 'userId': '$_id.user', 'count': 1,
+                }},
+                merge,
+            ],
+            [
+                {'$match': match},
+                {'$group': {'_id': {'day': day}, 'count': {'$sum': 1}, 'users': {'$addToSet': user}}},
+                {'$project': {
+                    '_id': {'$concat': ['day:', day_text]},
+                    'type': 'day', 'day': '$_id.day', 'count': 1, 'users': {'$size': '$users'},
+                }},
+                merge,
+            ],
+            term_pipeline('cause', 'suggested_causes', 'name'),
+            term_pipeline('treatment', 'treatment_plans', 'action'),
+        ]
+
+        days = {}
+        if start is not None:
+            days['$gte'] = start
+        if end is not None:
+            days['$lte'] = end
+        self.collection.delete_many({'day': days} if days else {})
+        for pipeline in pipelines:
+            histories.aggregate(pipeline)
+        return self.collection.count_documents({'day': days} if days else {})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild assessment rollups from saved symptom histories.")
+    parser.add_argument('--start', type=parse_day, help="First day to rebuild (YYYY-MM-DD); default: all")
+    parser.add_argument('--end', type=parse_day, help="Last day to rebuild (YYYY-MM-DD); default: all")
+    args = parser.parse_args(argv)
+
+    from pymongo import MongoClient
+    from config import ApiConfig
+    from persistence import HISTORY_COLLECTION
+
+    config = ApiConfig()
+    db = MongoClient(config.MONGODB_CONNECTION_STRING)[config.MONGODB_DB_NAME]
+    rollups = AssessmentRollups(db.assessmentRollups)
+    rollups.ensure_indexes()
+
+    started = time.perf_counter()
+    written = rollups.backfill(db[HISTORY_COLLECTION], args.start, args.end)
+    print(f"Rebuilt {written} rollup documents in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import json
+import threading
+
+from prompts import OPENING, FOLLOW_UP, FINAL
+
+
+class ResponseFormatError(Exception):
+    """Raised when a model response is not valid JSON for its prompt branch."""
+
+
+# --- Response Schemas ---
+# Written in the OpenAPI subset Gemini accepts as `response_schema`.
+QUESTION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "question": {"type": "STRING"},
+        "options": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "is_final": {"type": "BOOLEAN"},
+    },
+    "required": ["question", "options", "is_final"],
+}
+
+FINAL_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "summary": {"type": "STRING"},
+        "suggested_causes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "name": {"type": "STRING"},
+                    "description": {"type": "STRING"},
+                },
+                "required": ["name", "description"],
+            },
+        },
+        "treatment_plans": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "action": {"type": "STRING"},
+                    "details": {"type": "STRING"},
+                },
+                "required": ["action", "details"],
+            },
+        },
+        "is_final": {"type": "BOOLEAN"},
+    },
+    "required": ["summary", "suggested_causes", "treatment_plans", "is_final"],
+}
+
+# A follow-up turn either asks another question or, in an emergency, ends
+# with a final analysis, so every field is allowed and only is_final required.
+FOLLOW_UP_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {**QUESTION_SCHEMA["properties"], **FINAL_SCHEMA["properties"]},
+    "required": ["is_final"],
+}
+
+RESPONSE_SCHEMAS = {
+    OPENING: QUESTION_SCHEMA,
+    FOLLOW_UP: FOLLOW_UP_SCHEMA,
+    FINAL: FINAL_SCHEMA,
+}
+# -------------------------
+
+
+# --- Validation ---
+_TYPE_CHECKS = {
+    "OBJECT": lambda value: isinstance(value, dict),
+    "ARRAY": lambda value: isinstance(value, list),
+    "STRING": lambda value: isinstance(value, str),
+    "BOOLEAN": lambda value: isinstance(value, bool),
+    "INTEGER": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "NUMBER": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+}
+
+
+def compile_schema(schema):
+    """
+    Turn a schema into a validator function once, so validating a response
+    is a walk over prebuilt closures rather than a reinterpretation of the
+    schema. The validator returns a list of error messages.
+    """
+    type_name = schema["type"]
+    check_type = _TYPE_CHECKS[type_name]
+
+    if type_name == "OBJECT":
+        properties = {key: compile_schema(sub) for key, sub in schema.get("properties", {}).items()}
+        required = tuple(schema.get("required", ()))
+
+        def validate(value, path="$"):
+            if not check_type(value):
+                return [f"{path}: expected object"]
+            errors = [f"{path}.{key}: is required" for key in required if key not in value]
+            for key, validate_property in properties.items():
+                if key in value:
+                    errors.extend(validate_property(value[key], f"{path}.{key}"))
+            return errors
+
+    elif type_name == "ARRAY":
+        validate_item = compile_schema(schema["items"])
+
+        def validate(value, path="$"):
+            if not check_type(value):
+                return [f"{path}: expected array"]
+            errors = []
+            for index, item in enumerate(value):
+                errors.extend(validate_item(item, f"{path}[{index}]"))
+            return errors
+
+    else:
+        def validate(value, path="$"):
+            return [] if check_type(value) else [f"{path}: expected {type_name.lower()}"]
+
+    return validate
+
+
+_validate_question = compile_schema(QUESTION_SCHEMA)
+_validate_final = compile_schema(FINAL_SCHEMA)
+
+
+def validate_response(branch: str, data) -> list:
+    """Validate a parsed response against its branch; returns error messages."""
+    if branch == OPENING:
+        return _validate_question(data)
+    if branch == FINAL or (isinstance(data, dict) and data.get("is_final")):
+        return _validate_final(data)
+    return _validate_question(data)
+
+
+def clean_json_text(text: str) -> str:
+    """Strip the markdown code fence the model tends to wrap its JSON in."""
+    return text.strip().lstrip('```json').rstrip('```').strip()
+
+
+def parse_response(branch: str, text: str) -> dict:
+    """Parse and validate a model response, raising ResponseFormatError on failure."""
+    try:
+        data = json.loads(clean_json_text(text or ""))
+    except json.JSONDecodeError as e:
+        raise ResponseFormatError(f"not valid JSON: {e}")
+
+    errors = validate_response(branch, data)
+    if errors:
+        raise ResponseFormatError("; ".join(errors))
+    return data
+
+
+def repair_prompt(branch: str, text: str, error: ResponseFormatError) -> str:
+    """Prompt asking the model to fix a response that failed validation."""
+    return f"""
+        Your previous response could not be used because it {error}.
+
+        Previous response:
+        {text}
+
+        Return only the corrected response as a single JSON object matching this schema:
+        {json.dumps(RESPONSE_SCHEMAS[branch])}
+        """
+# -------------------------
+
+
+class ParseStats:
+    """Counters for response parsing failures and repair attempts, per branch."""
+
+    FIELDS = ("responses", "parse_failures", "repairs_attempted", "repairs_succeeded")
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def increment(self, branch: str, field: str):
+        with self._lock:
+            counts = self._counts.setdefault(branch, dict.fromkeys(self.FIELDS, 0))
+            counts[field] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {branch: dict(counts) for branch, counts in self._counts.items()}
+        for counts in stats.values():
+            responses = counts["responses"] or 1
+            counts["parse_failure_rate"] = counts["parse_failures"] / responses
+            counts["repair_rate"] = counts["repairs_attempted"] / responses
+        return stats
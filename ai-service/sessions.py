@@ -0,0 +1,157 @@
+import datetime
+import threading
+import time
+import uuid
+
+from prompts import render_turn
+
+
+class SessionNotFoundError(Exception):
+    """Raised when a session id is unknown or has expired."""
+
+
+class SessionConflictError(Exception):
+    """Raised when an answer arrives for a question that was already answered."""
+
+
+def new_session(user_id) -> dict:
+    """A fresh session document."""
+    now = datetime.datetime.now()
+    return {
+        '_id': uuid.uuid4().hex,
+        'userId': user_id,
+        'history': [],
+        # Rendered conversation prefix, extended by one turn per answer
+        'conversation': "",
+        'pendingQuestion': None,
+        'createdAt': now,
+        'updatedAt': now,
+    }
+
+
+def extend_conversation(conversation: str, item) -> str:
+    """Append one rendered turn to the conversation prefix."""
+    turn = render_turn(item)
+    return f"{conversation}\n{turn}" if conversation else turn
+
+
+class InMemorySessionStore:
+    """Keeps sessions in process memory; idle sessions expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._sessions = {}
+        self._touched = {}
+        self._lock = threading.Lock()
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for session_id in [sid for sid, touched in self._touched.items() if touched < cutoff]:
+            self._sessions.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+    def _load(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        self._touched[session_id] = time.monotonic()
+        return session
+
+    def create(self, user_id) -> dict:
+        session = new_session(user_id)
+        with self._lock:
+            self._expire()
+            self._sessions[session['_id']] = session
+            self._touched[session['_id']] = time.monotonic()
+        return dict(session)
+
+    def get(self, session_id) -> dict:
+        with self._lock:
+            self._expire()
+            return dict(self._load(session_id))
+
+    def append_answer(self, session_id, answer) -> dict:
+        with self._lock:
+            session = self._load(session_id)
+            if session['pendingQuestion'] is None:
+                raise SessionConflictError(session_id)
+
+            item = {'question': session['pendingQuestion'], 'answer': answer}
+            session['history'] = session['history'] + [item]
+            session['conversation'] = extend_conversation(session['conversation'], item)
+            session['pendingQuestion'] = None
+            session['updatedAt'] = datetime.datetime.now()
+            return dict(session)
+
+    def set_pending_question(self, session_id, question):
+        with self._lock:
+            session = self._load(session_id)
+            session['pendingQuestion'] = question
+            session['updatedAt'] = datetime.datetime.now()
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._touched.pop(session_id, None)
+
+
+class MongoSessionStore:
+    """
+    Keeps sessions in a MongoDB collection so every worker can serve every turn.
+    A TTL index on `updatedAt` removes idle sessions.
+    """
+
+    def __init__(self, collection, ttl: float = 3600):
+        self.collection = collection
+        self.ttl = ttl
+
+    def ensure_indexes(self):
+        self.collection.create_index('updatedAt', expireAfterSeconds=int(self.ttl))
+
+    def create(self, user_id) -> dict:
+        session = new_session(user_id)
+        self.collection.insert_one(session)
+        return session
+
+    def get(self, session_id) -> dict:
+        session = self.collection.find_one({'_id': session_id})
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        return session
+
+    def append_answer(self, session_id, answer) -> dict:
+        session = self.get(session_id)
+        question = session.get('pendingQuestion')
+        if question is None:
+            raise SessionConflictError(session_id)
+
+        item = {'question': question, 'answer': answer}
+        conversation = extend_conversation(session['conversation'], item)
+        # Matching on the pending question makes a duplicate answer a no-op
+        result = self.collection.update_one(
+            {'_id': session_id, 'pendingQuestion': question},
+            {
+                '$push': {'history': item},
+                '$set': {
+                    'conversation': conversation,
+                    'pendingQuestion': None,
+                    'updatedAt': datetime.datetime.now(),
+                },
+            },
+        )
+        if result.modified_count == 0:
+            raise SessionConflictError(session_id)
+
+        session['history'].append(item)
+        session['conversation'] = conversation
+        session['pendingQuestion'] = None
+        return session
+
+    def set_pending_question(self, session_id, question):
+        self.collection.update_one(
+            {'_id': session_id},
+            {'$set': {'pendingQuestion': question, 'updatedAt': datetime.datetime.now()}},
+        )
+
+    def delete(self, session_id):
+        self.collection.delete_one({'_id': session_id})
@@ -0,0 +1,371 @@
+"""
+Offline conversation simulator for the symptom checker.
+
+Drives `generate_response`, the logic behind /api/symptom-checker, without
+HTTP: simulated patients answer each question by picking from the returned
+`options` until a final analysis arrives, and many conversations run at
+once on one asyncio loop. The model backend is pluggable:
+
+    stub           a local stand-in answering valid JSON after a simulated delay
+    real           the providers configured for the service (LLM_PROVIDERS)
+    module:factory a callable returning a provider (or a list of them)
+
+Every conversation is written as one JSONL line with `symptoms` and
+`analysis` (or `error`), the shape `verify_bulk.py --source jsonl` reads,
+plus the persona and the branch and latency of each turn. A report
+of per-branch latency, turns to the final analysis and parse failure rates
+is printed at the end; pass an earlier report with --compare to see how a
+prompt or model change moved them.
+
+Personas come from --personas, a JSON list such as
+    [{"name": "sinus", "answers": ["Headache", "Pressure", "Forehead"], "weight": 2},
+     {"name": "stoic", "prefer": ["no", "none", "mild"]}]
+where `answers` are matched in order against the offered options, then
+`prefer` keywords, then a random option. The built-in personas are
+`random` and `first` (always the first option).
+
+Example:
+    python simulator.py --conversations 2000 --concurrency 200 --output sim.jsonl --report sim_report.json
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import random
+import time
+
+from metrics import percentile
+
+MAX_TURNS = 20
+
+
+# --- Personas ---
+class Persona:
+    """A simulated patient. `answers` are tried in order, then `prefer` keywords, then a random option."""
+
+    def __init__(self, name: str, answers=None, prefer=None, weight: float = 1.0, first: bool = False):
+        self.name = name
+        self.answers = [answer.lower() for answer in answers or []]
+        self.prefer = [keyword.lower() for keyword in prefer or []]
+        self.weight = weight
+        self.first = first
+
+    def choose(self, turn: int, options, rng) -> str:
+        if not options:
+            # A question without options gets the scripted answer verbatim, if there is one
+            return self.answers[turn] if turn < len(self.answers) else "I'm not sure"
+        if turn < len(self.answers):
+            for option in options:
+                if self.answers[turn] in option.lower():
+                    return option
+        for keyword in self.prefer:
+            for option in options:
+                if keyword in option.lower():
+                    return option
+        return options[0] if self.first else rng.choice(options)
+
+
+BUILT_IN_PERSONAS = {
+    "random": Persona("random"),
+    "first": Persona("first", first=True),
+}
+
+
+def load_personas(path: str):
+    with open(path, encoding='utf-8') as f:
+        return [
+            Persona(entry['name'], entry.get('answers'), entry.get('prefer'), entry.get('weight', 1.0))
+            for entry in json.load(f)
+        ]
+# -------------------------
+
+
+# --- Stub Backend ---
+STUB_OPENING_OPTIONS = [
+    "Headache, Migraine, or Head Injury",
+    "Chest or Abdominal Pain",
+    "Fever or Flu-like Symptoms",
+    "Skin Issue (e.g., rash, lump)",
+    "Dizziness or Weakness",
+    "Other",
+]
+STUB_ANSWERS = [
+    "Less than a day", "A few days", "More than a week", "Mild", "Moderate", "Severe",
+    "Yes", "No", "Sometimes", "None of these", "Fever", "Nausea", "Fatigue",
+]
+# Matches the local red-flag rules, so some conversations end in an emergency analysis
+STUB_EMERGENCY_ANSWER = "Severe chest pain spreading to my arm"
+
+
+class StubProvider:
+    """
+    Answers every prompt with schema-valid JSON after a log-normal delay.
+    A share of responses is malformed to exercise the repair path, and a
+    share of follow-up turns finish early or offer an emergency answer.
+    """
+
+    name = "stub"
+
+    def __init__(self, median_ms: float = 80.0, sigma: float = 0.35, malformed_rate: float = 0.0,
+                 early_final_rate: float = 0.02, emergency_rate: float = 0.01, seed: int = None):
+        self.median = median_ms / 1000
+        self.sigma = sigma
+        self.malformed_rate = malformed_rate
+        self.early_final_rate = early_final_rate
+        self.emergency_rate = emergency_rate
+        self._random = random.Random(seed)
+
+    def _respond(self, prompt) -> dict:
+        if prompt.branch == "opening":
+            return {"question": "What is the main symptom or health concern you are experiencing?",
+                    "options": STUB_OPENING_OPTIONS, "is_final": False}
+        if prompt.branch == "final" or self._random.random() < self.early_final_rate:
+            return {
+                "summary": "Symptoms described over the conversation.",
+                "suggested_causes": [{"name": "Viral infection", "description": "Common and self-limiting."},
+                                     {"name": "Tension headache", "description": "Often linked to stress."}],
+                "treatment_plans": [{"action": "Monitor your symptoms", "details": "Seek care if they worsen."}],
+                "is_final": True,
+            }
+        options = self._random.sample(STUB_ANSWERS, 4)
+        if self._random.random() < self.emergency_rate:
+            options[-1] = STUB_EMERGENCY_ANSWER
+        return {"question": f"Follow-up question {prompt.contents.count('Q:') + 1}?",
+                "options": options, "is_final": False}
+
+    async def complete(self, prompt):
+        from providers import Completion
+
+        branch_scale = 2.5 if prompt.branch == "final" else 1.0
+        await asyncio.sleep(self._random.lognormvariate(0, self.sigma) * self.median * branch_scale)
+        text = json.dumps(self._respond(prompt))
+        if self._random.random() < self.malformed_rate:
+            text = text[:len(text) // 2]
+        return Completion(text, self.name, {
+            "input_tokens": len(prompt.system_instruction + prompt.contents) // 4,
+            "cached_input_tokens": 0,
+            "output_tokens": len(text) // 4,
+        })
+
+    async def ping(self):
+        return None
+# -------------------------
+
+
+def load_service(args):
+    """Import the service configured for simulation, with the chosen model backend."""
+    # Every simulated patient is a new user taking 10+ turns; do not rate limit or cap them
+    os.environ['USER_RATE_LIMIT_PER_MINUTE'] = '0'
+    os.environ['LLM_MAX_IN_FLIGHT'] = str(max(args.concurrency * 2, int(os.getenv('LLM_MAX_IN_FLIGHT', '64'))))
+    if not args.cache:
+        os.environ['RESPONSE_CACHE_MAX_ENTRIES'] = '0'
+    if not args.triage_tree:
+        os.environ['TRIAGE_TREE_PATH'] = ''
+
+    import app as service
+    from providers import HedgedRouter
+
+    # Simulated analyses go to the JSONL output, never to MongoDB
+    service.save_final_analysis = lambda user_id, history, response_json: None
+
+    if args.backend == 'stub':
+        providers = [StubProvider(args.stub_ms, malformed_rate=args.stub_malformed_rate,
+                                  early_final_rate=args.stub_early_final_rate,
+                                  emergency_rate=args.stub_emergency_rate, seed=args.seed)]
+    elif args.backend != 'real':
+        module_name, _, factory = args.backend.partition(':')
+        providers = getattr(importlib.import_module(module_name), factory or 'create_provider')()
+        if not isinstance(providers, (list, tuple)):
+            providers = [providers]
+    if args.backend != 'real':
+        service.model_router = HedgedRouter(providers)
+    return service
+
+
+class Simulator:
+    """Runs simulated conversations through the service and collects their outcomes."""
+
+    def __init__(self, service, personas, concurrency: int = 100, seed: int = 7, output=None, run_id: str = "sim"):
+        self.service = service
+        self.personas = personas
+        self.concurrency = concurrency
+        self.seed = seed
+        self.output = output
+        self.run_id = run_id
+        self.latencies = {}
+        self.turns_to_final = {}
+        self.errors = {}
+        self.completed = 0
+
+    async def conversation(self, index: int) -> dict:
+        from metrics import RequestTimer
+
+        rng = random.Random(f"{self.seed}:{index}")
+        persona = rng.choices(self.personas, weights=[persona.weight for persona in self.personas])[0]
+        user_id = f"{self.run_id}-user-{index}"
+        history, turns = [], []
+        record = {"_id": f"{self.run_id}-{index}", "persona": persona.name, "symptoms": history}
+
+        for turn in range(MAX_TURNS):
+            timer = RequestTimer('simulator')
+            started = time.perf_counter()
+            try:
+                response = await self.service.generate_response(list(history), user_id, timer=timer)
+            except Exception as e:
+                _, status, _ = self.service.error_payload(e)
+                timer.finish(status)
+                record["error"] = {"branch": timer.branch, "status": status, "type": type(e).__name__,
+                                   "message": str(e)}
+                self.errors[(timer.branch, status)] = self.errors.get((timer.branch, status), 0) + 1
+                break
+            elapsed = (time.perf_counter() - started) * 1000
+            timer.finish(200)
+            self.latencies.setdefault(timer.branch, []).append(elapsed)
+            turns.append({"branch": timer.branch, "ms": round(elapsed, 1)})
+
+            if response.get('is_final'):
+                record["analysis"] = response
+                self.completed += 1
+                key = (timer.branch, len(history))
+                self.turns_to_final[key] = self.turns_to_final.get(key, 0) + 1
+                break
+            answer = persona.choose(len(history), response.get('options') or [], rng)
+            history.append({"question": response.get('question', ''), "answer": answer})
+        else:
+            record["error"] = {"branch": "simulator", "type": "TooManyTurns", "message": f"No final after {MAX_TURNS} turns"}
+
+        record["turns"] = turns
+        if self.output is not None:
+            self.output.write(json.dumps(record, default=str) + "\n")
+        return record
+
+    async def run(self, conversations: int):
+        """Run `conversations` conversations, at most `concurrency` at a time."""
+        next_index = 0
+
+        async def worker():
+            nonlocal next_index
+            while next_index < conversations:
+                index = next_index
+                next_index += 1
+                await self.conversation(index)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, conversations))))
+
+    def report(self, conversations: int, duration: float) -> dict:
+        branches = {}
+        for branch, values in self.latencies.items():
+            values = sorted(values)
+            branches[branch] = {
+                "n": len(values),
+                "p50_ms": round(percentile(values, 50), 1),
+                "p95_ms": round(percentile(values, 95), 1),
+                "p99_ms": round(percentile(values, 99), 1),
+            }
+
+        answered = sorted(turns for (_, turns), count in self.turns_to_final.items() for _ in range(count))
+        final_branches = {}
+        for (branch, turns), count in self.turns_to_final.items():
+            final_branches[branch] = final_branches.get(branch, 0) + count
+        histogram = {}
+        for turns in answered:
+            histogram[turns] = histogram.get(turns, 0) + 1
+
+        return {
+            "conversations": conversations,
+            "completed": self.completed,
+            "duration_s": round(duration, 2),
+            "conversations_per_s": round(conversations / duration, 1) if duration else 0.0,
+            "latency": branches,
+            "turns_to_final": {
+                "mean": round(sum(answered) / len(answered), 2) if answered else None,
+                "p50": percentile(answered, 50),
+                "p95": percentile(answered, 95),
+                "histogram": dict(sorted(histogram.items())),
+                "by_final_branch": final_branches,
+            },
+            "parsing": self.service.parse_stats.stats(),
+            "errors": [
+                {"branch": branch, "status": status, "count": count}
+                for (branch, status), count in sorted(self.errors.items(), key=lambda item: -item[1])
+            ],
+            "token_usage": self.service.usage_stats.stats(),
+        }
+
+
+def print_report(report, previous=None):
+    def delta(current, before):
+        if before in (None, 0) or current is None:
+            return ""
+        return f" ({(current - before) / before * 100:+.1f}%)"
+
+    previous = previous or {}
+    print(f"\n{report['conversations']} conversations, {report['completed']} reached a final analysis "
+          f"in {report['duration_s']}s ({report['conversations_per_s']}/s)")
+    print("latency by branch:")
+    for branch, stats in sorted(report['latency'].items()):
+        before = previous.get('latency', {}).get(branch, {})
+        print(f"  {branch:<12} n={stats['n']:>6} p50={stats['p50_ms']:8.1f}ms{delta(stats['p50_ms'], before.get('p50_ms'))}"
+              f" p95={stats['p95_ms']:8.1f}ms{delta(stats['p95_ms'], before.get('p95_ms'))}"
+              f" p99={stats['p99_ms']:8.1f}ms")
+    turns = report['turns_to_final']
+    before = previous.get('turns_to_final', {})
+    print(f"turns to final: mean={turns['mean']}{delta(turns['mean'], before.get('mean'))} "
+          f"p50={turns['p50']} p95={turns['p95']} by branch={turns['by_final_branch']}")
+    print("parsing:")
+    for branch, stats in sorted(report['parsing'].items()):
+        before = previous.get('parsing', {}).get(branch, {})
+        unrecovered = stats['repairs_attempted'] - stats['repairs_succeeded']
+        print(f"  {branch:<12} responses={stats['responses']:>6} "
+              f"failure rate={stats['parse_failure_rate']:.2%}"
+              f"{' (was ' + format(before['parse_failure_rate'], '.2%') + ')' if before else ''} "
+              f"unrecovered={unrecovered}")
+    for error in report['errors']:
+        print(f"errors: {error['count']} x {error['status']} on {error['branch']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate symptom checker conversations without HTTP.")
+    parser.add_argument('--conversations', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100, help="Conversations in flight at once")
+    parser.add_argument('--backend', default='stub', help="stub, real, or module:factory returning a provider")
+    parser.add_argument('--personas', help="JSON file of personas (default: random and first)")
+    parser.add_argument('--output', help="JSONL file for the simulated conversations")
+    parser.add_argument('--report', help="Write the report as JSON to this file")
+    parser.add_argument('--compare', help="Earlier report to compare against")
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled")
+    parser.add_argument('--triage-tree', action='store_true', help="Answer common paths from the triage tree")
+    parser.add_argument('--stub-ms', type=float, default=80, help="Median stub latency of question turns")
+    parser.add_argument('--stub-malformed-rate', type=float, default=0.02)
+    parser.add_argument('--stub-early-final-rate', type=float, default=0.02)
+    parser.add_argument('--stub-emergency-rate', type=float, default=0.01)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--verbose', action='store_true', help="Show the service's own logging")
+    args = parser.parse_args(argv)
+
+    personas = load_personas(args.personas) if args.personas else list(BUILT_IN_PERSONAS.values())
+    with open(os.devnull, 'w') as devnull, contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        service = load_service(args)
+        output = stack.enter_context(open(args.output, 'w', encoding='utf-8')) if args.output else None
+        simulator = Simulator(service, personas, args.concurrency, args.seed, output,
+                              run_id=f"sim-{int(time.time())}")
+        started = time.perf_counter()
+        asyncio.run(simulator.run(args.conversations))
+        report = simulator.report(args.conversations, time.perf_counter() - started)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print_report(report, previous)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+
+# Values of the final analysis that are emitted as soon as they are complete
+ANALYSIS_EVENTS = {
+    ("summary",): "summary",
+    ("suggested_causes", "*"): "cause",
+    ("treatment_plans", "*"): "treatment",
+}
+
+
+class IncrementalJSONParser:
+    """
+    Scans a JSON object as it arrives in chunks and reports watched values
+    the moment they are complete.
+
+    `watch` maps a path (object keys, with "*" for any array index) to the
+    event name to report. Anything before the first "{" (such as a ```json
+    fence) is skipped, and the raw text is kept in `buffer` so the whole
+    object can still be parsed once the stream ends.
+    """
+
+    def __init__(self, watch=None):
+        self.watch = ANALYSIS_EVENTS if watch is None else watch
+        self.buffer = ""
+        self.done = False
+        self._pos = 0
+        self._started = False
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+
+    def _path(self):
+        return tuple(frame["key"] if frame["kind"] == "object" else "*" for frame in self._stack)
+
+    def _complete(self, start, end, events):
+        event = self.watch.get(self._path())
+        if event:
+            events.append((event, json.loads(self.buffer[start:end])))
+
+    def feed(self, text: str):
+        """Add a chunk of text and return the (event, value) pairs it completed."""
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+
+        for i in range(self._pos, len(buffer)):
+            if self.done:
+                break
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    if frame["kind"] == "object" and frame["expect_key"]:
+                        frame["key"] = json.loads(buffer[self._string_start:i + 1])
+                        frame["expect_key"] = False
+                    else:
+                        self._complete(self._string_start, i + 1, events)
+                continue
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._stack.append({"kind": "object", "key": None, "expect_key": True, "start": None})
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                self._stack[-1]["start"] = i
+                kind = "object" if char == "{" else "array"
+                self._stack.append({"kind": kind, "key": None, "expect_key": kind == "object", "start": None})
+            elif char in "}]":
+                self._stack.pop()
+                if not self._stack:
+                    self.done = True
+                else:
+                    self._complete(self._stack[-1]["start"], i + 1, events)
+            elif char == ",":
+                frame = self._stack[-1]
+                if frame["kind"] == "object":
+                    frame["expect_key"] = True
+
+        self._pos = len(buffer)
+        return events
+
+
+def sse_event(event: str, data) -> str:
+    """Format a single Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def iterate_sync(events):
+    """
+    Iterate an async iterator of events from synchronous code (a WSGI
+    response), driving it on a private event loop in the calling thread.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
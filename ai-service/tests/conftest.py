@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The service modules and the benchmark fakes are imported as top-level modules
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, os.path.join(SERVICE_DIR, 'benchmarks'))
+
+
+@pytest.fixture(scope='session')
+def service():
+    """The service module, configured for Gemini only and with its caches off."""
+    os.environ.update({
+        'GEMINI_API_KEY': 'test',
+        # Never contacted: final analyses are not saved in these tests
+        'MONGODB_CONNECTION_STRING': 'mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=50',
+        'MONGODB_DB_NAME': 'test',
+        'LLM_PROVIDERS': 'gemini',
+        'USER_RATE_LIMIT_PER_MINUTE': '0',
+        'RESPONSE_CACHE_MAX_ENTRIES': '0',
+        'TRIAGE_TREE_PATH': '',
+        'CONTEXT_CACHE': 'false',
+    })
+    import app
+
+    return app
@@ -0,0 +1,24 @@
+from cache import ResponseCache, cache_version, make_cache_key
+
+HISTORY = [{"question": "Where is the pain?", "answer": "Head"}]
+
+
+def test_version_changes_the_key():
+    v1 = cache_version("prompt", "gemini-2.5-flash", True)
+    v2 = cache_version("prompt, edited", "gemini-2.5-flash", True)
+    assert v1 != v2
+    assert make_cache_key("initial", HISTORY, v1) == make_cache_key("initial", HISTORY, v1)
+    assert make_cache_key("initial", HISTORY, v1) != make_cache_key("initial", HISTORY, v2)
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(max_entries=10, ttl=60, path=path)
+    cache.set("key", {"question": "Any fever?"})
+    assert cache.get("key") == {"question": "Any fever?"}
+    cache.flush()
+
+    restarted = ResponseCache(max_entries=10, ttl=60, path=path)
+    assert restarted.get("key") == {"question": "Any fever?"}
+    assert restarted.disk_hits == 1
+    assert restarted.get("missing") is None
@@ -0,0 +1,15 @@
+import pytest
+
+from llm import LLMBusyError, LLMRuntime
+
+
+def test_uncapped_calls_run_when_the_cap_is_reached():
+    runtime = LLMRuntime(max_in_flight=0, timeout=1)
+
+    async def ping():
+        return "gemini"
+
+    with pytest.raises(LLMBusyError):
+        runtime.submit(ping).result()
+    assert runtime.submit(ping, capped=False).result() == "gemini"
+    assert runtime.in_flight == 0
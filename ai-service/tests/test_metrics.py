@@ -0,0 +1,37 @@
+import os
+
+from metrics import Counter, Gauge, Histogram, MultiProcessCollector, Registry, mark_process_dead
+
+
+def worker_registry(requests, in_flight, latency):
+    registry = Registry()
+    registry.register(Counter("requests_total", "Requests.", ("route",))).inc("check", amount=requests)
+    registry.register(Gauge("in_flight", "Calls in flight.")).set(value=in_flight)
+    registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))).observe(value=latency)
+    return registry
+
+
+def test_scrape_combines_every_worker(tmp_path):
+    other = MultiProcessCollector(worker_registry(2, 3, 0.05), str(tmp_path))
+    other.write()
+    os.rename(tmp_path / f"{os.getpid()}.json", tmp_path / "1234.json")
+
+    lines = MultiProcessCollector(worker_registry(5, 1, 0.5), str(tmp_path)).render().splitlines()
+
+    assert 'requests_total{route="check"} 7' in lines
+    assert f'in_flight{{pid="{os.getpid()}"}} 1' in lines
+    assert 'in_flight{pid="1234"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+
+
+def test_exited_worker_keeps_its_counts_but_not_its_gauges(tmp_path):
+    MultiProcessCollector(worker_registry(2, 3, 0.05), str(tmp_path)).write()
+    os.rename(tmp_path / f"{os.getpid()}.json", tmp_path / "1234.json")
+    mark_process_dead(str(tmp_path), 1234)
+
+    lines = MultiProcessCollector(worker_registry(5, 1, 0.5), str(tmp_path)).render().splitlines()
+
+    assert 'requests_total{route="check"} 7' in lines
+    assert not any(line.startswith('in_flight{pid="1234"}') for line in lines)
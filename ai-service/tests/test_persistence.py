@@ -0,0 +1,33 @@
+import mongomock
+from bson import ObjectId
+
+from persistence import HISTORY_COLLECTION, AnalysisWriter, history_document
+
+HISTORY = [{"question": "Where is the pain?", "answer": "Head"}]
+ANALYSIS = {
+    "is_final": True,
+    "summary": "Likely a tension headache.",
+    "suggested_causes": [{"name": "Tension headache", "description": "Muscle tension."}],
+    "treatment_plans": [{"action": "Rest", "details": "Rest in a quiet room."}],
+}
+
+
+def test_saved_in_the_nextjs_history_shape():
+    histories = mongomock.MongoClient().db[HISTORY_COLLECTION]
+    user_id = str(ObjectId())
+    writer = AnalysisWriter(histories)
+    writer.enqueue(history_document(user_id, HISTORY, ANALYSIS))
+    writer.close()
+
+    saved = histories.find_one({"user": ObjectId(user_id)})
+    assert saved["symptoms"] == HISTORY
+    assert saved["analysis"] == {
+        "summary": "Likely a tension headache.",
+        "suggested_causes": [{"title": "Tension headache", "description": "Muscle tension."}],
+        "treatment_plans": [{"title": "Rest", "description": "Rest in a quiet room."}],
+    }
+
+
+def test_guests_are_not_saved():
+    assert history_document(None, HISTORY, ANALYSIS) is None
+    assert history_document("guest", HISTORY, ANALYSIS) is None
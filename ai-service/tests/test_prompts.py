@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from fakes import FakeGenaiClient, LatencyModel
+from llm import UsageStats
+from prompts import FINAL, FOLLOW_UP, MAX_QUESTIONS, OPENING, SYSTEM_INSTRUCTIONS, ContextCache, build_prompt
+
+
+@pytest.fixture
+def client(service, monkeypatch):
+    fake = FakeGenaiClient(LatencyModel(medians={"opening": 0.001, "follow_up": 0.001, "final": 0.001}))
+    monkeypatch.setattr(service.model_router.provider('gemini'), 'client', fake)
+    monkeypatch.setattr(service, 'usage_stats', UsageStats())
+    monkeypatch.setattr(service, 'save_final_analysis', lambda user_id, history, response_json: None)
+    return fake
+
+
+def run_conversation(service):
+    """Answer every question with its first option until the final analysis."""
+    history = []
+    while True:
+        response = asyncio.run(service.generate_response(history, 'user-1'))
+        if response.get('is_final'):
+            return history
+        history.append({"question": response['question'], "answer": response['options'][0]})
+
+
+def tokens(text):
+    return len(text) // 4
+
+
+def expected_prompts(history):
+    return [build_prompt(history[:turn]) for turn in range(len(history) + 1)]
+
+
+def test_static_instruction_is_sent_as_system_instruction(service, client):
+    history = run_conversation(service)
+    prompts = expected_prompts(history)
+    requests = list(client.aio.models.requests)
+
+    assert len(history) == MAX_QUESTIONS
+    assert [prompt.branch for prompt in prompts] == [OPENING] + [FOLLOW_UP] * (MAX_QUESTIONS - 1) + [FINAL]
+    assert len(requests) == len(prompts)
+    for prompt, (contents, config) in zip(prompts, requests):
+        assert contents == prompt.contents
+        assert SYSTEM_INSTRUCTIONS[prompt.branch].strip() not in contents
+        assert config.system_instruction == SYSTEM_INSTRUCTIONS[prompt.branch]
+        assert config.cached_content is None
+
+    stats = service.usage_stats.stats()
+    for branch in (OPENING, FOLLOW_UP, FINAL):
+        sent = [prompt for prompt in prompts if prompt.branch == branch]
+        assert stats[branch]['requests'] == len(sent)
+        assert stats[branch]['input_tokens'] == sum(
+            (len(prompt.contents) + len(prompt.system_instruction)) // 4 for prompt in sent)
+        assert stats[branch]['cached_input_tokens'] == 0
+
+
+def test_context_cache_leaves_only_contents_uncached(service, client, monkeypatch):
+    monkeypatch.setattr(service, 'context_cache', ContextCache(client, service.GEMINI_MODEL, min_tokens=0))
+    history = run_conversation(service)
+    prompts = expected_prompts(history)
+    requests = list(client.aio.models.requests)
+
+    assert len(requests) == len(prompts)
+    for prompt, (contents, config) in zip(prompts, requests):
+        assert contents == prompt.contents
+        assert config.cached_content is not None
+        assert config.system_instruction is None
+
+    # One cache per branch, created once and reused by every later turn
+    assert len(client.aio.caches.sizes) == 3
+
+    stats = service.usage_stats.stats()
+    for branch in (OPENING, FOLLOW_UP, FINAL):
+        sent = [prompt for prompt in prompts if prompt.branch == branch]
+        cached = tokens(SYSTEM_INSTRUCTIONS[branch]) * len(sent)
+        assert stats[branch]['cached_input_tokens'] == cached
+        uncached = stats[branch]['input_tokens'] - cached
+        assert uncached == sum(tokens(prompt.contents) for prompt in sent)
+        # Per turn, only the contents are billed as new input instead of the whole inline prompt
+        assert uncached < sum(tokens(prompt.text) for prompt in sent)
+
+
+def test_small_instructions_are_sent_inline_without_trying_to_cache(capsys):
+    client = FakeGenaiClient()
+    cache = ContextCache(client, 'gemini-2.5-flash', min_tokens=len(SYSTEM_INSTRUCTIONS[FINAL]))
+
+    for now in (0, 1, 2):
+        assert asyncio.run(cache.name_for(FINAL, now)) is None
+    assert client.aio.caches.sizes == {}
+    assert capsys.readouterr().out.count("below the minimum") == 1
+
+
+def test_failed_cache_creation_is_retried_after_a_backoff():
+    client = FakeGenaiClient()
+    create = client.aio.caches.create
+    attempts = []
+
+    async def flaky_create(model, config=None):
+        attempts.append(model)
+        if len(attempts) <= 2:
+            raise ConnectionError("unavailable")
+        return await create(model, config)
+
+    client.aio.caches.create = flaky_create
+    cache = ContextCache(client, 'gemini-2.5-flash', min_tokens=0, backoff=10)
+
+    assert asyncio.run(cache.name_for(FINAL, 0)) is None
+    assert asyncio.run(cache.name_for(FINAL, 5)) is None
+    assert len(attempts) == 1
+    # The second failure doubles the wait
+    assert asyncio.run(cache.name_for(FINAL, 10)) is None
+    assert asyncio.run(cache.name_for(FINAL, 25)) is None
+    assert len(attempts) == 2
+    assert asyncio.run(cache.name_for(FINAL, 30)) is not None
+    assert len(attempts) == 3
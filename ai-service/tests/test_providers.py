@@ -0,0 +1,221 @@
+import asyncio
+
+import pytest
+
+from prompts import FOLLOW_UP, Prompt
+from providers import CircuitBreaker, Completion, HedgedRouter, ProviderUnavailableError
+
+PROMPT = Prompt(FOLLOW_UP, "instruction", "The conversation so far is: ...")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedProvider:
+    """Answers after `delay` seconds, or fails when `fail` is set; records starts and cancellations."""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.started = []
+        self.cancelled = 0
+
+    async def complete(self, prompt):
+        self.started.append(asyncio.get_running_loop().time())
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{self.name} is unavailable")
+        return Completion("{}", self.name, {"input_tokens": 1, "cached_input_tokens": 0, "output_tokens": 1})
+
+
+async def timed_complete(router, prompt=PROMPT):
+    started = asyncio.get_running_loop().time()
+    completion = await router.complete(prompt)
+    return completion, started
+
+
+# --- Circuit breaker ---
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=Clock())
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, clock=Clock())
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_exactly_one_trial_through():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 9.9
+    assert not breaker.allow()
+
+    clock.now = 10.0
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_trial_reopens_circuit():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now = 19.9
+    assert not breaker.allow()
+
+
+def test_released_trial_can_be_retried():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+# -------------------------
+
+
+# --- Hedged router ---
+def test_fast_call_is_not_hedged():
+    primary, backup = ScriptedProvider("primary", delay=0.01), ScriptedProvider("backup")
+    router = HedgedRouter([primary, backup], initial_delay=0.2)
+
+    completion, _ = asyncio.run(timed_complete(router))
+
+    assert completion.provider == "primary"
+    assert backup.started == []
+    assert router.stats()["backup"]["hedges"] == 0
+
+
+def test_hedge_launches_after_hedge_delay():
+    primary, backup = ScriptedProvider("primary", delay=1.0), ScriptedProvider("backup", delay=0.01)
+    router = HedgedRouter([primary, backup], initial_delay=0.1)
+    assert router.hedge_delay("primary", FOLLOW_UP) == 0.1
+
+    completion, started = asyncio.run(timed_complete(router))
+
+    assert completion.provider == "backup"
+    assert backup.started[0] - started >= 0.1
+    assert backup.started[0] - started < 0.5
+    assert router.stats()["backup"]["hedges"] == 1
+    assert router.stats()["backup"]["wins"] == 1
+
+
+def test_hedge_delay_follows_latency_percentile():
+    provider = ScriptedProvider("primary", delay=0.0)
+    router = HedgedRouter([provider], initial_delay=5.0, min_delay=0.0, min_samples=20)
+    for _ in range(20):
+        asyncio.run(router.complete(PROMPT))
+    assert router.hedge_delay("primary", FOLLOW_UP) < 5.0
+
+
+def test_losing_call_is_cancelled_and_released(monkeypatch):
+    primary, backup = ScriptedProvider("primary", delay=1.0), ScriptedProvider("backup", delay=0.01)
+    router = HedgedRouter([primary, backup], initial_delay=0.05)
+    released = []
+    monkeypatch.setattr(router.breakers["primary"], "release", lambda: released.append("primary"))
+
+    async def run():
+        completion = await router.complete(PROMPT)
+        # Let the cancellation reach the losing call
+        await asyncio.sleep(0)
+        return completion
+
+    completion = asyncio.run(run())
+
+    assert completion.provider == "backup"
+    assert primary.cancelled == 1
+    assert released == ["primary"]
+    assert router.breakers["primary"].failures == 0
+    assert router.stats()["primary"]["failures"] == 0
+
+
+def test_fails_over_on_error():
+    primary, backup = ScriptedProvider("primary", fail=True), ScriptedProvider("backup")
+    router = HedgedRouter([primary, backup], initial_delay=1.0)
+
+    completion, started = asyncio.run(timed_complete(router))
+
+    assert completion.provider == "backup"
+    # Launched on the failure, not after the hedge delay
+    assert backup.started[0] - started < 0.5
+    assert router.breakers["primary"].failures == 1
+    assert router.stats()["primary"]["failures"] == 1
+    assert router.stats()["backup"]["hedges"] == 0
+
+
+def test_all_failures_raise_provider_unavailable():
+    router = HedgedRouter([ScriptedProvider("primary", fail=True), ScriptedProvider("backup", fail=True)])
+
+    with pytest.raises(ProviderUnavailableError, match="All model providers failed"):
+        asyncio.run(router.complete(PROMPT))
+
+
+def test_open_circuits_raise_provider_unavailable():
+    primary, backup = ScriptedProvider("primary"), ScriptedProvider("backup")
+    router = HedgedRouter([primary, backup], failure_threshold=1, reset_timeout=60)
+    for breaker in router.breakers.values():
+        breaker.record_failure()
+
+    with pytest.raises(ProviderUnavailableError, match="circuit open"):
+        asyncio.run(router.complete(PROMPT))
+    assert primary.started == [] and backup.started == []
+    assert router.stats()["primary"]["rejected"] == 1
+    assert router.stats()["backup"]["rejected"] == 1
+
+
+def test_open_circuit_is_skipped():
+    primary, backup = ScriptedProvider("primary"), ScriptedProvider("backup")
+    router = HedgedRouter([primary, backup], failure_threshold=1, reset_timeout=60)
+    router.breakers["primary"].record_failure()
+
+    completion = asyncio.run(router.complete(PROMPT))
+
+    assert completion.provider == "backup"
+    assert primary.started == []
+
+
+def test_caller_timeout_counts_as_failure():
+    primary = ScriptedProvider("primary", delay=1.0)
+    router = HedgedRouter([primary], failure_threshold=1)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(router.complete(PROMPT), 0.05)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert primary.cancelled == 1
+    assert router.breakers["primary"].state == "open"
+    assert router.stats()["primary"]["failures"] == 1
+# -------------------------
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from red_flags import RedFlagEngine
+
+RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'red_flags.json')
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return RedFlagEngine.from_file(RULES)
+
+
+def matched(engine, *answers):
+    return [rule['id'] for rule in engine.check([{"question": "?", "answer": answer} for answer in answers])]
+
+
+@pytest.mark.parametrize("answer, rule", [
+    ("Severe chest pain spreading to my arm", "cardiac_chest_pain"),
+    ("No fever but severe chest pain", "cardiac_chest_pain"),
+    ("no cough but cannot breathe", "breathing_difficulty"),
+    ("Without warning I got crushing chest pain", "cardiac_chest_pain"),
+    ("No fever, trouble breathing", "breathing_difficulty"),
+    ("Not at first, now I can't breathe", "breathing_difficulty"),
+    ("No headache and slurred speech", "stroke_signs"),
+    ("No fever or headache, but slurred speech", "stroke_signs"),
+    ("Self harm thoughts? Yes, every day", "self_harm"),
+    ("Slurred speech? Not sure", "stroke_signs"),
+])
+def test_emergencies_are_matched(engine, answer, rule):
+    assert matched(engine, answer) == [rule]
+
+
+@pytest.mark.parametrize("answer", [
+    "No difficulty breathing",
+    "I don't have any chest pain spreading",
+    "Never passed out",
+    "I had no seizure",
+    "Without slurred speech",
+    "No slurred speech or face drooping",
+    "neither slurred speech nor face drooping",
+    "I have not had a fever or a seizure",
+    "self harm thoughts? never",
+    "Passed out? No, never.",
+])
+def test_negated_phrases_are_ignored(engine, answer):
+    assert matched(engine, answer) == []
+
+
+def test_negation_does_not_cross_answers(engine):
+    assert matched(engine, "No", "Crushing chest pain") == ["cardiac_chest_pain"]
+
+
+def test_trailing_negation_does_not_cross_answers(engine):
+    assert matched(engine, "Crushing chest pain", "No") == ["cardiac_chest_pain"]
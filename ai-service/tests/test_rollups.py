@@ -0,0 +1,84 @@
+import datetime
+import os
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from persistence import HISTORY_COLLECTION
+from rollups import AssessmentRollups
+
+DAY = datetime.datetime(2025, 1, 31)
+JANUARY = (datetime.datetime(2025, 1, 1), datetime.datetime(2025, 1, 31))
+
+
+@pytest.fixture
+def mongod():
+    """A database on the real server at TEST_MONGODB_URI; mongomock has no $merge or $trim."""
+    uri = os.getenv('TEST_MONGODB_URI')
+    if not uri:
+        pytest.skip("TEST_MONGODB_URI is not set")
+    from pymongo import MongoClient
+
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    name = f"rollups_test_{ObjectId()}"
+    yield client[name]
+    client.drop_database(name)
+    client.close()
+
+
+def history(user, causes, treatments, hour=10):
+    """A saved history in the Next.js SymptomHistory shape."""
+    return {
+        'user': user,
+        'symptoms': [{'question': 'Where is the pain?', 'answer': 'Head'}],
+        'analysis': {
+            'summary': 'Summary',
+            'suggested_causes': [{'title': title, 'description': ''} for title in causes],
+            'treatment_plans': [{'title': title, 'description': ''} for title in treatments],
+        },
+        'createdAt': DAY.replace(hour=hour),
+    }
+
+
+def test_summary_facet_over_rollups():
+    collection = mongomock.MongoClient().db.assessmentRollups
+    collection.insert_many([
+        {'_id': 'day:2025-01-31', 'type': 'day', 'day': DAY, 'count': 3, 'users': 2},
+        {'_id': 'user:2025-01-31:a', 'type': 'user', 'day': DAY, 'userId': 'a', 'count': 2},
+        {'_id': 'user:2025-01-31:b', 'type': 'user', 'day': DAY, 'userId': 'b', 'count': 1},
+        {'_id': 'cause:2025-01-31:migraine', 'type': 'cause', 'day': DAY,
+         'name': 'Migraine', 'key': 'migraine', 'count': 2},
+        {'_id': 'treatment:2025-01-31:rest', 'type': 'treatment', 'day': DAY,
+         'name': 'Rest', 'key': 'rest', 'count': 3},
+    ])
+
+    summary = AssessmentRollups(collection).summary(*JANUARY)
+
+    assert summary['totalAssessments'] == 3
+    assert summary['uniqueUsers'] == 2
+    assert summary['commonCauses'] == [{'name': 'Migraine', 'count': 2, 'percentage': 66.7}]
+    assert summary['commonTreatments'] == [{'name': 'Rest', 'count': 3, 'percentage': 100.0}]
+    assert summary['timeAnalysis'] == [{'date': '2025-01-31', 'count': 3, 'uniqueUsers': 2}]
+
+
+def test_backfill_merges_the_histories_nextjs_saves(mongod):
+    first, second = ObjectId(), ObjectId()
+    mongod[HISTORY_COLLECTION].insert_many([
+        history(first, ['Migraine', 'Tension headache'], ['Rest']),
+        history(first, [' migraine '], ['Rest', 'Hydration'], hour=12),
+        history(second, ['Tension headache'], ['Rest']),
+    ])
+    rollups = AssessmentRollups(mongod.assessmentRollups)
+
+    assert rollups.backfill(mongod[HISTORY_COLLECTION]) == 7
+    summary = rollups.summary(*JANUARY)
+
+    assert summary['totalAssessments'] == 3
+    assert summary['uniqueUsers'] == 2
+    # Names are grouped case-insensitively after trimming
+    assert [(row['name'].lower(), row['count']) for row in summary['commonCauses']] == [
+        ('migraine', 2), ('tension headache', 2)]
+    assert [(row['name'], row['count']) for row in summary['commonTreatments']] == [
+        ('Rest', 3), ('Hydration', 1)]
+    assert summary['timeAnalysis'] == [{'date': '2025-01-31', 'count': 3, 'uniqueUsers': 2}]
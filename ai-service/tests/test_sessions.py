@@ -0,0 +1,20 @@
+import asyncio
+
+from fakes import FakeGenaiClient, LatencyModel
+from metrics import RequestTimer
+
+
+def test_retried_session_turn_shares_the_model_call(service, monkeypatch):
+    fake = FakeGenaiClient(LatencyModel(medians={"opening": 0.05}, sigma=0.0))
+    monkeypatch.setattr(service.model_router.provider('gemini'), 'client', fake)
+    session = service.session_store.create('user-1')
+
+    async def both():
+        return await asyncio.gather(*(
+            service.session_turn_response(session['_id'], {}, RequestTimer('session_turn')) for _ in range(2)))
+
+    (first, first_status, _), (retry, retry_status, _) = asyncio.run(both())
+
+    assert first_status == retry_status == 200
+    assert retry == first
+    assert fake.aio.models.calls == 1
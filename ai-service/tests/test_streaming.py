@@ -0,0 +1,100 @@
+import asyncio
+import re
+
+import pytest
+
+from fakes import FakeGenaiClient, FakeProvider, LatencyModel
+from metrics import RequestTimer
+from prompts import MAX_QUESTIONS
+from providers import HedgedRouter
+
+FAST = LatencyModel(medians={"opening": 0.001, "follow_up": 0.001, "final": 0.001}, sigma=0.0)
+FINAL_HISTORY = [{"question": f"Question {i}?", "answer": "Mild"} for i in range(MAX_QUESTIONS)]
+
+
+class FailingStream:
+    """A Gemini client whose streams fail before sending anything."""
+
+    def __init__(self):
+        self.calls = 0
+        self.aio = self
+        self.models = self
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self.calls += 1
+        raise ConnectionError("stream refused")
+
+
+@pytest.fixture
+def stream(service, monkeypatch):
+    backup = FakeProvider("backup", FAST)
+    router = HedgedRouter([FakeProvider("gemini", FAST), backup])
+    monkeypatch.setattr(service, 'model_router', router)
+    monkeypatch.setattr(service, 'client', FakeGenaiClient(FAST))
+    monkeypatch.setattr(service, 'save_final_analysis', lambda user_id, history, response_json: None)
+
+    def run():
+        error, events = service.start_stream({'history': FINAL_HISTORY, 'userId': 'user-1'}, RequestTimer('stream'))
+        assert error is None
+
+        async def collect():
+            return [frame async for frame in events]
+
+        return [re.match(r"event: (\w+)", frame).group(1) for frame in asyncio.run(collect())]
+
+    return service, router, run
+
+
+def test_stream_sends_parts_then_result_and_closes_the_breaker(stream):
+    service, router, run = stream
+    router.breakers['gemini'].failures = 2
+
+    events = run()
+
+    assert events[-1] == 'result'
+    assert 'summary' in events
+    assert service.client.aio.models.calls == 1
+    assert router.breakers['gemini'].failures == 0
+
+
+def test_open_gemini_circuit_sends_the_router_result_alone(stream):
+    service, router, run = stream
+    for _ in range(router.breakers['gemini'].failure_threshold):
+        router.breakers['gemini'].record_failure()
+
+    assert run() == ['result']
+    assert service.client.aio.models.calls == 0
+    assert router.provider('backup').calls == 1
+
+
+def test_stream_failing_before_its_first_chunk_falls_back_to_the_router(stream, monkeypatch):
+    service, router, run = stream
+    failing = FailingStream()
+    monkeypatch.setattr(service, 'client', failing)
+    router.provider('gemini').outage = True
+
+    assert run() == ['result']
+    assert failing.calls == 1
+    # Once for the stream, once for the router's own Gemini call
+    assert router.breakers['gemini'].failures == 2
+    assert router.provider('backup').calls == 1
+
+
+def test_identical_streams_share_one_model_call(stream, monkeypatch):
+    service, router, _ = stream
+    monkeypatch.setattr(service, 'client', FakeGenaiClient(LatencyModel(medians={"final": 0.05}, sigma=0.0)))
+
+    async def read(events):
+        return [re.match(r"event: (\w+)", frame).group(1) async for frame in events]
+
+    async def both():
+        streams = [service.start_stream({'history': FINAL_HISTORY, 'userId': 'user-1'}, RequestTimer('stream'))[1]
+                   for _ in range(2)]
+        return await asyncio.gather(*(read(events) for events in streams))
+
+    leader, follower = asyncio.run(both())
+
+    assert service.client.aio.models.calls == 1
+    assert 'summary' in leader and leader[-1] == 'result'
+    assert follower == ['result']
+    assert service.single_flight.stats()['in_flight'] == 0
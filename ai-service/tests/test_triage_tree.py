@@ -0,0 +1,71 @@
+from triage_tree import FALLBACK_OPTION, TriageTree, mine, write_tree
+
+OPENING = "What is your main symptom?"
+PAIN = "How bad is the pain?"
+
+
+def conversations(answers):
+    """One conversation per (answer, times) pair, all asked OPENING then PAIN."""
+    for answer, times in answers:
+        for _ in range(times):
+            yield [{"question": OPENING, "answer": "Headache"}, {"question": PAIN, "answer": answer}]
+
+
+def tree_for(tmp_path, answers, **options):
+    path = str(tmp_path / "triage_tree.bin")
+    write_tree(mine(conversations(answers)), path, **options)
+    return TriageTree(path)
+
+
+AFTER_HEADACHE = [{"question": OPENING, "answer": "Headache"}]
+
+
+def test_served_options_end_with_fallback(tmp_path):
+    tree = tree_for(tmp_path, [("Mild", 30), ("Moderate", 20), ("Worst pain ever", 1)])
+
+    response = tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8, min_coverage=0.9)
+
+    # The rarely given answer is dropped, but stays reachable through the fallback
+    assert response["question"] == PAIN
+    assert response["options"] == ["Mild", "Moderate", FALLBACK_OPTION]
+
+
+def test_fallback_opens_free_text_on_the_page(tmp_path):
+    tree = tree_for(tmp_path, [("Mild", 30), ("Moderate", 20)])
+
+    response = tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8)
+
+    # app/symptom-checker/page.tsx only asks for free text when option === 'Other'
+    assert "Other" in response["options"]
+
+
+def test_existing_other_option_is_not_duplicated(tmp_path):
+    tree = tree_for(tmp_path, [("Mild", 30), ("Other", 20)])
+
+    response = tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8)
+
+    assert response["options"] == ["Mild", "Other"]
+
+
+def test_low_coverage_node_is_not_served(tmp_path):
+    # Many different answers, each given once: the kept options would hide most of them
+    answers = [("Mild", 20), ("Moderate", 10)] + [(f"Described as {i}", 1) for i in range(10)]
+    tree = tree_for(tmp_path, answers)
+
+    assert tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8, min_coverage=0.9) is None
+    assert tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8, min_coverage=0.7) is not None
+
+
+def test_options_capped_by_max_options_count_against_coverage(tmp_path):
+    tree = tree_for(tmp_path, [(f"Answer {i}", 5) for i in range(10)], max_options=8)
+
+    assert tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8, min_coverage=0.9) is None
+    response = tree.next_question(AFTER_HEADACHE, min_support=20, min_confidence=0.8, min_coverage=0.8)
+    assert len(response["options"]) == 9
+    assert response["options"][-1] == FALLBACK_OPTION
+
+
+def test_unseen_path_misses(tmp_path):
+    tree = tree_for(tmp_path, [("Mild", 30), ("Moderate", 20)])
+
+    assert tree.next_question([{"question": OPENING, "answer": "Rash"}], 1, 0.0) is None
@@ -0,0 +1,352 @@
+"""
+Triage decision tree mined from saved symptom checker conversations.
+
+Answers are mostly picked from multiple choice options, so saved conversations
+follow a limited set of (question, answer) paths. `mine` folds the `symptoms`
+arrays of saved histories into a prefix trie that records, at every node, how
+many conversations reached it and which question was asked next with the
+answers given to it. `write_tree` serializes the trie into one compact binary
+file of fixed-size records, which `TriageTree` reads through mmap without
+deserializing it, and `TriageTreeStore` loads it on a background thread and
+reloads it whenever the file changes.
+
+Only answers given often enough are written, so a served question always
+ends with an "Other" option for answers the tree dropped, and a
+question whose kept answers cover too few of the answers seen there is left
+to the model.
+
+Run as a script to mine the tree from MongoDB or a JSONL export:
+    python triage_tree.py --output triage_tree.bin
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from cache import normalize_text
+
+MAGIC = b"TRIAGET1"
+NO_STRING = 0xFFFFFFFF
+# Offered with every served question, so rarely given answers stay reachable;
+# the symptom checker page opens its free text box for exactly this option
+FALLBACK_OPTION = "Other"
+
+# magic, nodes, edges, options, strings
+HEADER = struct.Struct("<8s4I")
+# support, first edge, edge count, question, question count, first option, option count
+NODE = struct.Struct("<7I")
+# hash of the (question, answer) pair, child node; sorted by hash within a node
+EDGE = struct.Struct("<QI")
+# answer string, times it was given
+OPTION = struct.Struct("<2I")
+OFFSET = struct.Struct("<I")
+
+
+def pair_key(question, answer) -> int:
+    """64-bit hash of a normalized (question, answer) pair."""
+    text = normalize_text(question) + "\x1f" + normalize_text(answer)
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# --- Mining ---
+def _new_node():
+    return {"support": 0, "questions": {}, "children": {}}
+
+
+def mine(conversations, max_depth: int = 10) -> dict:
+    """
+    Fold conversations (lists of {question, answer}) into a nested trie.
+    Question and answer spellings are merged after normalization; the first
+    spelling seen is the one served.
+    """
+    root = _new_node()
+    for symptoms in conversations:
+        node = root
+        node["support"] += 1
+        for item in (symptoms or [])[:max_depth]:
+            question, answer = item.get("question"), item.get("answer")
+            if not question or not answer:
+                break
+
+            asked = node["questions"].setdefault(
+                normalize_text(question), {"text": question, "count": 0, "answers": {}})
+            asked["count"] += 1
+            given = asked["answers"].setdefault(normalize_text(answer), [answer, 0])
+            given[1] += 1
+
+            node = node["children"].setdefault(pair_key(question, answer), _new_node())
+            node["support"] += 1
+    return root
+
+
+def write_tree(root: dict, path: str, min_support: int = 2, min_option_count: int = 2, max_options: int = 8):
+    """
+    Serialize a mined trie to `path`, keeping only nodes reached by at least
+    `min_support` conversations and answers given at least `min_option_count`
+    times. The file is written beside `path` and moved into place, so readers
+    never see a partial file. Returns the number of nodes written.
+    """
+    nodes, edges, options = [], [], []
+    strings, string_ids = [], {}
+
+    def intern(text):
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+
+    # Breadth first, so each node's children are contiguous
+    pending = [root]
+    while len(nodes) < len(pending):
+        node = pending[len(nodes)]
+        question, question_count, option_start, option_count = NO_STRING, 0, len(options), 0
+        if node["questions"]:
+            asked = max(node["questions"].values(), key=lambda q: q["count"])
+            answers = sorted(
+                (answer for answer in asked["answers"].values() if answer[1] >= min_option_count),
+                key=lambda answer: -answer[1],
+            )[:max_options]
+            question, question_count = intern(asked["text"]), asked["count"]
+            options.extend((intern(text), count) for text, count in answers)
+            option_count = len(answers)
+
+        children = sorted(
+            (key, child) for key, child in node["children"].items() if child["support"] >= min_support)
+        edge_start = len(edges)
+        for key, child in children:
+            edges.append((key, len(pending)))
+            pending.append(child)
+        nodes.append((node["support"], edge_start, len(children), question, question_count,
+                      option_start, option_count))
+
+    encoded = [text.encode("utf-8") for text in strings]
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(nodes), len(edges), len(options), len(encoded)))
+        for record in nodes:
+            f.write(NODE.pack(*record))
+        for record in edges:
+            f.write(EDGE.pack(*record))
+        for record in options:
+            f.write(OPTION.pack(*record))
+        offset = 0
+        for data in encoded:
+            f.write(OFFSET.pack(offset))
+            offset += len(data)
+        f.write(OFFSET.pack(offset))
+        for data in encoded:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return len(nodes)
+# -------------------------
+
+
+# --- Serving ---
+class TriageTree:
+    """Read-only view of a serialized triage tree."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.node_count, self.edge_count, self.option_count, self.string_count = \
+            HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a triage tree file")
+        self._nodes = HEADER.size
+        self._edges = self._nodes + self.node_count * NODE.size
+        self._options = self._edges + self.edge_count * EDGE.size
+        self._offsets = self._options + self.option_count * OPTION.size
+        self._strings = self._offsets + (self.string_count + 1) * OFFSET.size
+        if self.node_count == 0:
+            raise ValueError(f"{path} has no nodes")
+
+    def _string(self, index: int) -> str:
+        start, end = struct.unpack_from("<2I", self._buffer, self._offsets + index * OFFSET.size)
+        return self._buffer[self._strings + start:self._strings + end].decode("utf-8")
+
+    def _child(self, node: int, key: int):
+        _, first, count = struct.unpack_from("<3I", self._buffer, self._nodes + node * NODE.size)
+        lo, hi = first, first + count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            edge_key, child = EDGE.unpack_from(self._buffer, self._edges + mid * EDGE.size)
+            if edge_key == key:
+                return child
+            if edge_key < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def node_for(self, history):
+        """Index of the node reached by `history`, or None when the path was never seen."""
+        node = 0
+        for item in history:
+            node = self._child(node, pair_key(item.get("question"), item.get("answer")))
+            if node is None:
+                return None
+        return node
+
+    def next_question(self, history, min_support: int, min_confidence: float, min_coverage: float = 0.9):
+        """
+        The question most often asked after `history` with its observed
+        answers and a fallback as options, when enough conversations reached
+        this point, enough of them were asked that question and the kept
+        answers make up at least `min_coverage` of the answers given to it;
+        otherwise None.
+        """
+        node = self.node_for(history)
+        if node is None:
+            return None
+        support, _, _, question, question_count, option_start, option_count = \
+            NODE.unpack_from(self._buffer, self._nodes + node * NODE.size)
+        if question == NO_STRING or option_count < 2:
+            return None
+        if support < min_support or question_count < min_confidence * support:
+            return None
+        kept = [
+            OPTION.unpack_from(self._buffer, self._options + i * OPTION.size)
+            for i in range(option_start, option_start + option_count)
+        ]
+        if sum(count for _, count in kept) < min_coverage * question_count:
+            return None
+        options = [self._string(string) for string, _ in kept]
+        if FALLBACK_OPTION not in options:
+            options.append(FALLBACK_OPTION)
+        return {"question": self._string(question), "options": options, "is_final": False}
+
+
+class TriageTreeStore:
+    """
+    Holds the current triage tree. The file is loaded on a background thread,
+    so startup does not wait for it, and the thread reloads it whenever its
+    modification time changes. Lookups before the first load miss.
+    """
+
+    def __init__(self, path: str, min_support: int = 20, min_confidence: float = 0.8,
+                 min_coverage: float = 0.9, reload_interval: float = 30.0):
+        self.path = path
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self.min_coverage = min_coverage
+        self.reload_interval = reload_interval
+        self.tree = None
+        self.loads = 0
+        self.hits = 0
+        self.misses = 0
+        self._signature = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        # Also called on lookup, so each forked worker gets its own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="triage-tree", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self.reload()
+            time.sleep(self.reload_interval)
+
+    def reload(self) -> bool:
+        """Load the file if it changed since the last load. Returns True when a new tree was loaded."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if signature == self._signature:
+            return False
+        try:
+            tree = TriageTree(self.path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Triage tree could not be loaded: {e}")
+            return False
+        # Lookups in progress keep using the old mapping until they finish
+        self.tree, self._signature = tree, signature
+        self.loads += 1
+        print(f"Triage tree loaded: {tree.node_count} nodes from {self.path}")
+        return True
+
+    def lookup(self, history):
+        """Next question for `history` from the tree, or None to ask the model."""
+        self.start()
+        tree = self.tree
+        response = None
+        if tree is not None:
+            response = tree.next_question(history, self.min_support, self.min_confidence, self.min_coverage)
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    def stats(self) -> dict:
+        tree = self.tree
+        return {
+            'nodes': tree.node_count if tree is not None else 0,
+            'loads': self.loads,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+# -------------------------
+
+
+def _iter_symptoms(args):
+    if args.source == 'jsonl':
+        with open(args.input, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line).get('symptoms', [])
+        return
+
+    from pymongo import MongoClient
+    from config import ApiConfig
+    from persistence import HISTORY_COLLECTION
+
+    config = ApiConfig()
+    collection = MongoClient(config.MONGODB_CONNECTION_STRING)[config.MONGODB_DB_NAME][HISTORY_COLLECTION]
+    cursor = collection.find({'symptoms.0': {'$exists': True}}, {'symptoms': 1}).batch_size(args.batch_size)
+    for doc in cursor:
+        yield doc['symptoms']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mine saved symptom checker conversations into a triage tree file.")
+    parser.add_argument('--source', choices=['mongo', 'jsonl'], default='mongo')
+    parser.add_argument('--input', help="JSONL export to read when --source=jsonl")
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'triage_tree.bin'))
+    parser.add_argument('--max-depth', type=int, default=10, help="Answers per conversation to mine")
+    parser.add_argument('--min-support', type=int, default=2, help="Drop paths taken by fewer conversations")
+    parser.add_argument('--min-option-count', type=int, default=2, help="Drop answers given fewer times")
+    parser.add_argument('--max-options', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=500, help="MongoDB cursor batch size")
+    args = parser.parse_args(argv)
+    if args.source == 'jsonl' and not args.input:
+        parser.error("--input is required when --source=jsonl")
+
+    started = time.perf_counter()
+    conversations = 0
+
+    def counted(iterable):
+        nonlocal conversations
+        for symptoms in iterable:
+            conversations += 1
+            yield symptoms
+
+    root = mine(counted(_iter_symptoms(args)), max_depth=args.max_depth)
+    nodes = write_tree(root, args.output, args.min_support, args.min_option_count, args.max_options)
+    size = os.path.getsize(args.output)
+    print(f"Mined {conversations} conversations into {nodes} nodes ({size} bytes) "
+          f"at {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
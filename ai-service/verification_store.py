@@ -0,0 +1,418 @@
+"""
+Columnar store and queries for verifier results.
+
+`VerificationStore` appends one row per (record, verifier model), with the
+score and flags `verify_llm_out.parse_verdict` read from the verifier's
+answer, to a directory of immutable segments, one NumPy `.npy` file per
+column:
+
+    manifest.json                model names, and rows and time range per segment
+    segment-00000001/score.npy   float32, NaN when no score could be parsed
+    segment-00000001/model.npy   uint16 index into the manifest's model names
+    ...
+
+Queries read the columns through memory maps, skip segments outside the
+requested time range, and aggregate with NumPy, so millions of results are
+summarised without building a Python object per row. One process appends
+at a time; any number may query. Run as a script to query a store:
+    python verification_store.py --store verifications distribution --start 2025-01-01
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Optional
+
+import numpy as np
+
+DAY_FORMAT = '%Y-%m-%d'
+SECONDS_PER_DAY = 86400
+MAX_SCORE = 10
+# The verifier prompt asks for a score of 4 or less when information is insufficient
+LOW_CONFIDENCE = 4.0
+
+COLUMNS = {
+    'verified_at': np.int64,  # Unix seconds
+    'record': np.uint64,      # hash of the verified record's id
+    'model': np.uint16,
+    'score': np.float32,
+    'emergency': np.bool_,
+    'insufficient': np.bool_,
+    'ok': np.bool_,
+    'latency_ms': np.float32,
+}
+
+
+# --- Records ---
+@dataclass
+class VerificationRecord:
+    """One verifier model's result for one saved analysis; `score` is None when unparsed."""
+    record_id: str
+    model: str
+    verified_at: datetime.datetime
+    score: Optional[float] = None
+    emergency: bool = False
+    insufficient: bool = False
+    ok: bool = True
+    latency_ms: float = 0.0
+
+
+def record_key(record_id) -> int:
+    """Stable 64-bit key of a record id, used to match results of different models."""
+    return int.from_bytes(hashlib.blake2b(str(record_id).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def to_seconds(moment: datetime.datetime) -> int:
+    """Unix seconds of a datetime; naive datetimes are taken as UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp())
+# -------------------------
+
+
+# --- Storage ---
+class VerificationStore:
+    """
+    Append-only segments of verification results under `path`. Appended
+    records are buffered and written as a new segment by `flush()`, or
+    automatically once `segment_rows` are buffered; `compact()` merges small
+    segments left behind by frequent flushes.
+    """
+
+    def __init__(self, path: str, segment_rows: int = 100_000):
+        self.path = path
+        self.segment_rows = segment_rows
+        self._buffer = []
+        os.makedirs(path, exist_ok=True)
+        self._manifest_path = os.path.join(path, 'manifest.json')
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self) -> dict:
+        if not os.path.exists(self._manifest_path):
+            return {'models': [], 'segments': [], 'next_segment': 1}
+        with open(self._manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_path = f"{self._manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path)
+        self.manifest = manifest
+
+    def refresh(self):
+        """Pick up segments written by another process since this store was opened."""
+        self.manifest = self._read_manifest()
+
+    @property
+    def models(self) -> list:
+        return self.manifest['models']
+
+    @property
+    def rows(self) -> int:
+        return sum(segment['rows'] for segment in self.manifest['segments'])
+
+    def model_code(self, model: str) -> int:
+        """Index of a model name, registering it on first use."""
+        models = self.manifest['models']
+        if model not in models:
+            models.append(model)
+        return models.index(model)
+
+    def append(self, record: VerificationRecord):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.segment_rows:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the buffered records as a new segment; returns the number of rows written."""
+        records, self._buffer = self._buffer, []
+        if not records:
+            return 0
+        return self.write_segment({
+            'verified_at': [to_seconds(record.verified_at) for record in records],
+            'record': [record_key(record.record_id) for record in records],
+            'model': [self.model_code(record.model) for record in records],
+            'score': [np.nan if record.score is None else record.score for record in records],
+            'emergency': [record.emergency for record in records],
+            'insufficient': [record.insufficient for record in records],
+            'ok': [record.ok for record in records],
+            'latency_ms': [record.latency_ms for record in records],
+        })
+
+    def write_segment(self, columns: dict) -> int:
+        """
+        Append rows already in columnar form, one array per column in
+        `COLUMNS`, with `model` holding codes from `model_code()`.
+        """
+        arrays = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+        rows = len(arrays['verified_at'])
+        if rows == 0:
+            return 0
+
+        manifest = dict(self.manifest)
+        name = f"segment-{manifest['next_segment']:08d}"
+        self._save_segment(name, arrays)
+        manifest['segments'] = manifest['segments'] + [{
+            'name': name,
+            'rows': rows,
+            'start': int(arrays['verified_at'].min()),
+            'end': int(arrays['verified_at'].max()),
+        }]
+        manifest['next_segment'] += 1
+        # The segment only becomes visible to readers once the manifest lists it
+        self._write_manifest(manifest)
+        return rows
+
+    def _save_segment(self, name, arrays):
+        tmp_dir = os.path.join(self.path, f".{name}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for column, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), array)
+        # Segment names are never reused; one already there was orphaned by a crash before its manifest update
+        shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+        os.rename(tmp_dir, os.path.join(self.path, name))
+
+    def compact(self, min_rows: int = None) -> int:
+        """
+        Merge runs of adjacent segments smaller than `min_rows` (default:
+        `segment_rows`) into single segments. Returns the segments removed.
+        """
+        min_rows = min_rows or self.segment_rows
+        groups, group, group_rows = [], [], 0
+        for segment in self.manifest['segments']:
+            small = segment['rows'] < min_rows
+            if small and group_rows + segment['rows'] <= min_rows:
+                group.append(segment)
+                group_rows += segment['rows']
+                continue
+            if len(group) > 1:
+                groups.append(group)
+            group, group_rows = ([segment], segment['rows']) if small else ([], 0)
+        if len(group) > 1:
+            groups.append(group)
+        if not groups:
+            return 0
+
+        manifest = dict(self.manifest)
+        segments = list(manifest['segments'])
+        removed = []
+        for group in groups:
+            arrays = {
+                column: np.concatenate([self._column(segment, column) for segment in group])
+                for column in COLUMNS
+            }
+            name = f"segment-{manifest['next_segment']:08d}"
+            manifest['next_segment'] += 1
+            self._save_segment(name, arrays)
+            position = segments.index(group[0])
+            segments[position:position + len(group)] = [{
+                'name': name,
+                'rows': sum(segment['rows'] for segment in group),
+                'start': min(segment['start'] for segment in group),
+                'end': max(segment['end'] for segment in group),
+            }]
+            removed.extend(group)
+        manifest['segments'] = segments
+        self._write_manifest(manifest)
+        for segment in removed:
+            shutil.rmtree(os.path.join(self.path, segment['name']), ignore_errors=True)
+        return len(removed) - len(groups)
+
+    def _column(self, segment, column):
+        return np.load(os.path.join(self.path, segment['name'], f"{column}.npy"), mmap_mode='r')
+
+    def scan(self, columns, start: datetime.datetime = None, end: datetime.datetime = None):
+        """
+        Yield {column: array} per segment for rows verified in [start, end).
+        Segments wholly inside the range are returned as memory maps.
+        """
+        low = to_seconds(start) if start is not None else None
+        high = to_seconds(end) if end is not None else None
+        for segment in self.manifest['segments']:
+            if (low is not None and segment['end'] < low) or (high is not None and segment['start'] >= high):
+                continue
+            arrays = {column: self._column(segment, column) for column in columns}
+            inside = (low is None or segment['start'] >= low) and (high is None or segment['end'] < high)
+            if not inside:
+                verified_at = self._column(segment, 'verified_at')
+                mask = np.ones(segment['rows'], dtype=bool)
+                if low is not None:
+                    mask &= verified_at >= low
+                if high is not None:
+                    mask &= verified_at < high
+                arrays = {column: array[mask] for column, array in arrays.items()}
+            yield arrays
+
+    def score_distributions(self, start=None, end=None) -> dict:
+        """Per model: results, errors, score histogram (rounded 0-10), mean score and flag rates."""
+        n_models = len(self.models)
+        bins = MAX_SCORE + 1
+        histogram = np.zeros(n_models * bins, dtype=np.int64)
+        results = np.zeros(n_models, dtype=np.int64)
+        errors = np.zeros(n_models, dtype=np.int64)
+        score_sum = np.zeros(n_models)
+        emergency = np.zeros(n_models, dtype=np.int64)
+        insufficient = np.zeros(n_models, dtype=np.int64)
+
+        for part in self.scan(['model', 'score', 'ok', 'emergency', 'insufficient'], start, end):
+            model = part['model'].astype(np.int64)
+            ok = part['ok']
+            results += np.bincount(model, minlength=n_models)
+            errors += np.bincount(model[~ok], minlength=n_models)
+            emergency += np.bincount(model[ok & part['emergency']], minlength=n_models)
+            insufficient += np.bincount(model[ok & part['insufficient']], minlength=n_models)
+            scored = ok & ~np.isnan(part['score'])
+            score = part['score'][scored]
+            score_bin = np.clip(np.rint(score), 0, MAX_SCORE).astype(np.int64)
+            histogram += np.bincount(model[scored] * bins + score_bin, minlength=n_models * bins)
+            score_sum += np.bincount(model[scored], weights=score, minlength=n_models)
+
+        histogram = histogram.reshape(n_models, bins)
+        summary = {}
+        for code, model in enumerate(self.models):
+            if not results[code]:
+                continue
+            scored = int(histogram[code].sum())
+            answered = int(results[code] - errors[code])
+            summary[model] = {
+                'results': int(results[code]),
+                'errors': int(errors[code]),
+                'scored': scored,
+                'meanScore': round(float(score_sum[code] / scored), 2) if scored else None,
+                'histogram': histogram[code].tolist(),
+                'emergencyRate': round(float(emergency[code] / answered), 4) if answered else 0.0,
+                'insufficientRate': round(float(insufficient[code] / answered), 4) if answered else 0.0,
+            }
+        return summary
+
+    def low_confidence_rates(self, start=None, end=None, threshold: float = LOW_CONFIDENCE) -> dict:
+        """Per model and UTC day: scored results and the share scoring `threshold` or less."""
+        n_models = len(self.models)
+        parts = list(self.scan(['verified_at', 'model', 'score', 'ok'], start, end))
+        first = min((int(part['verified_at'].min()) for part in parts if len(part['verified_at'])), default=None)
+        last = max((int(part['verified_at'].max()) for part in parts if len(part['verified_at'])), default=None)
+        if first is None:
+            return {}
+        first_day = first // SECONDS_PER_DAY
+        n_days = last // SECONDS_PER_DAY - first_day + 1
+
+        scored = np.zeros(n_models * n_days, dtype=np.int64)
+        low = np.zeros(n_models * n_days, dtype=np.int64)
+        for part in parts:
+            keep = part['ok'] & ~np.isnan(part['score'])
+            cell = part['model'][keep].astype(np.int64) * n_days \
+                + part['verified_at'][keep] // SECONDS_PER_DAY - first_day
+            scored += np.bincount(cell, minlength=n_models * n_days)
+            low += np.bincount(cell[part['score'][keep] <= threshold], minlength=n_models * n_days)
+        scored = scored.reshape(n_models, n_days)
+        low = low.reshape(n_models, n_days)
+
+        rates = {}
+        for code, model in enumerate(self.models):
+            total = int(scored[code].sum())
+            if not total:
+                continue
+            rates[model] = {
+                'scored': total,
+                'lowConfidence': int(low[code].sum()),
+                'rate': round(float(low[code].sum() / total), 4),
+                'daily': [
+                    {
+                        'date': datetime.datetime.fromtimestamp(
+                            (first_day + day) * SECONDS_PER_DAY, datetime.timezone.utc).strftime(DAY_FORMAT),
+                        'scored': int(scored[code, day]),
+                        'lowConfidence': int(low[code, day]),
+                        'rate': round(float(low[code, day] / scored[code, day]), 4),
+                    }
+                    for day in np.flatnonzero(scored[code])
+                ],
+            }
+        return rates
+
+    def agreement(self, start=None, end=None, tolerance: float = 1.0, gap: float = 3.0) -> dict:
+        """
+        For every pair of models, over the records both scored: how many,
+        the mean absolute score difference, the share within `tolerance`
+        points (agreement), the share `gap` or more points apart
+        (disagreement), the share agreeing on the emergency flag, and the
+        score correlation. A record verified twice by one model counts once,
+        with its latest result.
+        """
+        parts = list(self.scan(['verified_at', 'record', 'model', 'score', 'emergency', 'ok'], start, end))
+        keep = [part['ok'] & ~np.isnan(part['score']) for part in parts]
+        if not parts or not any(mask.any() for mask in keep):
+            return {}
+        columns = {
+            column: np.concatenate([part[column][mask] for part, mask in zip(parts, keep)])
+            for column in ('verified_at', 'record', 'model', 'score', 'emergency')
+        }
+
+        # Sort by record, then model, then time, and keep the last row of each (record, model)
+        order = np.lexsort((columns['verified_at'], columns['model'], columns['record']))
+        record, model = columns['record'][order], columns['model'][order]
+        last = np.ones(len(order), dtype=bool)
+        last[:-1] = (record[1:] != record[:-1]) | (model[1:] != model[:-1])
+        order = order[last]
+        record, model = columns['record'][order], columns['model'][order]
+        score, emergency = columns['score'][order], columns['emergency'][order]
+
+        pairs = {}
+        for a, b in combinations(np.unique(model).tolist(), 2):
+            in_a, in_b = model == a, model == b
+            _, index_a, index_b = np.intersect1d(record[in_a], record[in_b], assume_unique=True, return_indices=True)
+            if not len(index_a):
+                continue
+            score_a, score_b = score[in_a][index_a], score[in_b][index_b]
+            difference = np.abs(score_a - score_b)
+            correlation = None
+            if len(difference) > 1 and score_a.std() > 0 and score_b.std() > 0:
+                correlation = round(float(np.corrcoef(score_a, score_b)[0, 1]), 4)
+            pairs[f"{self.models[a]} vs {self.models[b]}"] = {
+                'records': int(len(difference)),
+                'meanAbsDifference': round(float(difference.mean()), 3),
+                'agreementRate': round(float((difference <= tolerance).mean()), 4),
+                'disagreementRate': round(float((difference >= gap).mean()), 4),
+                'emergencyAgreementRate': round(float(
+                    (emergency[in_a][index_a] == emergency[in_b][index_b]).mean()), 4),
+                'correlation': correlation,
+            }
+        return pairs
+# -------------------------
+
+
+def _parse_day(text: str) -> datetime.datetime:
+    return datetime.datetime.strptime(text, DAY_FORMAT)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a verification result store.")
+    parser.add_argument('query', choices=['distribution', 'low-confidence', 'agreement', 'compact'])
+    parser.add_argument('--store', default='verifications', help="Store directory")
+    parser.add_argument('--start', type=_parse_day, help="First day (YYYY-MM-DD); default: all")
+    parser.add_argument('--end', type=_parse_day, help="Last day, inclusive (YYYY-MM-DD); default: all")
+    parser.add_argument('--threshold', type=float, default=LOW_CONFIDENCE, help="Low-confidence score")
+    parser.add_argument('--tolerance', type=float, default=1.0, help="Score difference counted as agreement")
+    parser.add_argument('--gap', type=float, default=3.0, help="Score difference counted as disagreement")
+    args = parser.parse_args(argv)
+
+    store = VerificationStore(args.store)
+    end = args.end + datetime.timedelta(days=1) if args.end else None
+    if args.query == 'distribution':
+        result = store.score_distributions(args.start, end)
+    elif args.query == 'low-confidence':
+        result = store.low_confidence_rates(args.start, end, args.threshold)
+    elif args.query == 'agreement':
+        result = store.agreement(args.start, end, args.tolerance, args.gap)
+    else:
+        result = {'segmentsRemoved': store.compact(), 'segments': len(store.manifest['segments'])}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,463 @@
+"""
+Bulk offline verification of saved symptom checker analyses.
+
+Streams final analyses from the symptomhistories collection (or a JSONL
+export), renders each into the verifier input, and runs the verifier
+providers over them with a bounded worker pool and per-provider rate limits.
+Confidence scores and flags are written back with bulk_write (or to a JSONL
+file, always for a JSONL export), optionally also to a columnar store for
+verification_store.py queries, and progress is checkpointed so an
+interrupted run resumes where it stopped. Calls that fail are written back
+as errors too, and `--retry-failed` verifies just those records again.
+
+Example:
+    python verify_bulk.py --source mongo --providers gemini,openai \
+        --workers 16 --rate gemini=2 --rate openai=5 --checkpoint verify.ckpt \
+        --store verifications
+    python verify_bulk.py --source mongo --providers gemini,openai --retry-failed
+"""
+import argparse
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ApiConfig
+from verify_llm_out import VERIFIERS, parse_verdict, verify_one
+
+config = ApiConfig()
+
+
+## ==============================
+## Sources
+## ==============================
+def iter_mongo(collection, batch_size: int = 500, after=None, failed=None):
+    """
+    Yield (position, document) for saved analyses in _id order, one batch in
+    memory at a time; only those whose `failed` provider errored when given.
+    """
+    query = {'analysis': {'$exists': True}}
+    if failed is not None:
+        query[f'verification.{failed}.error'] = {'$exists': True}
+    if after is not None:
+        query['_id'] = {'$gt': after}
+    cursor = collection.find(query, {'symptoms': 1, 'analysis': 1}).sort('_id', 1).batch_size(batch_size)
+    for doc in cursor:
+        yield doc['_id'], doc
+
+
+def iter_jsonl(path: str, after=None):
+    """Yield (line number, record) from a JSONL export, skipping lines up to `after`."""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f):
+            if after is not None and line_number <= after:
+                continue
+            line = line.strip()
+            if line:
+                yield line_number, json.loads(line)
+
+
+def render_record(doc) -> str:
+    """Render a stored conversation and its analysis into the verifier input."""
+    if 'symptoms' in doc or 'analysis' in doc:
+        return (
+            f"symptoms: {json.dumps(doc.get('symptoms', []), indent=2, default=str)},\n"
+            f"analysis: {json.dumps(doc.get('analysis', {}), indent=2, default=str)}"
+        )
+    # Other exports are verified as they are
+    return json.dumps({key: value for key, value in doc.items() if key != '_id'}, indent=2, default=str)
+
+
+## ==============================
+## Rate limiting and checkpoints
+## ==============================
+class RateLimiter:
+    """Blocking token bucket allowing `rate` calls per second with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Checkpoint:
+    """Position of the last record up to which every record has been verified and written."""
+
+    def __init__(self, path: str, source: str):
+        self.path = path
+        self.source = source
+        self.position = None
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            if saved.get('source') == source:
+                self.position = saved.get('position')
+
+    def save(self, position):
+        self.position = position
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'source': self.source, 'position': position, 'savedAt': time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+
+## ==============================
+## Sinks
+## ==============================
+class MongoSink:
+    """
+    Writes confidence scores back onto the source documents in bulk. A
+    provider that errored gets its error instead, replacing any older result,
+    so `--retry-failed` can find it.
+    """
+
+    def __init__(self, collection, batch_size: int = 200):
+        from pymongo import UpdateOne
+
+        self._update = UpdateOne
+        self.collection = collection
+        self.batch_size = batch_size
+        self._ops = []
+
+    def add(self, doc_id, results):
+        verified_at = datetime.datetime.now(datetime.timezone.utc)
+        fields = {}
+        for provider, result in results.items():
+            if result.ok:
+                verdict = parse_verdict(result.output)
+                fields[f'verification.{provider}'] = {
+                    'model': result.model,
+                    'confidence': verdict.score,
+                    'emergency': verdict.emergency,
+                    'insufficient': verdict.insufficient,
+                    'latencyMs': result.latency_ms,
+                    'verifiedAt': verified_at,
+                }
+            else:
+                fields[f'verification.{provider}'] = {
+                    'model': result.model,
+                    'error': result.error,
+                    'latencyMs': result.latency_ms,
+                    'verifiedAt': verified_at,
+                }
+        self._ops.append(self._update({'_id': doc_id}, {'$set': fields}))
+        if len(self._ops) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._ops:
+            self.collection.bulk_write(self._ops, ordered=False)
+            self._ops = []
+
+
+class JsonlSink:
+    """Appends one line of scores per verified record to a JSONL file."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def add(self, doc_id, results):
+        verification = {}
+        for provider, result in results.items():
+            verdict = parse_verdict(result.output) if result.ok else None
+            verification[provider] = {
+                'model': result.model,
+                'confidence': verdict.score if verdict else None,
+                'emergency': verdict.emergency if verdict else None,
+                'insufficient': verdict.insufficient if verdict else None,
+                'error': result.error,
+                'latencyMs': result.latency_ms,
+            }
+        self._file.write(json.dumps({'id': doc_id, 'verification': verification}, default=str) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+
+class StoreSink:
+    """
+    Appends one row per provider result to a columnar `VerificationStore`.
+    Each checkpoint writes a small segment; `python verification_store.py
+    compact` merges them after the run.
+    """
+
+    def __init__(self, path: str):
+        from verification_store import VerificationRecord, VerificationStore
+
+        self._record = VerificationRecord
+        self.store = VerificationStore(path)
+
+    def add(self, doc_id, results):
+        verified_at = datetime.datetime.now(datetime.timezone.utc)
+        for provider, result in results.items():
+            verdict = parse_verdict(result.output) if result.ok else None
+            self.store.append(self._record(
+                record_id=str(doc_id),
+                model=f"{provider}/{result.model}",
+                verified_at=verified_at,
+                score=verdict.score if verdict else None,
+                emergency=verdict.emergency if verdict else False,
+                insufficient=verdict.insufficient if verdict else False,
+                ok=result.ok,
+                latency_ms=result.latency_ms,
+            ))
+
+    def flush(self):
+        self.store.flush()
+
+
+class FanOutSink:
+    """Sends every result to several sinks."""
+
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def add(self, doc_id, results):
+        for sink in self.sinks:
+            sink.add(doc_id, results)
+
+    def flush(self):
+        for sink in self.sinks:
+            sink.flush()
+
+
+## ==============================
+## Pipeline
+## ==============================
+class _PendingRecord:
+    def __init__(self, seq, position, doc_id, providers):
+        self.seq = seq
+        self.position = position
+        self.doc_id = doc_id
+        self.remaining = len(providers)
+        self.results = {}
+        self.lock = threading.Lock()
+
+
+def run_pipeline(records, providers, sink, checkpoint, workers: int = 8, limiters=None,
+                 checkpoint_every: int = 100, limit: int = None, timeout: float = 120.0, timeouts=None):
+    """
+    Verify every record from `records` with each provider, giving each call
+    `timeouts[provider]` seconds (default `timeout`).
+
+    At most `workers * 2` records are in flight, so memory stays constant
+    however large the source is. The checkpoint only advances past records
+    whose results have been flushed to the sink.
+    """
+    limiters = limiters or {}
+    timeouts = timeouts or {}
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-verifier")
+    slots = threading.Semaphore(workers * 2)
+    completed = queue.Queue()
+    stats = {'records': 0, 'verified': 0, 'errors': 0}
+    finished = {}
+    next_seq = 0
+    watermark = None
+    since_checkpoint = 0
+    outstanding = 0
+
+    def verify(pending, provider, text):
+        limiter = limiters.get(provider)
+        if limiter is not None:
+            limiter.acquire()
+        result = verify_one(provider, text, timeouts.get(provider, timeout))
+        with pending.lock:
+            pending.results[provider] = result
+            pending.remaining -= 1
+            done = pending.remaining == 0
+        if done:
+            completed.put(pending)
+            slots.release()
+
+    def collect(block):
+        nonlocal next_seq, watermark, since_checkpoint, outstanding
+        while outstanding:
+            try:
+                pending = completed.get(block=block)
+            except queue.Empty:
+                return
+            outstanding -= 1
+            sink.add(pending.doc_id, pending.results)
+            for result in pending.results.values():
+                stats['verified' if result.ok else 'errors'] += 1
+            finished[pending.seq] = pending.position
+            since_checkpoint += 1
+
+            # Advance to the end of the contiguous run of finished records
+            while next_seq in finished:
+                watermark = finished.pop(next_seq)
+                next_seq += 1
+            if since_checkpoint >= checkpoint_every and watermark != checkpoint.position:
+                sink.flush()
+                checkpoint.save(watermark)
+                since_checkpoint = 0
+                print(f"Checkpoint at {watermark}: {stats}")
+
+    try:
+        for seq, (position, doc) in enumerate(records):
+            if limit is not None and seq >= limit:
+                break
+            collect(block=False)
+            slots.acquire()
+            pending = _PendingRecord(seq, position, doc.get('_id', position), providers)
+            text = render_record(doc)
+            outstanding += 1
+            stats['records'] += 1
+            for provider in providers:
+                pool.submit(verify, pending, provider, text)
+
+        collect(block=True)
+    finally:
+        pool.shutdown(wait=True)
+        sink.flush()
+
+    if watermark is not None and watermark != checkpoint.position:
+        checkpoint.save(watermark)
+    return stats
+
+
+def _parse_rates(values):
+    rates = {}
+    for value in values or []:
+        provider, _, rate = value.partition('=')
+        rates[provider] = RateLimiter(float(rate), burst=max(1, int(float(rate))))
+    return rates
+
+
+def _parse_timeouts(values):
+    timeouts = {}
+    for value in values or []:
+        provider, _, seconds = value.partition('=')
+        timeouts[provider] = float(seconds)
+    return timeouts
+
+
+def retry_failed(collection, providers, args):
+    """Verify again, one provider at a time, the documents each provider errored on."""
+    for provider in providers:
+        sink = MongoSink(collection, args.write_batch)
+        if args.store:
+            sink = FanOutSink([sink, StoreSink(args.store)])
+        records = (
+            (str(doc_id), doc) for doc_id, doc in iter_mongo(collection, args.batch_size, failed=provider)
+        )
+        started = time.perf_counter()
+        stats = run_pipeline(
+            records,
+            [provider],
+            sink,
+            # The failed records are spread over the whole collection; the main checkpoint stays put
+            Checkpoint(None, 'mongo'),
+            workers=args.workers,
+            limiters=_parse_rates(args.rate),
+            checkpoint_every=args.checkpoint_every,
+            limit=args.limit,
+            timeout=args.timeout,
+            timeouts=_parse_timeouts(args.provider_timeout),
+        )
+        elapsed = time.perf_counter() - started
+        print(f"Retried {stats['records']} records with {provider} in {elapsed:.1f}s: {stats}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verify saved symptom checker analyses in bulk.")
+    parser.add_argument('--source', choices=['mongo', 'jsonl'], default='mongo')
+    parser.add_argument('--input', help="JSONL export to read when --source=jsonl")
+    parser.add_argument('--output', help="JSONL file for results (required with --source=jsonl; "
+                                         "default: write back to MongoDB)")
+    parser.add_argument('--store', help="Also append results to this verification store directory")
+    parser.add_argument('--providers', default=','.join(VERIFIERS),
+                        help="Comma separated verifier providers")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', action='append', metavar='PROVIDER=CALLS_PER_SECOND',
+                        help="Per-provider rate limit; may be repeated")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Seconds before a verifier call is abandoned")
+    parser.add_argument('--provider-timeout', action='append', metavar='PROVIDER=SECONDS',
+                        help="Per-provider timeout overriding --timeout; may be repeated")
+    parser.add_argument('--checkpoint', default='verify_bulk.ckpt')
+    parser.add_argument('--checkpoint-every', type=int, default=100)
+    parser.add_argument('--batch-size', type=int, default=500, help="MongoDB cursor batch size")
+    parser.add_argument('--write-batch', type=int, default=200, help="Updates per bulk_write")
+    parser.add_argument('--limit', type=int, help="Stop after this many records")
+    parser.add_argument('--retry-failed', action='store_true',
+                        help="Verify again only the records each provider errored on "
+                             "(--source=mongo; ignores the checkpoint)")
+    args = parser.parse_args(argv)
+
+    providers = [provider.strip() for provider in args.providers.split(',') if provider.strip()]
+    unknown = set(providers) - set(VERIFIERS)
+    if unknown:
+        parser.error(f"Unknown providers: {', '.join(sorted(unknown))}")
+
+    # JSONL exports carry line numbers, simulator ids or {"$oid": ...} dicts as ids, which
+    # would match no document when written back, so their results go to a file
+    if args.source == 'jsonl' and not args.output:
+        parser.error("--output is required when --source=jsonl")
+    # JSONL results keep their errors in --output, next to the export
+    if args.retry_failed and (args.source != 'mongo' or args.output):
+        parser.error("--retry-failed needs --source=mongo and no --output")
+
+    if args.source == 'mongo':
+        from bson import ObjectId
+        from pymongo import MongoClient
+        from persistence import HISTORY_COLLECTION
+
+        collection = MongoClient(config.MONGODB_CONNECTION_STRING)[config.MONGODB_DB_NAME][HISTORY_COLLECTION]
+
+        if args.retry_failed:
+            retry_failed(collection, providers, args)
+            return
+
+        checkpoint = Checkpoint(args.checkpoint, 'mongo')
+        after = ObjectId(checkpoint.position) if checkpoint.position else None
+        records = ((str(doc_id), doc) for doc_id, doc in iter_mongo(collection, args.batch_size, after))
+    else:
+        if not args.input:
+            parser.error("--input is required when --source=jsonl")
+        checkpoint = Checkpoint(args.checkpoint, f"jsonl:{os.path.abspath(args.input)}")
+        records = iter_jsonl(args.input, checkpoint.position)
+
+    sink = JsonlSink(args.output) if args.output else MongoSink(collection, args.write_batch)
+    if args.store:
+        sink = FanOutSink([sink, StoreSink(args.store)])
+
+    if checkpoint.position is not None:
+        print(f"Resuming after {checkpoint.position}")
+    started = time.perf_counter()
+    stats = run_pipeline(
+        records,
+        providers,
+        sink,
+        checkpoint,
+        workers=args.workers,
+        limiters=_parse_rates(args.rate),
+        checkpoint_every=args.checkpoint_every,
+        limit=args.limit,
+        timeout=args.timeout,
+        timeouts=_parse_timeouts(args.provider_timeout),
+    )
+    elapsed = time.perf_counter() - started
+    print(f"Verified {stats['records']} records in {elapsed:.1f}s: {stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,10 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Dict, Optional
+
 # from arize.otel import register
 from phoenix.otel import register
 from config import ApiConfig
@@ -160,27 +167,105 @@ verify_prompt = """
 """
 
     
+## ==============================
+## Provider clients
+## ==============================
+class ProviderRegistry:
+    """
+    Creates each provider's SDK client once and hands out the same instance,
+    so repeated verifications reuse its HTTP connection pool.
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _create(self, provider: str):
+        if provider == "openai":
+            return OpenAI(api_key=config.OPENAI_API_KEY)
+        if provider == "anthropic":
+            return anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
+        if provider == "gemini":
+            return genai.Client(
+                api_key=config.GEMINI_API_KEY,
+                # vertexai=True,
+                # project=config.VERTEX_PROJECT_ID,
+                # location=config.VERTEX_LOCATION
+            )
+        raise ValueError(f"Unknown provider: {provider}")
+
+    def get(self, provider: str):
+        with self._lock:
+            if provider not in self._clients:
+                self._clients[provider] = self._create(provider)
+            return self._clients[provider]
+
+
+registry = ProviderRegistry()
+
+
 ## ==============================
 ## Verifier helpers and runners
 ## ==============================
+def _timeout_options(timeout: Optional[float]) -> dict:
+    # Passing timeout=None to the OpenAI and Anthropic SDKs disables their default timeout
+    return {"timeout": timeout} if timeout else {}
+
+
+def _verify_openai(conversation, model: str = "gpt-5", timeout: Optional[float] = None) -> str:
+    if not config.OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY not configured")
+
+    resp = registry.get("openai").chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": verify_prompt},
+            {"role": "user", "content": conversation},
+        ],
+        **_timeout_options(timeout),
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+def _verify_anthropic(conversation, model: str = "claude-opus-4-20250514", timeout: Optional[float] = None) -> str:
+    if not config.ANTHROPIC_API_KEY:
+        raise RuntimeError("ANTHROPIC_API_KEY not configured")
+
+    resp = registry.get("anthropic").messages.create(
+        model=model,
+        system=verify_prompt,
+        max_tokens=1024,
+        messages=[{"role": "user", "content": conversation}],
+        **_timeout_options(timeout),
+    )
+    return (resp.content[0].text or "Response not received").strip()
+
+
+def _verify_gemini(conversation, model: str = "gemini-2.5-pro", timeout: Optional[float] = None) -> str:
+    if not config.GEMINI_API_KEY:
+        raise RuntimeError("GEMINI_API_KEY not configured")
+
+    resp = registry.get("gemini").models.generate_content(
+        model=model,
+        contents=conversation,
+        config=types.GenerateContentConfig(
+            system_instruction=verify_prompt,
+            # The genai SDK takes its timeout in milliseconds
+            http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None,
+        )
+    )
+    return resp.text.strip().lstrip('```json').rstrip('```').strip()
+
+
 def verify_with_openai(
     conversation, 
     model: str = "gpt-5",
     ) -> str:
     """Run the verification prompt using an OpenAI chat model."""
-    if not config.OPENAI_API_KEY:
-        return "Error: OPENAI_API_KEY not configured"
-
-    client = OpenAI(api_key=config.OPENAI_API_KEY)
     try:
-        resp = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": verify_prompt},
-                {"role": "user", "content": conversation},
-            ],
-        )
-        return (resp.choices[0].message.content or "").strip()
+        return _verify_openai(conversation, model)
+    except RuntimeError as e:
+        return f"Error: {e}"
     except Exception as e:
         return f"Error with OpenAI: {e}"
 
@@ -190,19 +275,10 @@ def verify_with_anthropic(
     model: str = "claude-opus-4-20250514",
     ) -> str:
     """Run the verification prompt using an Anthropic Claude 3 model."""
-    if not config.ANTHROPIC_API_KEY:
-        return "Error: ANTHROPIC_API_KEY not configured"
-
-    client = anthropic.Anthropic(api_key=config.ANTHROPIC_API_KEY)
-
     try:
-        resp = client.messages.create(
-            model=model,
-            system=verify_prompt,
-            max_tokens=1024,
-            messages=[{"role": "user", "content": conversation}],
-        )
-        return (resp.content[0].text or "Response not received").strip()
+        return _verify_anthropic(conversation, model)
+    except RuntimeError as e:
+        return f"Error: {e}"
     except Exception as e:
         return f"Error with Anthropic: {e}"
 
@@ -212,28 +288,130 @@ def verify_with_gemini(
     model: str = "gemini-2.5-pro",
 ) -> str:
     """Run the verification prompt using a Gemini model."""
-    if not config.GEMINI_API_KEY:
-        return "Error: GEMINI_API_KEY not configured"
-
-    client = genai.Client(
-        api_key=config.GEMINI_API_KEY,
-        # vertexai=True,
-        # project=config.VERTEX_PROJECT_ID,
-        # location=config.VERTEX_LOCATION
-    )
-    
     try:
-        resp = client.models.generate_content(
-            model=model,
-            contents=conversation,
-            config=types.GenerateContentConfig(
-                system_instruction=verify_prompt,
-            )
-        )
-        return resp.text.strip().lstrip('```json').rstrip('```').strip()
+        return _verify_gemini(conversation, model)
+    except RuntimeError as e:
+        return f"Error: {e}"
     except Exception as e:
         return f"Error with Gemini: {e}"
 
+
+# Provider name -> (verifier, default model)
+VERIFIERS = {
+    "gemini": (_verify_gemini, "gemini-2.5-pro"),
+    "openai": (_verify_openai, "gpt-5"),
+    "anthropic": (_verify_anthropic, "claude-opus-4-20250514"),
+}
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="verifier")
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of one provider's verification of a conversation."""
+    provider: str
+    model: str
+    output: Optional[str] = None
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _timed(provider, verifier, model, conversation, timeout=None):
+    started = time.perf_counter()
+    try:
+        output = verifier(conversation, model, timeout)
+        return VerificationResult(provider, model, output=output,
+                                  latency_ms=(time.perf_counter() - started) * 1000)
+    except Exception as e:
+        return VerificationResult(provider, model, error=str(e),
+                                  latency_ms=(time.perf_counter() - started) * 1000)
+
+
+def verify_one(provider: str, conversation, timeout: Optional[float] = 120.0) -> VerificationResult:
+    """
+    Verify a conversation with a single provider on the calling thread.
+    The provider's SDK gives up after `timeout` seconds, so a hung call
+    cannot hold the thread indefinitely.
+    """
+    verifier, model = VERIFIERS[provider]
+    return _timed(provider, verifier, model, conversation, timeout)
+
+
+# Also matches "**Confidence:** 7/10" and "Confidence 7/10"
+CONFIDENCE_PATTERN = re.compile(r"Confidence[\s:*\[(]*(\d+(?:\.\d+)?)", re.IGNORECASE)
+EMERGENCY_PATTERN = re.compile(r"EMERGENCY ACTION\W*:", re.IGNORECASE)
+INSUFFICIENT_PATTERN = re.compile(r"Information insufficient", re.IGNORECASE)
+
+
+@dataclass
+class Verdict:
+    """The score and flags a verifier gave one analysis."""
+    score: Optional[float] = None
+    emergency: bool = False
+    insufficient: bool = False
+
+
+def parse_verdict(output: Optional[str]) -> Verdict:
+    """
+    Extract the `Confidence: [0-10]` score, the `EMERGENCY ACTION:` flag and
+    the "Information insufficient" flag from a verifier's output.
+    """
+    output = output or ""
+    match = CONFIDENCE_PATTERN.search(output)
+    return Verdict(
+        score=min(float(match.group(1)), 10.0) if match else None,
+        emergency=EMERGENCY_PATTERN.search(output) is not None,
+        insufficient=INSUFFICIENT_PATTERN.search(output) is not None,
+    )
+
+
+def parse_confidence(output: Optional[str]) -> Optional[float]:
+    """Extract the `Confidence: [0-10]` score from a verifier's output."""
+    return parse_verdict(output).score
+
+
+def verify_all(
+    conversation,
+    providers=None,
+    timeout: float = 120.0,
+    timeouts: Optional[Dict[str, float]] = None,
+) -> Dict[str, VerificationResult]:
+    """
+    Verify a conversation with several providers concurrently.
+    Each provider gets `timeouts[provider]` seconds (default `timeout`); a
+    provider that runs over is reported as timed out rather than waited for.
+    """
+    providers = list(VERIFIERS if providers is None else providers)
+    timeouts = timeouts or {}
+    started = time.perf_counter()
+
+    futures = {}
+    for provider in providers:
+        verifier, model = VERIFIERS[provider]
+        # The SDK call is bounded too, so a timed-out verifier does not keep its executor thread
+        futures[provider] = _executor.submit(_timed, provider, verifier, model, conversation,
+                                             timeouts.get(provider, timeout))
+
+    results = {}
+    for provider, future in futures.items():
+        limit = timeouts.get(provider, timeout)
+        remaining = max(limit - (time.perf_counter() - started), 0)
+        try:
+            results[provider] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            future.cancel()
+            results[provider] = VerificationResult(
+                provider, VERIFIERS[provider][1],
+                error=f"Timed out after {limit}s",
+                latency_ms=limit * 1000,
+            )
+    return results
+
+
 def run_demo_from_file(
     conversation,
     run_gemini: bool = False,
@@ -241,20 +419,18 @@ def run_demo_from_file(
     run_anthropic: bool = False,
 ) -> None:
 
-    if run_gemini:
-        print("\n--- Verifier (Gemini) ---\n")
-        out = verify_with_gemini(conversation)
-        print(out)
-
-    if run_openai:
-        print("\n--- Verifier (OpenAI) ---\n")
-        out = verify_with_openai(conversation)
-        print(out)
-
-    if run_anthropic:
-        print("\n--- Verifier (Anthropic) ---\n")
-        out = verify_with_anthropic(conversation)
-        print(out)
+    selected = [
+        provider
+        for provider, enabled in (("gemini", run_gemini), ("openai", run_openai), ("anthropic", run_anthropic))
+        if enabled
+    ]
+    labels = {"gemini": "Gemini", "openai": "OpenAI", "anthropic": "Anthropic"}
+
+    for provider, result in verify_all(conversation, providers=selected).items():
+        print(f"\n--- Verifier ({labels[provider]}, {result.latency_ms:.0f} ms) ---\n")
+        print(result.output if result.ok else f"Error with {labels[provider]}: {result.error}")
+        if result.ok:
+            print(f"\nParsed: {parse_verdict(result.output)}")
 
 
 if __name__ == "__main__":
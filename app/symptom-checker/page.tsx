@@ -2,7 +2,12 @@
 
 import { useState, useEffect, useCallback, useRef } from 'react';
 import { useRouter } from 'next/navigation';
-import { getSymptomCheckResponse } from '../../lib/api';
+import {
+  createSymptomCheckSession,
+  getSymptomCheckResponse,
+  getSymptomCheckSessionResponse,
+  streamSymptomCheckResponse,
+} from '../../lib/api';
 import withAuth from '../../components/auth/withAuth';
 import { useAuth } from '../../lib/authContext';
 import { FiShield } from 'react-icons/fi';
@@ -33,6 +38,9 @@ interface FinalAnalysisResponse {
   treatment_plans?: TreatmentPlan[];
 }
 
+// The service gives its final analysis once this many questions were answered
+const MAX_QUESTIONS = 10;
+
 // --- Icon Components ---
 const HeartIcon = () => <svg xmlns="http://www.w3.org/2000/svg" className="h-6 w-6 text-blue-500" fill="none" viewBox="0 0 24 24" stroke="currentColor"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M4.318 6.318a4.5 4.5 0 000 6.364L12 20.364l7.682-7.682a4.5 4.5 0 00-6.364-6.364L12 7.636l-1.318-1.318a4.5 4.5 0 00-6.364 0z" /></svg>;
 const AlertIcon = () => <svg xmlns="http://www.w3.org/2000/svg" className="h-6 w-6 text-yellow-500" fill="none" viewBox="0 0 24 24" stroke="currentColor"><path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M12 9v2m0 4h.01m-6.938 4h13.856c1.54 0 2.502-1.667 1.732-3L13.732 4c-.77-1.333-2.694-1.333-3.464 0L3.34 16c-.77 1.333.192 3 1.732 3z" /></svg>;
@@ -89,6 +97,8 @@ function SymptomChecker() {
   const router = useRouter();
 
   const chatEndRef = useRef<null | HTMLDivElement>(null);
+  // Server-side session of the conversation; null once the service no longer knows it
+  const sessionIdRef = useRef<string | null>(null);
   const otherInputRef = useRef<HTMLInputElement | null>(null);
   const [otherMode, setOtherMode] = useState(false);
   const [otherText, setOtherText] = useState('');
@@ -100,13 +110,12 @@ function SymptomChecker() {
   useEffect(scrollToBottom, [chatHistory]);
 
   const getNextQuestion = useCallback(async (historyForApi: ChatItem[]) => {
-    const processAndSetResponse = (data: FinalAnalysisResponse, historyForApi: ChatItem[]) => {
+    const processAndSetResponse = (data: FinalAnalysisResponse) => {
       if (data.is_final) {
         setFinalAnalysis(data);
         setIsFinal(true);
         setCurrentOptions([]);
-        const finalMessage: ChatItem = { from: 'ai', text: data.summary || 'Final analysis completed.' };
-        saveHistory([...historyForApi, finalMessage], data);
+        // The AI service saves the final analysis to the user's history
       } else {
         setChatHistory(prev => [...prev, { from: 'ai', text: data.question || "" }]);
         setCurrentOptions(data.options || []);
@@ -119,8 +128,47 @@ function SymptomChecker() {
       const apiHistory = historyForApi
         .filter(item => item.from === 'user')
         .map(item => ({ question: item.question, answer: item.text }));
-      const data = await getSymptomCheckResponse(apiHistory, user?.id);
-      processAndSetResponse(data, historyForApi);
+      // Questions are asked through the session, which only needs the newest answer.
+      // If the session expired or lives on another worker, the full history is sent instead.
+      const askNext = async (): Promise<FinalAnalysisResponse> => {
+        if (apiHistory.length === 0) {
+          const session = await createSymptomCheckSession(user?.id);
+          sessionIdRef.current = session.sessionId;
+        }
+        if (sessionIdRef.current) {
+          const answer = apiHistory.length ? apiHistory[apiHistory.length - 1].answer : undefined;
+          try {
+            return await getSymptomCheckSessionResponse(sessionIdRef.current, answer);
+          } catch (err) {
+            if ((err as { status?: number }).status !== 404) throw err;
+            sessionIdRef.current = null;
+          }
+        }
+        return getSymptomCheckResponse(apiHistory, user?.id);
+      };
+      // Stream the final analysis so its parts show up as soon as they are ready
+      const showPartial = (update: (prev: FinalAnalysisResponse) => Partial<FinalAnalysisResponse>) => {
+        setIsFinal(true);
+        setCurrentOptions([]);
+        setFinalAnalysis(prev => {
+          const current = prev || { is_final: true };
+          return { ...current, ...update(current) };
+        });
+      };
+      const data: FinalAnalysisResponse = apiHistory.length >= MAX_QUESTIONS
+        ? await streamSymptomCheckResponse(apiHistory, user?.id, {
+            onSummary: (summary: string) => showPartial(() => ({ summary })),
+            onCause: (cause: SuggestedCause) => showPartial(prev => ({
+              suggested_causes: [...(prev.suggested_causes || []), cause],
+            })),
+            onTreatment: (plan: TreatmentPlan) => showPartial(prev => ({
+              treatment_plans: [...(prev.treatment_plans || []), plan],
+            })),
+          })
+        : await askNext();
+      // A final analysis ends the conversation; an unused session expires on the service
+      if (data.is_final) sessionIdRef.current = null;
+      processAndSetResponse(data);
     } catch (err) {
       setError((err as Error).message);
     } finally {
@@ -140,32 +188,6 @@ function SymptomChecker() {
     }
   }, [otherMode]);
 
-  const saveHistory = async (finalHistory: ChatItem[], analysis: FinalAnalysisResponse | null) => {
-    const symptomsToSave = finalHistory
-      .filter((item: ChatItem) => item.from === 'user')
-      .map((item: ChatItem) => ({ question: item.question, answer: item.text }));
-    
-    const payload = {
-      symptoms: symptomsToSave,
-      analysis: analysis ? {
-        summary: analysis.summary || '',
-        // Map to DB schema: { title, description }
-        suggested_causes: (analysis.suggested_causes || []).map(c => ({ title: c.name, description: c.description })),
-        treatment_plans: (analysis.treatment_plans || []).map(p => ({ title: p.action, description: p.details })),
-      } : null,
-    };
-
-    try {
-      await fetch('/api/symptoms/history', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload),
-      });
-    } catch (err) {
-      setError((err as Error).message);
-    }
-  };
-
   useEffect(() => {
     if (user) {
       getNextQuestion([]);
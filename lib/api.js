@@ -57,6 +57,90 @@ export const getSymptomCheckResponse = (history, userId) => {
   });
 }; 
 
+// Starts a server-side symptom check session. Each turn then only sends the
+// newest answer; the first turn is requested without one.
+export const createSymptomCheckSession = (userId) => {
+  return fetcher('http://127.0.0.1:5328/api/symptom-checker/session', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ userId }),
+  });
+};
+
+export const getSymptomCheckSessionResponse = (sessionId, answer) => {
+  return fetcher(`http://127.0.0.1:5328/api/symptom-checker/session/${sessionId}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify(answer === undefined ? {} : { answer }),
+  });
+};
+
+// Streams the symptom check as Server-Sent Events. Partial parts of a final
+// analysis are passed to the handlers as soon as the service sends them.
+export const streamSymptomCheckResponse = async (history, userId, handlers = {}) => {
+  const res = await fetch('http://127.0.0.1:5328/api/symptom-checker/stream', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    },
+    body: JSON.stringify({ history, userId }),
+  });
+
+  if (!res.ok || !res.body) {
+    const errorData = await res.json().catch(() => ({ message: 'An unknown error occurred.' }));
+    const error = new Error(errorData.error || errorData.message || 'API request failed');
+    error.status = res.status;
+    throw error;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let result = null;
+
+  const dispatch = (frame) => {
+    let event = 'message';
+    const dataLines = [];
+    frame.split('\n').forEach(line => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+    });
+    if (dataLines.length === 0) return;
+    const data = JSON.parse(dataLines.join('\n'));
+
+    if (event === 'summary') handlers.onSummary?.(data);
+    else if (event === 'cause') handlers.onCause?.(data);
+    else if (event === 'treatment') handlers.onTreatment?.(data);
+    else if (event === 'result') result = data;
+    else if (event === 'error') {
+      const error = new Error(data.error || 'API request failed');
+      error.status = data.status;
+      throw error;
+    }
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      dispatch(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+    }
+  }
+  if (buffer.trim()) dispatch(buffer);
+
+  if (!result) throw new Error('The analysis stream ended unexpectedly.');
+  return result;
+};
+
 // --- User Symptoms API --- //
 
 export const getUserSymptoms = () => {